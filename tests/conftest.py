@@ -2,3 +2,25 @@ import sys
 
 from os.path import dirname, abspath
 sys.path.append(dirname(dirname(abspath(__file__))))
+
+import pytest
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from vectordb_bench.backend.dataset import CustomDataset, DatasetManager
+from vectordb_bench.backend.clients import MetricType
+
+
+@pytest.fixture
+def small_dataset(tmp_path) -> DatasetManager:
+    """400 train rows in 4 row groups of 100 and 5 queries, with the exact ground truth"""
+    rng = np.random.default_rng(3)
+    pq.write_table(pa.table({"id": np.arange(400), "emb": list(rng.random((400, 4)))}), tmp_path / "train.parquet", row_group_size=100)
+    pq.write_table(pa.table({"id": np.arange(5), "emb": list(rng.random((5, 4)))}), tmp_path / "test.parquet")
+    dataset = DatasetManager(data=CustomDataset(
+        name="custom", size=400, dim=4, metric_type=MetricType.L2, use_shuffled=False,
+        with_gt=True, dir=str(tmp_path), file_num=1,
+    ))
+    dataset.prepare()
+    return dataset
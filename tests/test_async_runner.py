@@ -0,0 +1,14 @@
+import pytest
+import numpy as np
+
+from vectordb_bench.backend.runner.async_runner import AsyncSearchRunner
+from ut_clients import SyncDB, AsyncDB
+
+
+class TestAsyncSearchRunner:
+    def test_refuse_thread_unsafe_clients(self):
+        data = np.random.rand(10, 4)
+        with pytest.raises(ValueError):
+            AsyncSearchRunner(SyncDB(), data)
+        AsyncSearchRunner(SyncDB(thread_safe=True), data)
+        AsyncSearchRunner(AsyncDB(), data)
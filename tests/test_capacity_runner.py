@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+
+from vectordb_bench.backend.runner.capacity_runner import CapacityInsertRunner, InsertErrorKind, classify_insert_error
+from vectordb_bench.models import LoadTimeoutError
+from ut_clients import SyncDB
+
+
+class FailingWorkerRunner(CapacityInsertRunner):
+    """the first worker fails outside the inserts, the others insert until they are stopped"""
+    def task(self, worker_idx: int, *args):
+        if worker_idx == 0:
+            raise RuntimeError("worker failed")
+        return super().task(worker_idx, *args)
+
+
+class TestCapacityInsertRunner:
+    def test_classify_insert_error(self):
+        assert classify_insert_error(RuntimeError("memory quota exceeded")) == InsertErrorKind.LIMIT
+        assert classify_insert_error(RuntimeError("no space left on device")) == InsertErrorKind.LIMIT
+        assert classify_insert_error(RuntimeError("rate limit exceeded, 429")) == InsertErrorKind.TRANSIENT
+        assert classify_insert_error(RuntimeError("Deadline Exceeded")) == InsertErrorKind.TRANSIENT
+        assert classify_insert_error(ConnectionError("")) == InsertErrorKind.TRANSIENT
+        assert classify_insert_error(ValueError("bad vector")) == InsertErrorKind.UNKNOWN
+        assert classify_insert_error(IndexError("list index out of range")) == InsertErrorKind.UNKNOWN
+        assert classify_insert_error(RuntimeError("queue full")) == InsertErrorKind.UNKNOWN
+        assert classify_insert_error(RuntimeError("OOM command not allowed")) == InsertErrorKind.LIMIT
+        assert classify_insert_error(RuntimeError("disk usage exceeded flood-stage watermark")) == InsertErrorKind.LIMIT
+
+    def test_unique_ids(self):
+        runner = CapacityInsertRunner(None, None, False, load_concurrency=3, batch_size=4)
+        ids = np.array([3, 0, 9, 5, 7, 1, 2, 8, 4, 6])
+        shifted = []
+        for worker_idx in range(3):
+            batches = runner._batches(worker_idx, len(ids), int(ids.max()) + 1)
+            for _ in range(3 * 3):  # 3 rounds of 3 batches
+                start, end, offset = next(batches)
+                shifted.extend(ids[start:end] + offset)
+        assert len(shifted) == 3 * 3 * len(ids)
+        assert len(set(shifted)) == len(shifted)
+
+    @pytest.mark.parametrize("load_concurrency", [1, 2])
+    def test_worker_error(self, small_dataset, load_concurrency):
+        runner = FailingWorkerRunner(SyncDB(), small_dataset, False, timeout=60, load_concurrency=load_concurrency)
+        with pytest.raises(RuntimeError, match="worker failed"):
+            runner.run_endlessness()
+
+    def test_timeout(self, small_dataset):
+        runner = CapacityInsertRunner(SyncDB(), small_dataset, False, timeout=1, load_concurrency=2)
+        with pytest.raises(LoadTimeoutError):
+            runner.run_endlessness()
@@ -0,0 +1,26 @@
+import pytest
+from types import SimpleNamespace
+
+from vectordb_bench.backend.runner.checkpoint import LoadCheckpoint
+
+
+class TestLoadCheckpoint:
+    def test_save_and_load(self, tmp_path):
+        dataset = SimpleNamespace(data_dir=tmp_path, data=SimpleNamespace(dir_name="sift_small_500k"))
+        ckpt = LoadCheckpoint(dataset, "Milvus-my label")
+        assert ckpt.total(2) == 0 and not ckpt.exists()
+
+        ckpt.save(0, 2, 300, ("shuffle_train-00-of-02.parquet", 3, 0))
+        ckpt.save(0, 2, 350, ("shuffle_train-00-of-02.parquet", 3, 50))
+        ckpt.save(1, 2, 500, None)
+        assert (ckpt.load(0, 2), ckpt.load(1, 2), ckpt.total(2)) == (350, 500, 850)
+        assert ckpt.exists()
+        assert LoadCheckpoint(dataset, "Milvus-my label").total(2) == 850
+        assert LoadCheckpoint(dataset, "Milvus-other").total(2) == 0
+        assert not any(p.suffix == ".tmp" for p in ckpt.dir.iterdir())
+
+        with pytest.raises(ValueError):
+            ckpt.load(0, 3)
+
+        ckpt.clear()
+        assert ckpt.total(3) == 0 and not ckpt.exists()
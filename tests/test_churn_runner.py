@@ -0,0 +1,45 @@
+import pytest
+
+from vectordb_bench.backend.runner.churn_runner import ChurnRunner
+from vectordb_bench.models import ChurnMode
+from ut_clients import SyncDB
+
+
+class DeleteDB(SyncDB):
+    def delete_embeddings(self, metadata, **kwargs):
+        return len(metadata), None
+
+
+class TestChurnRunner:
+    def test_refuse_without_delete(self, small_dataset):
+        with pytest.raises(RuntimeError, match="delete_embeddings"):
+            ChurnRunner(SyncDB(), small_dataset)
+
+    def test_sample_truths(self, small_dataset):
+        gt = small_dataset.gt_data["neighbors_id"]
+        upsert = ChurnRunner(DeleteDB(), small_dataset, num_writers=2, k=10)
+        upsert.stop()
+        assert [list(t) for t in upsert._sample_truths([(0, 1, [], [(0, 5), (0, 0)])])] == [list(gt[1][:10])]
+
+        runner = ChurnRunner(DeleteDB(), small_dataset, mode=ChurnMode.DELETE_INSERT, num_writers=2, k=10)
+        runner.stop()
+        # shard 0 is the row groups of ids 0-99 and 200-299, shard 1 of ids 100-199 and 300-399
+        samples = [
+            (0, 0, [], [(0, 0), (0, 0)]),
+            (0, 1, [], [(10, 110), (0, 0)]),  # ids 10-99 and 200-209 are missing
+            (0, 2, [], [(0, 0), (550, 650)]),  # cycled twice and wraps around, ids 350-399 and 100-149 are missing
+            (0, 3, [], [(0, 200), (0, 200)]),  # everything is missing
+        ]
+        truths = runner._sample_truths(samples)
+        assert list(truths[0]) == list(gt[0][:10])
+        missing = {*range(10, 100), *range(200, 210)}
+        assert list(truths[1]) == [i for i in gt[1] if i not in missing][:10]
+        missing = {*range(350, 400), *range(100, 150)}
+        assert list(truths[2]) == [i for i in gt[2] if i not in missing][:10]
+        assert truths[3] is None
+
+    def test_phase(self, small_dataset):
+        runner = ChurnRunner(DeleteDB(), small_dataset, churn_duration=10)
+        runner.stop()
+        assert [runner._phase(s, (10.5, 12.2)) for s in (9, 10, 12, 13)] == ["churn", "compact", "compact", "after"]
+        assert runner._phase(10, None) == "after"
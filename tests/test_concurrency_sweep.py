@@ -0,0 +1,17 @@
+import pytest
+
+from vectordb_bench.backend.runner.concurrency_sweep import AdaptiveConcurrencySweep
+
+
+class TestAdaptiveConcurrencySweep:
+    @pytest.mark.parametrize("slo, knee", [(None, 20), (0.01, 10)])
+    def test_find_knee(self, slo, knee):
+        sweep = AdaptiveConcurrencySweep(1, 100, latency_p99_slo=slo)
+        levels = []
+        for conc in sweep:
+            levels.append(conc)
+            sweep.record(conc, qps=min(conc, 20) * 100, latency_p99=conc * 0.001)
+
+        assert sweep.best() == knee
+        assert len(levels) == len(set(levels)) < 12
+        assert max(levels) <= 100
@@ -1,8 +1,14 @@
-from vectordb_bench.backend.dataset import Dataset
+from vectordb_bench.backend.dataset import Dataset, DataSetIterator, CustomDataset, DatasetManager
+from vectordb_bench import config
 import logging
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 from pydantic import ValidationError
 from vectordb_bench.backend.data_source import DatasetSource
+from vectordb_bench.backend.ground_truth import ExactGroundTruth
+from vectordb_bench.backend.clients import MetricType
 
 
 log = logging.getLogger("vectordb_bench")
@@ -20,6 +26,100 @@ class TestDataSet:
         assert cohere.label == "SMALL"
         assert cohere.dim == 768
 
+    def test_iter_shards(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "DATASET_LOCAL_DIR", tmp_path)
+        sift = Dataset.SIFT.manager(500_000)
+        sift.data_dir.mkdir(parents=True)
+        for i in range(2):
+            ids = np.arange(i * 500, (i + 1) * 500)
+            table = pa.table({"id": ids, "emb": list(np.random.rand(500, 4))})
+            pq.write_table(table, sift.data_dir / f"shuffle_train-{i:02d}-of-02.parquet", row_group_size=100)
+        sift.train_files = sorted(f.name for f in sift.data_dir.glob("shuffle_train*.parquet"))
+
+        shards = [
+            np.concatenate([df["id"].to_numpy() for df in DataSetIterator(sift, idx, 3)])
+            for idx in range(3)
+        ]
+        assert sorted(np.concatenate(shards)) == list(range(1000))
+        assert sum(len(df) for df in sift) == 1000
+        assert all(list(df.columns) == ["id"] for df in DataSetIterator(sift, columns=["id"]))
+
+        # resume a shard after the first rows, across row groups and files
+        for skip in (0, 50, 100, 450, 500, 777, 1000):
+            shard = np.concatenate([df["id"].to_numpy() for df in DataSetIterator(sift, 1, 3)])
+            resumed = [df["id"].to_numpy() for df in DataSetIterator(sift, 1, 3, skip_rows=skip)]
+            assert list(np.concatenate(resumed) if resumed else []) == list(shard[skip:])
+            located = DataSetIterator(sift, 1, 3).cursor(skip).position
+            assert located is None if skip >= len(shard) else located[2] == skip % 100
+
+        # the cursor moved forward by batches is at the position of a new cursor after the same rows
+        cursor = DataSetIterator(sift, 1, 3).cursor(30)
+        for rows in range(30, len(shard) + 60, 60):
+            assert cursor.position == DataSetIterator(sift, 1, 3).cursor(rows).position
+            cursor.advance(60)
+        assert cursor.position is None
+
+    @pytest.mark.parametrize("metric_type", [MetricType.L2, MetricType.IP, MetricType.COSINE])
+    def test_exact_ground_truth(self, tmp_path, metric_type):
+        rng = np.random.default_rng(7)
+        train, queries = rng.random((1000, 8), dtype=np.float32), rng.random((20, 8), dtype=np.float32)
+        for i in range(2):
+            table = pa.table({"id": np.arange(i * 500, (i + 1) * 500), "emb": list(train[i * 500 : (i + 1) * 500])})
+            pq.write_table(table, tmp_path / f"train-{i:02d}-of-02.parquet")
+        files = ["train-00-of-02.parquet", "train-01-of-02.parquet"]
+
+        if metric_type == MetricType.L2:
+            scores = -((queries[:, None, :] - train[None, :, :]) ** 2).sum(-1)
+        elif metric_type == MetricType.IP:
+            scores = queries @ train.T
+        else:
+            scores = (queries / np.linalg.norm(queries, axis=1)[:, None]) @ (train / np.linalg.norm(train, axis=1)[:, None]).T
+
+        gt = ExactGroundTruth(tmp_path, files, "test", metric_type, k=10, block_rows=64, num_workers=2)
+        expected = np.argsort(-scores, axis=1, kind="stable")[:, :10]
+        assert (gt.compute(queries) == expected).mean() > 0.99
+
+        filtered = ExactGroundTruth(tmp_path, files, "test", metric_type, k=10, filter_id=900, block_rows=64)
+        neighbors = filtered.compute(queries)
+        assert (neighbors >= 900).all()
+        assert (neighbors == 900 + np.argsort(-scores[:, 900:], axis=1, kind="stable")[:, :10]).mean() > 0.99
+
+    @pytest.mark.parametrize("metric_type", [MetricType.L2, MetricType.IP])
+    def test_exact_ground_truth_ties(self, tmp_path, metric_type):
+        # small integer vectors, the scores are exact and many are equal at the k-th place
+        rng = np.random.default_rng(7)
+        train, queries = rng.integers(0, 3, (1000, 4)), rng.integers(0, 3, (20, 4))
+        pq.write_table(pa.table({"id": np.arange(1000), "emb": list(train.astype(np.float32))}), tmp_path / "train.parquet")
+        if metric_type == MetricType.L2:
+            scores = -((queries[:, None, :] - train[None, :, :]) ** 2).sum(-1)
+        else:
+            scores = queries @ train.T
+
+        gt = ExactGroundTruth(tmp_path, ["train.parquet"], "test", metric_type, k=10, block_rows=64, block_queries=3, num_workers=2)
+        expected = np.argsort(-scores, axis=1, kind="stable")[:, :10]
+        assert (gt.compute(queries.astype(np.float32)) == expected).all()
+
+    def test_prepare_computes_ground_truth(self, tmp_path):
+        rng = np.random.default_rng(7)
+        pq.write_table(pa.table({"id": np.arange(300), "emb": list(rng.random((300, 4)))}), tmp_path / "train.parquet")
+        pq.write_table(pa.table({"id": np.arange(5), "emb": list(rng.random((5, 4)))}), tmp_path / "test.parquet")
+        dataset = DatasetManager(data=CustomDataset(
+            name="custom", size=300, dim=4, metric_type=MetricType.L2, use_shuffled=False,
+            with_gt=True, dir=str(tmp_path), file_num=1,
+        ))
+
+        dataset.prepare(filters=0.5)
+        assert dataset.gt_data.shape[0] == 5
+        assert all(min(neighbors) >= 150 for neighbors in dataset.gt_data["neighbors_id"])
+        gt_file = tmp_path / ExactGroundTruth(tmp_path, ["train.parquet"], "", MetricType.L2, filter_id=150).file_name
+        mtime = gt_file.stat().st_mtime_ns
+
+        # cached by the key
+        dataset.prepare(filters=0.5)
+        assert gt_file.stat().st_mtime_ns == mtime
+        dataset.prepare()
+        assert len(list(tmp_path.joinpath("ground_truth").glob("*.parquet"))) == 2
+
     def test_cohere_error(self):
         with pytest.raises(ValidationError):
             Dataset.COHERE.get(9999)
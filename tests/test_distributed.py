@@ -0,0 +1,38 @@
+import pytest
+
+from vectordb_bench import config
+from vectordb_bench.backend.runner.distributed import AgentLevels, authkey, parse_address, run_agent
+from vectordb_bench.backend.runner.concurrency_sweep import max_concurrency
+
+
+class TestDistributed:
+    def test_parse_address(self):
+        assert parse_address("0.0.0.0:7788") == ("0.0.0.0", 7788)
+        assert parse_address("bench-host:80") == ("bench-host", 80)
+        for address in ("bench-host", ":80", "bench-host:port"):
+            with pytest.raises(ValueError):
+                parse_address(address)
+
+    def test_agent_levels(self):
+        class Conn:
+            def __init__(self, messages):
+                self.messages = list(messages)
+
+            def recv(self):
+                return self.messages.pop(0)
+
+        levels = AgentLevels(Conn([("level", 1), ("level", 4), ("stop", None), ("level", 8)]), 8)
+        assert max_concurrency(levels) == 8
+        assert not levels.stopped
+        assert list(levels) == [1, 4]
+        assert levels.stopped
+
+    def test_authkey_required(self, monkeypatch):
+        monkeypatch.setattr(config, "DISTRIBUTED_AUTHKEY", "")
+        with pytest.raises(ValueError):
+            authkey()
+        with pytest.raises(ValueError):
+            run_agent("127.0.0.1:7788", once=True)
+
+        monkeypatch.setattr(config, "DISTRIBUTED_AUTHKEY", "secret")
+        assert authkey() == b"secret"
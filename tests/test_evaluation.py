@@ -0,0 +1,24 @@
+import pytest
+import numpy as np
+
+from vectordb_bench.backend.runner import evaluation
+from vectordb_bench.metric import calc_recall, calc_ndcg, get_ideal_dcg
+
+
+class TestEvaluation:
+    def test_match_scalar_metrics(self):
+        k, rng = 10, np.random.default_rng(0)
+        ground_truth = [rng.choice(100, 20, replace=False) for _ in range(50)]
+        results = [rng.choice(30, rng.integers(0, k + 1), replace=False).tolist() for _ in range(50)]
+
+        ranks = evaluation.match_ground_truth(
+            evaluation.to_id_matrix(results, k),
+            evaluation.to_id_matrix(ground_truth, k),
+        )
+        recalls = evaluation.calc_recalls(ranks, k)
+        ndcgs = evaluation.calc_ndcgs(ranks, k)
+        for i, (gt, got) in enumerate(zip(ground_truth, results, strict=True)):
+            assert recalls[i] == pytest.approx(calc_recall(k, gt[:k], got))
+            assert ndcgs[i] == pytest.approx(calc_ndcg(gt[:k], got, get_ideal_dcg(k)))
+
+        assert evaluation.distribution(recalls)["mean"] == round(np.mean(recalls), 4)
@@ -0,0 +1,55 @@
+import time
+import queue
+from contextlib import contextmanager
+
+import numpy as np
+
+from vectordb_bench.backend.runner.freshness import FreshnessProbe
+
+
+class VisibleAfterDB:
+    """returns a row once it has been searched `after` times"""
+    def __init__(self, after: int):
+        self.after = after
+        self.searched = {}
+
+    @contextmanager
+    def init(self):
+        yield
+
+    def search_embedding(self, query, k=100, filters=None):
+        row = int(query[0])
+        self.searched[row] = self.searched.get(row, 0) + 1
+        return [row] if self.searched[row] > self.after else []
+
+
+class TestFreshnessProbe:
+    def test_probe(self):
+        probe = FreshnessProbe(VisibleAfterDB(after=2), samples=2)
+        probe.queue = queue.Queue()
+        embeddings = np.arange(10, dtype=np.float32).reshape(10, 1)
+        probe.submit(embeddings[:5], list(range(5)))
+        probe.submit(embeddings[5:], list(range(5, 10)))
+        probe.queue.put(None)
+
+        res = probe.probe()
+        assert res["probed"] == 4 and res["visible"] == 4 and res["timeouts"] == 0
+        assert res["latency"]["p50"] > 0
+        assert sum(b["visible"] for b in res["timeline"]) == 4
+
+    def test_timeout(self):
+        probe = FreshnessProbe(VisibleAfterDB(after=10**6), samples=1, timeout=0.1)
+        probe.queue = queue.Queue()
+        probe.submit(np.zeros((3, 1), dtype=np.float32), [0, 1, 2])
+        probe.queue.put(None)
+
+        s = time.time()
+        res = probe.probe()
+        assert res["visible"] == 0 and res["timeouts"] == 1
+        assert time.time() - s < 1
+
+    def test_abort(self):
+        probe = FreshnessProbe(VisibleAfterDB(after=0))
+        probe.queue = queue.Queue()
+        probe.queue.put(False)
+        assert probe.probe() == {}
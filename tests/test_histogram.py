@@ -0,0 +1,23 @@
+import pickle
+
+import pytest
+import numpy as np
+
+from vectordb_bench.backend.runner.histogram import LatencyHistogram
+
+
+class TestLatencyHistogram:
+    def test_percentile_and_merge(self):
+        latencies = np.random.lognormal(mean=-6, sigma=1, size=20_000)
+        first, second = LatencyHistogram(), LatencyHistogram()
+        for lat in latencies[:10_000]:
+            first.record(lat)
+        second.record_many(latencies[10_000:])
+
+        merged = pickle.loads(pickle.dumps(first)).merge(pickle.loads(pickle.dumps(second)))
+        assert merged.count == len(latencies)
+        for p in [50, 90, 99, 99.9]:
+            expected = np.percentile(latencies, p, method="inverted_cdf")
+            assert merged.percentile(p) == pytest.approx(expected, rel=5e-3, abs=2e-6)
+        assert merged.max == pytest.approx(latencies.max(), abs=1e-6)
+        assert set(merged.summary()) >= {"p50", "p99", "p99.9", "max", "mean"}
@@ -0,0 +1,48 @@
+from vectordb_bench.backend.runner.mixed_runner import MixedReadWriteRunner
+from vectordb_bench.backend.runner.timeline import Timeline
+from ut_clients import SyncDB
+
+
+class TestMixedReadWriteRunner:
+    def test_sample_truths(self, small_dataset):
+        runner = MixedReadWriteRunner(SyncDB(), small_dataset, num_writers=2, k=10)
+        runner.stop()
+        # shard 0 is the row groups of ids 0-99 and 200-299, shard 1 of ids 100-199 and 300-399
+        shards = [[*range(0, 100), *range(200, 300)], [*range(100, 200), *range(300, 400)]]
+        gt = small_dataset.gt_data["neighbors_id"]
+
+        samples = [(0, 0, [], [0, 0]), (0, 1, [], [150, 30]), (1, 2, [], [3, 2]), (2, 3, [], [200, 200])]
+        truths = runner._sample_truths(samples)
+        assert truths[0] is None and truths[2] is None
+        inserted = set(shards[0][:150]) | set(shards[1][:30])
+        assert list(truths[1]) == [i for i in gt[1] if i in inserted][:10]
+        assert list(truths[3]) == list(gt[3][:10])
+
+    def test_score_and_series(self, small_dataset):
+        runner = MixedReadWriteRunner(SyncDB(), small_dataset, num_writers=2, k=10)
+        runner.stop()
+        gt = small_dataset.gt_data["neighbors_id"]
+
+        samples = [
+            (0, 0, [], [1, 1]),  # fewer than k inserted, skipped
+            (1, 0, list(gt[0][:10]), [200, 200]),
+            (1, 1, list(gt[1][:5]), [200, 200]),
+            (3, 2, list(gt[2][:10]), [200, 200]),
+        ]
+        recalls = runner._score(samples)
+        assert recalls == {1: [1.0, 0.5], 3: [1.0]}
+
+        writes, reads = Timeline(start=0.0), Timeline(start=0.0)
+        writes.record(0.01, count=100, end=0.5)
+        writes.record(0.01, count=300, end=2.5)
+        writes.record_error(end=2.6)
+        for end in [0.1, 1.2, 1.3, 3.5]:
+            reads.record(0.002, end=end)
+
+        series = runner._series(writes, reads, recalls)
+        assert [s["second"] for s in series] == [0, 1, 2, 3]
+        assert [s["inserted"] for s in series] == [100, 100, 400, 400]
+        assert [s["insert_errors"] for s in series] == [0, 0, 1, 0]
+        assert [s["search_count"] for s in series] == [1, 2, 0, 1]
+        assert [s["recall"] for s in series] == [None, 0.75, None, 1.0]
+        assert [s["recall_samples"] for s in series] == [0, 2, 0, 1]
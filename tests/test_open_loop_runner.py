@@ -0,0 +1,43 @@
+import time
+import asyncio
+
+import pytest
+import numpy as np
+
+from vectordb_bench.backend.runner.open_loop_runner import OpenLoopSearchRunner
+from ut_clients import AsyncDB
+
+
+class FlakyDB(AsyncDB):
+    """of every 3 queries, the first fails, the second hangs and the third returns"""
+    def __init__(self):
+        super().__init__()
+        self.searched = 0
+
+    async def search_embedding_async(self, query, k=100, filters=None):
+        self.searched += 1
+        if self.searched % 3 == 1:
+            raise RuntimeError("search failed")
+        if self.searched % 3 == 2:
+            await asyncio.sleep(3600)
+        return list(range(k))
+
+
+class TestOpenLoopSearchRunner:
+    def test_open_loop_target_qps(self):
+        data = np.random.rand(10, 4)
+        with pytest.raises(ValueError):
+            OpenLoopSearchRunner(AsyncDB(), data, target_qps_list=[])
+        assert OpenLoopSearchRunner(AsyncDB(), data, target_qps_list=iter([10, 20])).target_qps_list == [10, 20]
+
+    def test_errors_and_timeouts(self):
+        runner = OpenLoopSearchRunner(FlakyDB(), np.random.rand(10, 4), target_qps_list=[300], duration=1, timeout=0.1)
+        s = time.perf_counter()
+        max_qps, _, qps_list, p99_list, _, error_count_list, success_ratio_list = runner._run_in_loop()
+        assert time.perf_counter() - s < 3
+
+        # the failed and timed-out queries are in the latencies, the timed-out ones are the tail
+        assert error_count_list[0] == pytest.approx(200, abs=3)
+        assert success_ratio_list[0] == pytest.approx(1 / 3, abs=0.01)
+        assert max_qps == qps_list[0] == pytest.approx(100, rel=0.1)
+        assert p99_list[0] >= 0.1
@@ -1,8 +1,15 @@
 from typing import Iterable
 import argparse
+import threading
+
+import pytest
+import numpy as np
 from vectordb_bench.backend.dataset import Dataset, DatasetSource
 from vectordb_bench.backend.runner.rate_runner import RatedMultiThreadingInsertRunner
+from vectordb_bench.backend.runner.timeline import Timeline
 from vectordb_bench.backend.runner.read_write_runner import ReadWriteRunner
+from vectordb_bench.backend.runner.mixed_runner import MixedReadWriteRunner
+from vectordb_bench.backend.runner.churn_runner import ChurnRunner, ChurnMode
 from vectordb_bench.backend.clients import DB, VectorDB
 from vectordb_bench.backend.clients.milvus.config import FLATConfig
 from vectordb_bench.backend.clients.zilliz_cloud.config import AutoIndexConfig
@@ -12,6 +19,34 @@ import logging
 log = logging.getLogger("vectordb_bench")
 log.setLevel(logging.DEBUG)
 
+class ErrorInsertDB:
+    """returns an error tuple for inserts of the rows from `fail_from`"""
+    def __init__(self, fail_from: int):
+        self.fail_from = fail_from
+        self.inserted = 0
+
+    def insert_embeddings(self, embeddings, metadata):
+        if metadata[-1] >= self.fail_from:
+            return 0, RuntimeError("insert rejected")
+        self.inserted += len(metadata)
+        return len(metadata), None
+
+
+class TestRatedInsertRunner:
+    def test_insert_error(self):
+        db = ErrorInsertDB(fail_from=10)
+        runner = RatedMultiThreadingInsertRunner(rate=100, db=db, dataset_iter=None)
+        timeline, lock = Timeline(), threading.Lock()
+        emb = np.zeros((10, 2), dtype=np.float32)
+        runner.send_insert_task(db, emb, list(range(10)), timeline, lock)
+        with pytest.raises(RuntimeError, match="insert rejected"):
+            runner.send_insert_task(db, emb, list(range(10, 20)), timeline, lock)
+
+        assert db.inserted == 10
+        assert timeline.count() == 10
+        assert sum(b["errors"] for b in timeline.to_list()) == 1
+
+
 def get_rate_runner(db):
     cohere = Dataset.COHERE.manager(100_000)
     prepared = cohere.prepare(DatasetSource.AliyunOSS)
@@ -50,6 +85,43 @@ def test_read_write_runner(db, insert_rate, conc: list, search_stage: Iterable[f
     rw_runner.run_read_write()
 
 
+def run_mixed_runner(db, insert_rate, num_writers: int, num_readers: int, read_dur_after_write: int):
+    cohere = Dataset.COHERE.manager(1_000_000)
+    prepared = cohere.prepare(DatasetSource.S3)
+    assert prepared
+
+    runner = MixedReadWriteRunner(
+        db=db,
+        dataset=cohere,
+        insert_rate=insert_rate,
+        num_writers=num_writers,
+        num_readers=num_readers,
+        read_dur_after_write=read_dur_after_write,
+    )
+    for second in runner.run():
+        log.info(second)
+
+
+def run_churn_runner(db, churn_rate: float, churn_duration: int, mode: ChurnMode = ChurnMode.UPSERT):
+    cohere = Dataset.COHERE.manager(1_000_000)
+    prepared = cohere.prepare(DatasetSource.S3)
+    assert prepared
+
+    # the whole dataset should be loaded before churn
+    run_mixed_runner(db, insert_rate=10_000, num_writers=4, num_readers=1, read_dur_after_write=0)
+
+    runner = ChurnRunner(
+        db=db,
+        dataset=cohere,
+        churn_rate=churn_rate,
+        churn_duration=churn_duration,
+        mode=mode,
+        compact=True,
+    )
+    for second in runner.run():
+        log.info(second)
+
+
 def get_db(db: str, config: dict) -> VectorDB:
     if db == DB.Milvus.name:
         return DB.Milvus.init_cls(dim=768, db_config=config, db_case_config=FLATConfig(metric_type="COSINE"), drop_old=True, pre_load=True)
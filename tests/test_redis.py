@@ -1,4 +1,5 @@
 import logging
+import pytest
 from vectordb_bench.models import (
     DB,
 )
@@ -16,7 +17,15 @@ dict['port'] = 6379
 dict['password'] = "redis"
 
 
+def redis_available() -> bool:
+    try:
+        import redis
+        return redis.Redis(host=dict['host'], port=dict['port'], password=dict['password']).ping()
+    except Exception:
+        return False
 
+
+@pytest.mark.skipif(not redis_available(), reason="Redis is not running on localhost:6379")
 class TestRedis:
     def test_insert_and_search(self):
         assert DB.Redis.value == "Redis"
@@ -103,5 +112,39 @@ class TestRedis:
                 query=q, k=100, filters={"metadata": filter_value, "id": 9999}
             )
             assert (
-                res[0] == 9999 and len(res) == 1, f"filters failed, got: ({res[0]}), expected ({9999})"
-            )
\ No newline at end of file
+                res[0] == 9999 and len(res) == 1
+            ), f"filters failed, got: ({res[0]}), expected ({9999})"
+
+    def test_delete_and_upsert(self):
+        dbcls = DB.Redis.init_cls
+
+        dim = 16
+        rdb = dbcls(
+            dim=dim,
+            db_config=dict,
+            db_case_config=None,
+            indice="test_redis",
+            drop_old=True,
+        )
+
+        count = 1_000
+        embeddings = [[np.random.random() for _ in range(dim)] for _ in range(count)]
+
+        with rdb.init():
+            assert rdb.support_delete()
+            res = rdb.insert_embeddings(embeddings=embeddings, metadata=range(count))
+            assert res[0] == count
+
+            # delete the first half
+            res = rdb.delete_embeddings(metadata=list(range(count // 2)))
+            assert res == (count // 2, None), f"delete returns {res}"
+            assert rdb.conn.dbsize() == count - count // 2
+
+            # upsert all back, the existing ones are replaced
+            res = rdb.upsert_embeddings(embeddings=embeddings, metadata=range(count))
+            assert res[0] == count
+            assert rdb.conn.dbsize() == count
+
+            test_id = np.random.randint(count // 2)
+            res = rdb.search_embedding(query=embeddings[test_id], k=100)
+            assert res[0] == int(test_id), f"the most nearest neighbor ({res[0]}) id is not test_id ({test_id})"
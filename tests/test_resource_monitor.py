@@ -0,0 +1,28 @@
+import time
+import logging
+
+from vectordb_bench.backend.runner.resource_monitor import ResourceMonitor
+
+log = logging.getLogger(__name__)
+
+
+class TestResourceMonitor:
+    def test_busy_client(self):
+        with ResourceMonitor(interval=0.05, threshold=0.5) as monitor:
+            end = time.process_time() + 0.3
+            while time.process_time() < end:
+                pass
+        summary = monitor.summary()
+        log.info(summary)
+        assert summary["processes"] >= 1
+        assert summary["process_cpu_max"] >= 0.5
+        assert summary["rss_max"] > 0
+        assert summary["client_bound"]
+
+    def test_idle_client(self):
+        with ResourceMonitor(interval=0.05) as monitor:
+            time.sleep(0.3)
+        summary = monitor.summary()
+        assert summary["duration"] >= 0.3
+        assert summary["ctx_switches_voluntary"] >= 0
+        assert not summary["client_bound"]
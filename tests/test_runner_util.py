@@ -0,0 +1,64 @@
+import pickle
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from vectordb_bench.backend.runner.util import SharedNDArray, PrefetchIterator, get_data
+
+
+class TestSharedNDArray:
+    def test_pickle_shares_buffer(self):
+        data = np.random.rand(100, 8).astype(np.float32)
+        shared = SharedNDArray(data)
+
+        attached = pickle.loads(pickle.dumps(shared))
+        assert len(pickle.dumps(shared)) < data.nbytes
+        assert not attached.is_owner
+        assert np.array_equal(attached[10], data[10])
+        with pytest.raises(ValueError):
+            attached.array[0, 0] = 1.0
+
+        attached.close()
+        shared.close()
+        with pytest.raises(RuntimeError):
+            _ = shared.array
+
+
+class TestGetData:
+    @pytest.mark.parametrize("normalize", [True, False])
+    def test_float32_array(self, normalize):
+        df = pd.DataFrame({"id": [3, 1, 2], "emb": list(np.random.rand(3, 8))})
+        embeddings, ids = get_data(df, normalize)
+
+        assert ids == [3, 1, 2]
+        assert embeddings.dtype == np.float32 and embeddings.flags.c_contiguous
+        assert embeddings.shape == (3, 8)
+        if normalize:
+            assert np.allclose(np.linalg.norm(embeddings, axis=1), 1)
+
+        as_list, _ = get_data(df, normalize, as_list=True)
+        assert isinstance(as_list, list) and as_list == embeddings.tolist()
+
+
+class TestPrefetchIterator:
+    @pytest.mark.parametrize("depth", [0, 1, 4])
+    def test_order(self, depth):
+        with PrefetchIterator(range(100), lambda x: x * 2, depth=depth) as it:
+            assert list(it) == [x * 2 for x in range(100)]
+
+    def test_raise_in_consumer(self):
+        def source():
+            yield 1
+            raise ValueError("broken file")
+
+        with PrefetchIterator(source(), depth=2) as it:
+            assert next(it) == 1
+            with pytest.raises(ValueError):
+                next(it)
+
+    def test_close_early(self):
+        it = PrefetchIterator(range(10_000), depth=2)
+        assert next(it) == 0
+        it.close()
+        assert not it._thread.is_alive()
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from vectordb_bench.backend.clients.api import SearchPhase, SearchPhases
+from vectordb_bench.backend.runner.checkpoint import LoadCheckpoint
+from vectordb_bench.backend.runner.histogram import LatencyHistogram
+from vectordb_bench.backend.runner.serial_runner import OTHER_PHASE, record_search_phases, search_breakdown, SerialSearchRunner, SerialInsertRunner
+from ut_clients import SyncDB
+
+
+class TestSearchBreakdown:
+    def test_phases(self):
+        phases = SearchPhases()
+        phases.start(time.perf_counter())
+        time.sleep(0.01)
+        phases.mark(SearchPhase.ENCODE)
+        phases.mark(SearchPhase.TRANSPORT)
+        assert list(phases.durations) == [SearchPhase.ENCODE, SearchPhase.TRANSPORT]
+        assert phases.durations[SearchPhase.ENCODE] >= 0.01
+        assert phases.durations[SearchPhase.TRANSPORT] < 0.01
+
+    def test_breakdown(self):
+        latencies, phase_latencies = LatencyHistogram(), {}
+        for _ in range(10):
+            latencies.record(0.01)
+            record_search_phases(phase_latencies, {SearchPhase.ENCODE: 0.001, SearchPhase.TRANSPORT: 0.008}, 0.01)
+        breakdown = search_breakdown(phase_latencies, latencies)
+        assert list(breakdown) == ["encode", "transport", OTHER_PHASE]
+        assert breakdown["transport"]["share"] == pytest.approx(0.8, abs=0.01)
+        assert breakdown[OTHER_PHASE]["share"] == pytest.approx(0.1, abs=0.01)
+        assert search_breakdown({}, latencies) == {}
+
+
+class DeeperIsBetterDB(SyncDB):
+    """like indexes raising ef to k, a deeper search finds more of the true neighbors"""
+    def search_embedding(self, query, k=100, filters=None):
+        return list(range(k)) if k > 10 else list(range(5)) + list(range(1000, 1000 + k - 5))
+
+
+class TestSerialSearchRunner:
+    def test_headline_metrics_at_k(self):
+        gt = pd.DataFrame({"neighbors_id": [np.arange(100) for _ in range(20)]})
+        runner = SerialSearchRunner(DeeperIsBetterDB(), np.random.rand(20, 4), gt, k=10, recall_k_list=[10, 100])
+        recall, *_, recall_curve, ndcg_curve, breakdown = runner.search((runner.test_data, gt))
+        assert recall == 0.5
+        assert recall_curve == {10: 1.0, 100: 1.0}
+
+
+class TestSerialInsertRunner:
+    def test_checkpoint_cleared_after_load(self, small_dataset):
+        checkpoint = LoadCheckpoint(small_dataset, "test")
+        runner = SerialInsertRunner(SyncDB(), small_dataset, False, checkpoint=checkpoint)
+        (count, _, _, resumed_rows), _ = runner.run()
+        assert count == 400 and resumed_rows is None
+        assert not checkpoint.exists()
+
+        # a load interrupted after the first row group
+        checkpoint.save(0, 1, 100, ("train.parquet", 1, 0))
+        runner = SerialInsertRunner(SyncDB(), small_dataset, False, checkpoint=checkpoint, resume=True)
+        (count, _, _, resumed_rows), _ = runner.run()
+        assert (count, resumed_rows) == (300, 100)
+        assert not checkpoint.exists()
@@ -0,0 +1,40 @@
+import pickle
+
+import pytest
+import numpy as np
+
+from vectordb_bench.backend.runner.timeline import Timeline
+
+
+class TestTimeline:
+    def test_merge_and_skip(self):
+        first, second = Timeline(start=0.0), Timeline(start=0.0)
+        for end in [0.1, 0.5, 2.2]:
+            first.record(0.01, end=end)
+        second.record(0.02, count=10, end=2.9)
+        second.record_error(end=0.3)
+
+        timeline = pickle.loads(pickle.dumps(first)).merge(second)
+        buckets = timeline.to_list()
+        assert [b["count"] for b in buckets] == [2, 0, 11]
+        assert [b["errors"] for b in buckets] == [1, 0, 0]
+        assert buckets[2]["latency_max"] == pytest.approx(0.02, rel=1e-2)
+        assert timeline.qps(3.0) == pytest.approx(13 / 3)
+        assert timeline.qps(3.0, skip_seconds=2) == pytest.approx(11)
+
+    def test_sparse_bucket_percentiles(self):
+        latencies = np.random.default_rng(0).lognormal(mean=-5, sigma=1, size=10_000)
+        first, second = Timeline(start=0.0), Timeline(start=0.0)
+        for lat in latencies[:5000]:
+            first.record(lat, end=0.5)
+        for lat in latencies[5000:]:
+            second.record(lat, end=0.5)
+        first.record(0.001, end=1.5)
+
+        bucket = pickle.loads(pickle.dumps(first)).merge(pickle.loads(pickle.dumps(second))).buckets[0]
+        assert bucket.count == len(latencies)
+        assert len(bucket._indexes) < 200
+        for p in [50, 99]:
+            expected = np.percentile(latencies, p, method="inverted_cdf")
+            assert bucket.percentile(p) == pytest.approx(expected, rel=2**-4)
+        assert bucket.latency_max == pytest.approx(latencies.max(), abs=1e-6)
@@ -0,0 +1,36 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from vectordb_bench.backend.runner.trace import QueryTrace
+
+
+class TestQueryTrace:
+    def test_write_and_read(self, tmp_path):
+        gt = np.array([[0, 1, 2], [3, 4, 5], [6, 7, 8]])
+        trace = QueryTrace(tmp_path, "run1", "Milvus", "Performance768D1M", ground_truth=gt, k=2, buffer_rows=2)
+        with trace.writer("serial") as w:
+            w.record(0, time.perf_counter(), 0.01, [0, 1, 2])
+            w.record(1, time.perf_counter(), 0.02, [4, 9])
+            w.record(2, time.perf_counter(), 0.03, [])
+        with trace.writer("concurrent", concurrency=5, worker=3) as w:
+            w.record(2, time.perf_counter(), 0.04, [7, 6])
+        with trace.writer("concurrent", concurrency=10):
+            pass
+
+        df = pd.read_parquet(tmp_path).sort_values(["stage", "query_idx"])
+        assert len(df) == 4
+        assert list(df["stage"].astype(str)) == ["concurrent", "serial", "serial", "serial"]
+        assert list(df["concurrency"].astype(int)) == [5, 1, 1, 1]
+        assert set(df["run_id"].astype(str)) == {"run1"}
+        assert list(df["worker"]) == [3, 0, 0, 0]
+        assert list(df["recall"]) == [1.0, 1.0, 0.5, 0.0]
+        assert [list(ids) for ids in df["result_ids"]] == [[7, 6], [0, 1, 2], [4, 9], []]
+        assert abs(df["send_ts"].iloc[0] - time.time()) < 60
+        assert len(list(tmp_path.glob("run_id=run1/db=Milvus/case=*/stage=serial/concurrency=1/*.parquet"))) == 1
+
+        trace = QueryTrace(tmp_path / "no_gt", "run1", "Milvus", "Performance768D1M")
+        with trace.writer("serial") as w:
+            w.record(0, time.perf_counter(), 0.01, [1])
+        assert pd.read_parquet(tmp_path / "no_gt")["recall"].isna().all()
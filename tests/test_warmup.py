@@ -0,0 +1,47 @@
+from vectordb_bench.backend.runner.warmup import Warmup, STEADY_STATE_WINDOW
+
+
+class TestWarmup:
+    def test_duration_and_queries(self):
+        warmup = Warmup(duration=2, queries=300)
+        warmup.start(now=0)
+        for i in range(400):
+            end = i * 0.01
+            if warmup.done(end):
+                break
+            warmup.record(0.01, end)
+
+        assert warmup.count == 300
+        assert warmup.summary()["queries"] == 300
+        assert not Warmup().enabled
+
+    def test_steady_state(self):
+        warmup = Warmup(steady_state=True)
+        warmup.start(now=0)
+        # ramps up for 3 seconds, then 100 queries per second
+        for second in range(20):
+            n = 100 if second >= 3 else 10 * (second + 1)
+            for i in range(n):
+                warmup.record(0.001, second + i / n)
+            if warmup.done(second + 1):
+                break
+
+        assert second + 1 == 3 + STEADY_STATE_WINDOW
+
+        merged = Warmup(steady_state=True)
+        merged.start(now=0)
+        merged.merge(warmup)
+        assert merged.count == warmup.count
+
+    def test_done_all(self):
+        merged = Warmup(queries=100, steady_state=True)
+        merged.start(now=0)
+        # two workers, each steady at 50 queries per second, one behind on the queries
+        fast = (400, {s: 50 for s in range(8)})
+        slow = (90, {s: 50 for s in range(8)})
+        assert not merged.done_all([fast], workers=2, now=8)
+        assert not merged.done_all([fast, slow], workers=2, now=8)
+        assert merged.count == 90 and merged.per_second[0] == 100
+
+        slow = (110, {s: 50 for s in range(8)})
+        assert merged.done_all([fast, slow], workers=2, now=8)
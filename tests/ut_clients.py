@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from vectordb_bench.backend.clients.api import VectorDB
+
+
+class SyncDB(VectorDB):
+    def __init__(self, thread_safe: bool = False):
+        self.thread_safe = thread_safe
+
+    @contextmanager
+    def init(self):
+        yield
+
+    def insert_embeddings(self, embeddings, metadata, **kwargs):
+        return len(metadata), None
+
+    def search_embedding(self, query, k=100, filters=None):
+        return list(range(k))
+
+    def thread_safe_search(self) -> bool:
+        return self.thread_safe
+
+    def optimize(self):
+        pass
+
+    def ready_to_load(self):
+        pass
+
+
+class AsyncDB(SyncDB):
+    async def search_embedding_async(self, query, k=100, filters=None):
+        return list(range(k))
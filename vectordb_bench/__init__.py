@@ -18,6 +18,22 @@ class config:
     DEFAULT_DATASET_URL = env.str("DEFAULT_DATASET_URL", AWS_S3_URL)
     DATASET_LOCAL_DIR = env.path("DATASET_LOCAL_DIR", "/tmp/vectordb_bench/dataset")
     NUM_PER_BATCH = env.int("NUM_PER_BATCH", 100)
+    LOAD_PREFETCH_DEPTH = env.int("LOAD_PREFETCH_DEPTH", 2)  # batches decoded ahead of the insert calls, 0 disables prefetching
+    CAPACITY_NUM_PER_BATCH = env.int("CAPACITY_NUM_PER_BATCH", 1000)  # rows per insert request of the capacity cases
+    TRACE_BUFFER_ROWS = env.int("TRACE_BUFFER_ROWS", 100_000)  # queries per record batch of the query traces
+    OPEN_LOOP_REQUEST_TIMEOUT = env.float("OPEN_LOOP_REQUEST_TIMEOUT", 10.0)  # seconds an open-loop query waits before it fails
+
+    DISTRIBUTED_ADDRESS = env.str("DISTRIBUTED_ADDRESS", "127.0.0.1:7788")  # coordinator of the distributed concurrent search, loopback only by default
+    DISTRIBUTED_AUTHKEY = env.str("DISTRIBUTED_AUTHKEY", "")  # secret shared by the coordinator and its agents, required by both
+    DISTRIBUTED_CONNECT_TIMEOUT = env.int("DISTRIBUTED_CONNECT_TIMEOUT", 600)  # seconds to wait for all the agents
+
+    GROUND_TRUTH_K = env.int("GROUND_TRUTH_K", 1000)  # neighbors of each query in the computed ground truth
+    GROUND_TRUTH_BLOCK_ROWS = env.int("GROUND_TRUTH_BLOCK_ROWS", 20_000)  # train rows scored in each matrix multiplication
+    GROUND_TRUTH_BLOCK_QUERIES = env.int("GROUND_TRUTH_BLOCK_QUERIES", 1000)  # queries scored in each matrix multiplication
+    GROUND_TRUTH_NUM_WORKERS = env.int("GROUND_TRUTH_NUM_WORKERS", 1)  # threads computing the ground truth
+
+    RESOURCE_SAMPLE_INTERVAL = env.float("RESOURCE_SAMPLE_INTERVAL", 1.0)  # seconds between samples of the client cpu and memory
+    CLIENT_BOUND_CPU_THRESHOLD = env.float("CLIENT_BOUND_CPU_THRESHOLD", 0.9)  # cpu utilization flagging a result client-bound
 
     DROP_OLD = env.bool("DROP_OLD", True)
     USE_SHUFFLED_DATA = env.bool("USE_SHUFFLED_DATA", True)
@@ -25,6 +41,9 @@ class config:
     NUM_CONCURRENCY = env.list("NUM_CONCURRENCY",  [1, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 90, 95, 100], subcast=int )
 
     CONCURRENCY_DURATION = 30
+    CONCURRENCY_SKIP_SECONDS = env.int("CONCURRENCY_SKIP_SECONDS", 0)  # leading seconds of each concurrency excluded from qps
+
+    BATCH_NQ_LIST = env.list("BATCH_NQ_LIST", [1, 32, 64, 128, 256], subcast=int)  # query vectors per request in batch cases
 
     RESULTS_LOCAL_DIR = env.path(
         "RESULTS_LOCAL_DIR", pathlib.Path(__file__).parent.joinpath("results")
@@ -47,6 +47,9 @@ class CaseType(Enum):
 
     Performance1536D50K = 50
 
+    Performance768D1MBatch = 60
+    Performance1536D500KBatch = 61
+
     Custom = 100
     PerformanceCustomDataset = 101
 
@@ -292,6 +295,36 @@ Results will show index building time, recall, and maximum QPS."""
     optimize_timeout: float | int | None = 15 * 60
 
 
+class BatchPerformanceCase(PerformanceCase):
+    """Search with nq query vectors per request
+
+    Fields:
+        nq_list(list[int]): query vectors per request to sweep, default config.BATCH_NQ_LIST
+    """
+
+    nq_list: list[int] = config.BATCH_NQ_LIST
+
+
+class Performance768D1MBatch(BatchPerformanceCase):
+    case_id: CaseType = CaseType.Performance768D1MBatch
+    dataset: DatasetManager = Dataset.COHERE.manager(1_000_000)
+    name: str = "Batch Search Performance Test (1M Dataset, 768 Dim)"
+    description: str = """This case tests the batch search throughput of a vector database with a medium dataset (<b>Cohere 1M vectors</b>, 768 dimensions), sending multiple query vectors in each request.
+Results will show index building time, recall, and the maximum number of query vectors searched per second."""
+    load_timeout: float | int = config.LOAD_TIMEOUT_768D_1M
+    optimize_timeout: float | int | None = config.OPTIMIZE_TIMEOUT_768D_1M
+
+
+class Performance1536D500KBatch(BatchPerformanceCase):
+    case_id: CaseType = CaseType.Performance1536D500KBatch
+    dataset: DatasetManager = Dataset.OPENAI.manager(500_000)
+    name: str = "Batch Search Performance Test (500K Dataset, 1536 Dim)"
+    description: str = """This case tests the batch search throughput of a vector database with a medium dataset (<b>OpenAI 500K vectors</b>, 1536 dimensions), sending multiple query vectors in each request.
+Results will show index building time, recall, and the maximum number of query vectors searched per second."""
+    load_timeout: float | int = config.LOAD_TIMEOUT_1536D_500K
+    optimize_timeout: float | int | None = config.OPTIMIZE_TIMEOUT_1536D_500K
+
+
 def metric_type_map(s: str) -> MetricType:
     if s.lower() == "cosine":
         return MetricType.COSINE
@@ -356,5 +389,7 @@ type2case = {
     CaseType.Performance1536D500K99P: Performance1536D500K99P,
     CaseType.Performance1536D5M99P: Performance1536D5M99P,
     CaseType.Performance1536D50K: Performance1536D50K,
+    CaseType.Performance768D1MBatch: Performance768D1MBatch,
+    CaseType.Performance1536D500KBatch: Performance1536D500KBatch,
     CaseType.PerformanceCustomDataset: PerformanceCustomDataset,
 }
@@ -1,8 +1,11 @@
+import time
+import asyncio
 from abc import ABC, abstractmethod
 from enum import Enum
 from typing import Any, Type
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 
+import numpy as np
 from pydantic import BaseModel, validator, SecretStr
 
 
@@ -29,6 +32,33 @@ class IndexType(str, Enum):
     GPU_CAGRA = "GPU_CAGRA"
 
 
+class SearchPhase(str, Enum):
+    ENCODE = "encode"  # build the request on the client, and round trips before it
+    TRANSPORT = "transport"  # send the request and wait for the response, including the serialization in the SDK
+    DECODE = "decode"  # parse the ids out of the response
+
+
+class SearchPhases:
+    """Time of the phases of the current search_embedding call, for the client-side overhead breakdown.
+
+    The runner calls start() with the time it starts the call, the client calls
+    VectorDB.mark_search_phase() at the end of each phase, each phase lasts from the
+    previous mark. The time not marked by the client is left to the runner.
+    """
+    def __init__(self):
+        self.durations: dict[SearchPhase, float] = {}
+        self._last = 0.0
+
+    def start(self, now: float):
+        self.durations = {}
+        self._last = now
+
+    def mark(self, phase: SearchPhase):
+        now = time.perf_counter()
+        self.durations[phase] = self.durations.get(phase, 0.0) + now - self._last
+        self._last = now
+
+
 class DBConfig(ABC, BaseModel):
     """DBConfig contains the connection info of vector database
 
@@ -103,7 +133,11 @@ class VectorDB(ABC):
 
     In each process, the benchmark cases ensure VectorDB.init() calls before any other methods operations
 
-    insert_embeddings, search_embedding, and, optimize will be timed for each call.
+    Embeddings and queries are passed as contiguous float32 np.ndarray, clients whose
+    SDK only takes python lists should return True in need_list_embeddings().
+
+    insert_embeddings, search_embedding, search_embeddings, and, optimize will be timed for each call.
+    Clients can split the time of search_embedding into SearchPhase by mark_search_phase().
 
     Examples:
         >>> milvus = Milvus()
@@ -150,10 +184,17 @@ class VectorDB(ABC):
         """Wheather this database need to normalize dataset to support COSINE"""
         return False
 
+    def need_list_embeddings(self) -> bool:
+        """Wheather this database needs embeddings and queries as python lists instead of np.ndarray.
+
+        The runners materialize lists outside of the timed calls only for these databases.
+        """
+        return False
+
     @abstractmethod
     def insert_embeddings(
         self,
-        embeddings: list[list[float]],
+        embeddings: np.ndarray | list[list[float]],
         metadata: list[int],
         **kwargs,
     ) -> (int, Exception):
@@ -161,7 +202,8 @@ class VectorDB(ABC):
         each insert_embeddings is 5000.
 
         Args:
-            embeddings(list[list[float]]): list of embedding to add to the vector database.
+            embeddings(np.ndarray | list[list[float]]): embeddings to add to the vector database,
+                in shape (n, dim), python lists if need_list_embeddings() is True.
             metadatas(list[int]): metadata associated with the embeddings, for filtering.
             **kwargs(Any): vector database specific parameters.
 
@@ -170,17 +212,96 @@ class VectorDB(ABC):
         """
         raise NotImplementedError
 
+    def delete_embeddings(
+        self,
+        metadata: list[int],
+        **kwargs,
+    ) -> (int, Exception):
+        """Delete the embeddings of the ids in metadata, used by the churn cases.
+
+        Optional, databases that don't override it can't run the churn cases.
+
+        Args:
+            metadata(list[int]): ids of the embeddings to delete, as inserted by insert_embeddings.
+            **kwargs(Any): vector database specific parameters.
+
+        Returns:
+            int: deleted data count
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} doesn't support delete_embeddings")
+
+    def upsert_embeddings(
+        self,
+        embeddings: np.ndarray | list[list[float]],
+        metadata: list[int],
+        **kwargs,
+    ) -> (int, Exception):
+        """Insert the embeddings, replacing the existing embeddings of the same ids.
+
+        Defaults to delete_embeddings then insert_embeddings, clients with a native
+        upsert API should override it.
+
+        Args:
+            embeddings(np.ndarray | list[list[float]]): embeddings to upsert, in shape (n, dim),
+                python lists if need_list_embeddings() is True.
+            metadata(list[int]): ids of the embeddings.
+            **kwargs(Any): vector database specific parameters.
+
+        Returns:
+            int: upserted data count
+        """
+        _, error = self.delete_embeddings(metadata, **kwargs)
+        if error is not None:
+            return 0, error
+        return self.insert_embeddings(embeddings, metadata, **kwargs)
+
+    def support_delete(self) -> bool:
+        """Wheather this database implements delete_embeddings"""
+        return type(self).delete_embeddings is not VectorDB.delete_embeddings
+
+    def count_embeddings(self, **kwargs) -> int:
+        """Count the embeddings in the database, used to verify a resumed load.
+
+        Optional, without it a resumed load trusts its checkpoint.
+
+        Returns:
+            int: embeddings inserted and not deleted
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} doesn't support count_embeddings")
+
+    def support_count(self) -> bool:
+        """Wheather this database implements count_embeddings"""
+        return type(self).count_embeddings is not VectorDB.count_embeddings
+
+    # set by the runners measuring the breakdown of search_embedding, None otherwise
+    search_phases: SearchPhases | None = None
+
+    def mark_search_phase(self, phase: SearchPhase):
+        """Optional hook in search_embedding, marks the end of phase of the current call.
+
+        Examples:
+            >>> request = self._build(query)
+            >>> self.mark_search_phase(SearchPhase.ENCODE)
+            >>> response = self.client.search(request)
+            >>> self.mark_search_phase(SearchPhase.TRANSPORT)
+            >>> ids = [hit.id for hit in response]
+            >>> self.mark_search_phase(SearchPhase.DECODE)
+        """
+        if self.search_phases is not None:
+            self.search_phases.mark(phase)
+
     @abstractmethod
     def search_embedding(
         self,
-        query: list[float],
+        query: np.ndarray | list[float],
         k: int = 100,
         filters: dict | None = None,
     ) -> list[int]:
         """Get k most similar embeddings to query vector.
 
         Args:
-            query(list[float]): query embedding to look up documents similar to.
+            query(np.ndarray | list[float]): query embedding to look up documents similar to,
+                a python list if need_list_embeddings() is True.
             k(int): Number of most similar embeddings to return. Defaults to 100.
             filters(dict, optional): filtering expression to filter the data while searching.
 
@@ -189,6 +310,67 @@ class VectorDB(ABC):
         """
         raise NotImplementedError
 
+    def search_embeddings(
+        self,
+        queries: np.ndarray,
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[list[int]]:
+        """Get k most similar embeddings for each of the query vectors in one call.
+
+        Defaults to calling search_embedding for every query, clients with a native
+        batch search API should override it to search all queries in one round trip.
+
+        Args:
+            queries(np.ndarray): query embeddings in shape (nq, dim).
+            k(int): Number of most similar embeddings to return for each query. Defaults to 100.
+            filters(dict, optional): filtering expression to filter the data while searching.
+
+        Returns:
+            list[list[int]]: k most similar embeddings IDs for each query, in the order of queries.
+        """
+        if self.need_list_embeddings():
+            queries = queries.tolist()
+        return [self.search_embedding(query, k, filters) for query in queries]
+
+    def thread_safe_search(self) -> bool:
+        """Wheather search_embedding of one client can run in several threads at once,
+        e.g. its SDK client is thread-safe and it shares no cursor or session state"""
+        return False
+
+    def support_async_search(self) -> bool:
+        """Wheather search_embedding_async can run concurrently, the client has a native
+        async API or the default thread pool fallback is safe by thread_safe_search()"""
+        return type(self).search_embedding_async is not VectorDB.search_embedding_async or self.thread_safe_search()
+
+    @asynccontextmanager
+    async def init_async(self) -> None:
+        """create and destory connections for search_embedding_async.
+
+        Defaults to self.init(), clients with native async APIs should override it
+        together with search_embedding_async.
+
+        Examples:
+            >>> async with self.init_async():
+            >>>     await self.search_embedding_async()
+        """
+        with self.init():
+            yield
+
+    async def search_embedding_async(
+        self,
+        query: np.ndarray | list[float],
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[int]:
+        """Async version of search_embedding, used by the asyncio search runner.
+
+        Defaults to offloading the blocking search_embedding to the event loop's
+        default thread pool, for clients that only have sync APIs, all the threads
+        share this client, so it's only used if thread_safe_search() is True.
+        """
+        return await asyncio.to_thread(self.search_embedding, query, k, filters)
+
     # TODO: remove
     @abstractmethod
     def optimize(self):
@@ -2,6 +2,7 @@ import logging
 from contextlib import contextmanager
 import time
 from typing import Iterable, Type
+import numpy as np
 from ..api import VectorDB, DBCaseConfig, DBConfig, IndexType
 from .config import AWSOpenSearchConfig, AWSOpenSearchIndexConfig, AWSOS_Engine
 from opensearchpy import OpenSearch
@@ -91,6 +92,9 @@ class AWSOpenSearch(VectorDB):
         self.client = None
         del self.client
 
+    def need_list_embeddings(self) -> bool:
+        return True
+
     def insert_embeddings(
         self,
         embeddings: Iterable[list[float]],
@@ -133,11 +137,7 @@ class AWSOpenSearch(VectorDB):
         """
         assert self.client is not None, "should self.init() first"
 
-        body = {
-            "size": k,
-            "query": {"knn": {self.vector_col_name: {"vector": query, "k": k}}},
-            **({"filter": {"range": {self.id_col_name: {"gt": filters["id"]}}}} if filters else {})
-        }
+        body = self._search_body(query, k, filters)
         try:
             resp = self.client.search(index=self.index_name, body=body,size=k,_source=False,docvalue_fields=[self.id_col_name],stored_fields="_none_",filter_path=[f"hits.hits.fields.{self.id_col_name}"],)
             log.info(f'Search took: {resp["took"]}')
@@ -152,6 +152,47 @@ class AWSOpenSearch(VectorDB):
             log.warning(f"Failed to search: {self.index_name} error: {str(e)}")
             raise e from None
 
+    def search_embeddings(
+        self,
+        queries: np.ndarray,
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[list[int]]:
+        """Search all queries in one _msearch request."""
+        assert self.client is not None, "should self.init() first"
+
+        searches = []
+        for query in queries.tolist():
+            searches.append({"index": self.index_name})
+            searches.append({
+                **self._search_body(query, k, filters),
+                "_source": False,
+                "docvalue_fields": [self.id_col_name],
+                "stored_fields": "_none_",
+            })
+
+        try:
+            resp = self.client.msearch(
+                body=searches,
+                filter_path=[f"responses.hits.hits.fields.{self.id_col_name}", "responses.error"],
+            )
+            result = []
+            for r in resp["responses"]:
+                if "error" in r:
+                    raise RuntimeError(r["error"])
+                result.append([h["fields"][self.id_col_name][0] for h in r.get("hits", {}).get("hits", [])])
+            return result
+        except Exception as e:
+            log.warning(f"Failed to msearch: {self.index_name} error: {str(e)}")
+            raise e from None
+
+    def _search_body(self, query: list[float], k: int, filters: dict | None) -> dict:
+        return {
+            "size": k,
+            "query": {"knn": {self.vector_col_name: {"vector": query, "k": k}}},
+            **({"filter": {"range": {self.id_col_name: {"gt": filters["id"]}}}} if filters else {})
+        }
+
     def optimize(self):
         """optimize will be called between insertion and search in performance cases."""
         # Call refresh first to ensure that all segments are created
@@ -63,6 +63,9 @@ class ChromaClient(VectorDB):
     def optimize(self) -> None:
         pass
 
+    def need_list_embeddings(self) -> bool:
+        return True
+
     def insert_embeddings(
         self,
         embeddings: list[list[float]],
@@ -1,8 +1,9 @@
 import logging
 import time
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 from typing import Iterable
-from ..api import VectorDB
+import numpy as np
+from ..api import VectorDB, SearchPhase
 from .config import ElasticCloudIndexConfig
 from elasticsearch.helpers import bulk
 
@@ -53,6 +54,18 @@ class ElasticCloud(VectorDB):
         self.client = None
         del(self.client)
 
+    @asynccontextmanager
+    async def init_async(self) -> None:
+        """connect to elasticsearch with the async client"""
+        from elasticsearch import AsyncElasticsearch
+        self.async_client = AsyncElasticsearch(**self.db_config, request_timeout=180)
+
+        try:
+            yield
+        finally:
+            await self.async_client.close()
+            self.async_client = None
+
     def _create_indice(self, client) -> None:
         mappings = {
             "_source": {"excludes": [self.vector_col_name]},
@@ -71,6 +84,9 @@ class ElasticCloud(VectorDB):
             log.warning(f"Failed to create indice: {self.indice} error: {str(e)}")
             raise e from None
 
+    def need_list_embeddings(self) -> bool:
+        return True
+
     def insert_embeddings(
         self,
         embeddings: Iterable[list[float]],
@@ -97,6 +113,34 @@ class ElasticCloud(VectorDB):
             log.warning(f"Failed to insert data: {self.indice} error: {str(e)}")
             return (0, e)
 
+    def delete_embeddings(
+        self,
+        metadata: list[int],
+        **kwargs,
+    ) -> (int, Exception):
+        """Delete the documents of the ids by query. The index is refreshed before, so that the query
+        finds the documents inserted since the last refresh, and after, so that searches miss the deleted ones."""
+        assert self.client is not None, "should self.init() first"
+
+        try:
+            self.client.indices.refresh(index=self.indice)
+            res = self.client.delete_by_query(
+                index=self.indice,
+                query={"terms": {self.id_col_name: [int(i) for i in metadata]}},
+                conflicts="proceed",
+                refresh=True,
+            )
+            return (res["deleted"], None)
+        except Exception as e:
+            log.warning(f"Failed to delete data: {self.indice} error: {str(e)}")
+            return (0, e)
+
+    def count_embeddings(self, **kwargs) -> int:
+        """Count the documents after a refresh"""
+        assert self.client is not None, "should self.init() first"
+        self.client.indices.refresh(index=self.indice)
+        return int(self.client.count(index=self.indice)["count"])
+
     def search_embedding(
         self,
         query: list[float],
@@ -117,6 +161,66 @@ class ElasticCloud(VectorDB):
         # is_existed_res = self.client.indices.exists(index=self.indice)
         # assert is_existed_res.raw == True, "should self.init() first"
 
+        try:
+            body = self._search_body(query, k, filters)
+            self.mark_search_phase(SearchPhase.ENCODE)
+            res = self.client.search(**body)
+            self.mark_search_phase(SearchPhase.TRANSPORT)
+            res = [h["fields"][self.id_col_name][0] for h in res["hits"]["hits"]]
+            self.mark_search_phase(SearchPhase.DECODE)
+
+            return res
+        except Exception as e:
+            log.warning(f"Failed to search: {self.indice} error: {str(e)}")
+            raise e from None
+
+    def search_embeddings(
+        self,
+        queries: np.ndarray,
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[list[int]]:
+        """Search all queries in one _msearch request."""
+        assert self.client is not None, "should self.init() first"
+
+        searches = []
+        for query in queries.tolist():
+            body = self._search_body(query, k, filters)
+            searches.append({"index": body.pop("index")})
+            body.pop("filter_path")
+            searches.append(body)
+
+        try:
+            res = self.client.msearch(
+                searches=searches,
+                filter_path=[f"responses.hits.hits.fields.{self.id_col_name}", "responses.error"],
+            )
+            ret = []
+            for r in res["responses"]:
+                if "error" in r:
+                    raise RuntimeError(r["error"])
+                ret.append([h["fields"][self.id_col_name][0] for h in r.get("hits", {}).get("hits", [])])
+            return ret
+        except Exception as e:
+            log.warning(f"Failed to msearch: {self.indice} error: {str(e)}")
+            raise e from None
+
+    async def search_embedding_async(
+        self,
+        query: list[float],
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[int]:
+        """Get k most similar embeddings to query vector with the async client."""
+        assert self.async_client is not None, "should self.init_async() first"
+        try:
+            res = await self.async_client.search(**self._search_body(query, k, filters))
+            return [h["fields"][self.id_col_name][0] for h in res["hits"]["hits"]]
+        except Exception as e:
+            log.warning(f"Failed to search: {self.indice} error: {str(e)}")
+            raise e from None
+
+    def _search_body(self, query: list[float], k: int, filters: dict | None) -> dict:
         knn = {
             "field": self.vector_col_name,
             "k": k,
@@ -126,23 +230,15 @@ class ElasticCloud(VectorDB):
             else [],
             "query_vector": query,
         }
-        size = k
-        try:
-            res = self.client.search(
-                index=self.indice,
-                knn=knn,
-                size=size,
-                _source=False,
-                docvalue_fields=[self.id_col_name],
-                stored_fields="_none_",
-                filter_path=[f"hits.hits.fields.{self.id_col_name}"],
-            )
-            res = [h["fields"][self.id_col_name][0] for h in res["hits"]["hits"]]
-
-            return res
-        except Exception as e:
-            log.warning(f"Failed to search: {self.indice} error: {str(e)}")
-            raise e from None
+        return dict(
+            index=self.indice,
+            knn=knn,
+            size=k,
+            _source=False,
+            docvalue_fields=[self.id_col_name],
+            stored_fields="_none_",
+            filter_path=[f"hits.hits.fields.{self.id_col_name}"],
+        )
 
     def optimize(self):
         """optimize will be called between insertion and search in performance cases."""
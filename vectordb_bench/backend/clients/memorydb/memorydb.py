@@ -178,7 +178,7 @@ class MemoryDB(VectorDB):
         try:
             with self.conn.pipeline(transaction=False) as pipe:
                 for i, embedding in enumerate(embeddings):
-                    embedding = np.array(embedding).astype(np.float32)
+                    embedding = np.asarray(embedding, dtype=np.float32)
                     pipe.hset(metadata[i], mapping = {
                         "id": str(metadata[i]),
                         "metadata": metadata[i], 
@@ -233,7 +233,7 @@ class MemoryDB(VectorDB):
     ) -> (list[int]):
         assert self.conn is not None
         
-        query_vector = np.array(query).astype(np.float32).tobytes()
+        query_vector = np.asarray(query, dtype=np.float32).tobytes()
         query_obj = Query(f"*=>[KNN {k} @vector $vec]").return_fields("id").paging(0, k)
         query_params = {"vec": query_vector}
         
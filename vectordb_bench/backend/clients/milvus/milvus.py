@@ -5,10 +5,11 @@ import time
 from contextlib import contextmanager
 from typing import Iterable
 
+import numpy as np
 from pymilvus import Collection, utility
 from pymilvus import CollectionSchema, DataType, FieldSchema, MilvusException
 
-from ..api import VectorDB, IndexType
+from ..api import VectorDB, IndexType, SearchPhase
 from .config import MilvusIndexConfig
 
 
@@ -171,6 +172,13 @@ class Milvus(VectorDB):
 
         return False
 
+    def need_list_embeddings(self) -> bool:
+        return True
+
+    def thread_safe_search(self) -> bool:
+        """pymilvus collections are safe to search from several threads"""
+        return True
+
     def insert_embeddings(
         self,
         embeddings: Iterable[list[float]],
@@ -197,6 +205,55 @@ class Milvus(VectorDB):
             return (insert_count, e)
         return (insert_count, None)
 
+    def delete_embeddings(
+        self,
+        metadata: list[int],
+        **kwargs,
+    ) -> (int, Exception):
+        """Delete embeddings by primary keys. should call self.init() first"""
+        assert self.col is not None
+        delete_count = 0
+        try:
+            for batch_start_offset in range(0, len(metadata), self.batch_size):
+                pks = [int(pk) for pk in metadata[batch_start_offset : batch_start_offset + self.batch_size]]
+                res = self.col.delete(f"{self._primary_field} in {pks}")
+                delete_count += res.delete_count
+        except MilvusException as e:
+            log.info(f"Failed to delete data: {e}")
+            return (delete_count, e)
+        return (delete_count, None)
+
+    def count_embeddings(self, **kwargs) -> int:
+        """Count the rows not deleted, num_entities also counts the deleted ones. should call self.init() first"""
+        assert self.col is not None
+        res = self.col.query(expr="", output_fields=["count(*)"], consistency_level="Strong")
+        return int(res[0]["count(*)"])
+
+    def upsert_embeddings(
+        self,
+        embeddings: Iterable[list[float]],
+        metadata: list[int],
+        **kwargs,
+    ) -> (int, Exception):
+        """Upsert embeddings into Milvus. should call self.init() first"""
+        assert self.col is not None
+        assert len(embeddings) == len(metadata)
+        upsert_count = 0
+        try:
+            for batch_start_offset in range(0, len(embeddings), self.batch_size):
+                batch_end_offset = min(batch_start_offset + self.batch_size, len(embeddings))
+                upsert_data = [
+                        metadata[batch_start_offset : batch_end_offset],
+                        metadata[batch_start_offset : batch_end_offset],
+                        embeddings[batch_start_offset : batch_end_offset],
+                ]
+                res = self.col.upsert(upsert_data)
+                upsert_count += res.upsert_count
+        except MilvusException as e:
+            log.info(f"Failed to upsert data: {e}")
+            return (upsert_count, e)
+        return (upsert_count, None)
+
     def search_embedding(
         self,
         query: list[float],
@@ -208,16 +265,40 @@ class Milvus(VectorDB):
         assert self.col is not None
 
         expr = f"{self._scalar_field} {filters.get('metadata')}" if filters else ""
+        param = self.case_config.search_param()
+        self.mark_search_phase(SearchPhase.ENCODE)
 
         # Perform the search.
         res = self.col.search(
             data=[query],
             anns_field=self._vector_field,
-            param=self.case_config.search_param(),
+            param=param,
             limit=k,
             expr=expr,
         )
+        self.mark_search_phase(SearchPhase.TRANSPORT)
 
         # Organize results.
         ret = [result.id for result in res[0]]
+        self.mark_search_phase(SearchPhase.DECODE)
         return ret
+
+    def search_embeddings(
+        self,
+        queries: np.ndarray,
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[list[int]]:
+        """Search all queries in one request."""
+        assert self.col is not None
+
+        expr = f"{self._scalar_field} {filters.get('metadata')}" if filters else ""
+
+        res = self.col.search(
+            data=queries.tolist(),
+            anns_field=self._vector_field,
+            param=self.case_config.search_param(),
+            limit=k,
+            expr=expr,
+        )
+        return [[result.id for result in hits] for hits in res]
@@ -243,7 +243,7 @@ class PgVectoRS(VectorDB):
 
         try:
             metadata_arr = np.array(metadata)
-            embeddings_arr = np.array(embeddings)
+            embeddings_arr = np.asarray(embeddings)
 
             with self.cursor.copy(
                 sql.SQL("COPY public.{table_name} FROM STDIN (FORMAT BINARY)").format(
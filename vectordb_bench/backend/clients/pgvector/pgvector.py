@@ -10,7 +10,7 @@ import psycopg
 from pgvector.psycopg import register_vector
 from psycopg import Connection, Cursor, sql
 
-from ..api import VectorDB
+from ..api import VectorDB, SearchPhase
 from .config import PgVectorConfigDict, PgVectorIndexConfig, PgVectorHNSWConfig
 
 log = logging.getLogger(__name__)
@@ -410,7 +410,7 @@ class PgVector(VectorDB):
 
         try:
             metadata_arr = np.array(metadata)
-            embeddings_arr = np.array(embeddings)
+            embeddings_arr = np.asarray(embeddings)
 
             with self.cursor.copy(
                 sql.SQL("COPY public.{table_name} FROM STDIN (FORMAT BINARY)").format(
@@ -432,6 +432,69 @@ class PgVector(VectorDB):
             )
             return 0, e
 
+    def delete_embeddings(
+        self,
+        metadata: list[int],
+        **kwargs: Any,
+    ) -> Tuple[int, Optional[Exception]]:
+        assert self.conn is not None, "Connection is not initialized"
+        assert self.cursor is not None, "Cursor is not initialized"
+
+        try:
+            self.cursor.execute(
+                sql.SQL("DELETE FROM public.{table_name} WHERE id = ANY(%s)").format(
+                    table_name=sql.Identifier(self.table_name)
+                ),
+                ([int(i) for i in metadata],),
+            )
+            deleted = self.cursor.rowcount
+            self.conn.commit()
+            return deleted, None
+        except Exception as e:
+            log.warning(
+                f"Failed to delete data from pgvector table ({self.table_name}), error: {e}"
+            )
+            self.conn.rollback()
+            return 0, e
+
+    def count_embeddings(self, **kwargs: Any) -> int:
+        assert self.conn is not None, "Connection is not initialized"
+        assert self.cursor is not None, "Cursor is not initialized"
+
+        self.cursor.execute(
+            sql.SQL("SELECT count(*) FROM public.{table_name}").format(
+                table_name=sql.Identifier(self.table_name)
+            )
+        )
+        return int(self.cursor.fetchone()[0])
+
+    def upsert_embeddings(
+        self,
+        embeddings: list[list[float]],
+        metadata: list[int],
+        **kwargs: Any,
+    ) -> Tuple[int, Optional[Exception]]:
+        assert self.conn is not None, "Connection is not initialized"
+        assert self.cursor is not None, "Cursor is not initialized"
+
+        try:
+            embeddings_arr = np.asarray(embeddings)
+            self.cursor.executemany(
+                sql.SQL(
+                    "INSERT INTO public.{table_name} (id, embedding) VALUES (%s, %s) "
+                    "ON CONFLICT (id) DO UPDATE SET embedding = EXCLUDED.embedding"
+                ).format(table_name=sql.Identifier(self.table_name)),
+                [(int(row), embeddings_arr[i]) for i, row in enumerate(metadata)],
+            )
+            self.conn.commit()
+            return len(metadata), None
+        except Exception as e:
+            log.warning(
+                f"Failed to upsert data into pgvector table ({self.table_name}), error: {e}"
+            )
+            self.conn.rollback()
+            return 0, e
+
     def search_embedding(
         self,
         query: list[float],
@@ -442,28 +505,50 @@ class PgVector(VectorDB):
         assert self.conn is not None, "Connection is not initialized"
         assert self.cursor is not None, "Cursor is not initialized"
 
+        search_query, params = self._search_query_and_params(np.asarray(query), k, filters)
+        self.mark_search_phase(SearchPhase.ENCODE)
+        result = self.cursor.execute(search_query, params, prepare=True, binary=True)
+        self.mark_search_phase(SearchPhase.TRANSPORT)
+
+        ret = [int(i[0]) for i in result.fetchall()]
+        self.mark_search_phase(SearchPhase.DECODE)
+        return ret
+
+    def search_embeddings(
+        self,
+        queries: np.ndarray,
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[list[int]]:
+        """Send all queries in one pipeline, so they share a single network round trip."""
+        assert self.conn is not None, "Connection is not initialized"
+
+        cursors = []
+        with self.conn.pipeline():
+            for query in queries:
+                search_query, params = self._search_query_and_params(query, k, filters)
+                cursor = self.conn.cursor()
+                cursor.execute(search_query, params, prepare=True, binary=True)
+                cursors.append(cursor)
+
+        result = []
+        for cursor in cursors:
+            result.append([int(i[0]) for i in cursor.fetchall()])
+            cursor.close()
+        return result
+
+    def _search_query_and_params(
+        self, q: np.ndarray, k: int, filters: dict | None
+    ) -> tuple[sql.Composed, tuple]:
         index_param = self.case_config.index_param()
         search_param = self.case_config.search_param()
-        q = np.asarray(query)
+        reranking = index_param["quantization_type"] == "bit" and search_param["reranking"]
         if filters:
             gt = filters.get("id")
-            if index_param["quantization_type"] == "bit" and search_param["reranking"]:
-                result = self.cursor.execute(
-                    self._filtered_search, (q, gt, q, k), prepare=True, binary=True
-                )
-            else:
-                result = self.cursor.execute(
-                    self._filtered_search, (gt, q, k), prepare=True, binary=True
-                )
-                
-        else:
-            if index_param["quantization_type"] == "bit" and search_param["reranking"]:
-                result = self.cursor.execute(
-                    self._unfiltered_search, (q, q, k), prepare=True, binary=True
-                )
-            else:
-                result = self.cursor.execute(
-                    self._unfiltered_search, (q, k), prepare=True, binary=True
-                )
+            if reranking:
+                return self._filtered_search, (q, gt, q, k)
+            return self._filtered_search, (gt, q, k)
 
-        return [int(i[0]) for i in result.fetchall()]
+        if reranking:
+            return self._unfiltered_search, (q, q, k)
+        return self._unfiltered_search, (q, k)
@@ -66,6 +66,9 @@ class Pinecone(VectorDB):
     def optimize(self):
         pass
 
+    def need_list_embeddings(self) -> bool:
+        return True
+
     def insert_embeddings(
         self,
         embeddings: list[list[float]],
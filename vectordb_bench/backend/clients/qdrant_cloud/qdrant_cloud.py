@@ -2,9 +2,10 @@
 
 import logging
 import time
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 
-from ..api import VectorDB, DBCaseConfig
+import numpy as np
+from ..api import VectorDB, DBCaseConfig, SearchPhase
 from qdrant_client.http.models import (
     CollectionStatus,
     VectorParams,
@@ -13,9 +14,11 @@ from qdrant_client.http.models import (
     Filter,
     FieldCondition,
     Range,
+    SearchRequest,
+    PointIdsList,
 )
 
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, AsyncQdrantClient
 
 
 log = logging.getLogger(__name__)
@@ -59,6 +62,15 @@ class QdrantCloud(VectorDB):
         self.qdrant_client = None
         del(self.qdrant_client)
 
+    @asynccontextmanager
+    async def init_async(self) -> None:
+        self.async_qdrant_client = AsyncQdrantClient(**self.db_config)
+        try:
+            yield
+        finally:
+            await self.async_qdrant_client.close()
+            self.async_qdrant_client = None
+
     def ready_to_load(self):
         pass
 
@@ -101,6 +113,9 @@ class QdrantCloud(VectorDB):
             log.warning(f"Failed to create collection: {self.collection_name} error: {e}")
             raise e from None
 
+    def need_list_embeddings(self) -> bool:
+        return True
+
     def insert_embeddings(
         self,
         embeddings: list[list[float]],
@@ -127,6 +142,39 @@ class QdrantCloud(VectorDB):
         else:
             return len(metadata), None
 
+    def delete_embeddings(
+        self,
+        metadata: list[int],
+        **kwargs,
+    ) -> (int, Exception):
+        """Delete points by ids. should call self.init() first"""
+        assert self.qdrant_client is not None
+        try:
+            _ = self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=[int(i) for i in metadata]),
+                wait=True,
+            )
+        except Exception as e:
+            log.info(f"Failed to delete data, {e}")
+            return 0, e
+        else:
+            return len(metadata), None
+
+    def count_embeddings(self, **kwargs) -> int:
+        """Exact count of the points. should call self.init() first"""
+        assert self.qdrant_client is not None
+        return self.qdrant_client.count(collection_name=self.collection_name, exact=True).count
+
+    def upsert_embeddings(
+        self,
+        embeddings: list[list[float]],
+        metadata: list[int],
+        **kwargs,
+    ) -> (int, Exception):
+        """insert_embeddings already upserts points by ids"""
+        return self.insert_embeddings(embeddings, metadata, **kwargs)
+
     def search_embedding(
         self,
         query: list[float],
@@ -139,24 +187,66 @@ class QdrantCloud(VectorDB):
         """
         assert self.qdrant_client is not None
 
-        f = None
-        if filters:
-            f = Filter(
-                must=[FieldCondition(
-                    key = self._primary_field,
-                    range = Range(
-                        gt=filters.get('id'),
-                    ),
-                )]
-            )
-
+        query_filter = self._search_filter(filters)
+        self.mark_search_phase(SearchPhase.ENCODE)
         res = self.qdrant_client.search(
             collection_name=self.collection_name,
             query_vector=query,
             limit=k,
-            query_filter=f,
+            query_filter=query_filter,
             #  with_payload=True,
         ),
+        self.mark_search_phase(SearchPhase.TRANSPORT)
 
         ret = [result.id for result in res[0]]
+        self.mark_search_phase(SearchPhase.DECODE)
         return ret
+
+    def search_embeddings(
+        self,
+        queries: np.ndarray,
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[list[int]]:
+        """Search all queries in one search_batch request, should call self.init() first."""
+        assert self.qdrant_client is not None
+
+        query_filter = self._search_filter(filters)
+        res = self.qdrant_client.search_batch(
+            collection_name=self.collection_name,
+            requests=[
+                SearchRequest(vector=query, limit=k, filter=query_filter)
+                for query in queries.tolist()
+            ],
+        )
+        return [[result.id for result in points] for points in res]
+
+    async def search_embedding_async(
+        self,
+        query: list[float],
+        k: int = 100,
+        filters: dict | None = None,
+    ) -> list[int]:
+        """Perform a search with the async client, should call self.init_async() first."""
+        assert self.async_qdrant_client is not None
+
+        res = await self.async_qdrant_client.search(
+            collection_name=self.collection_name,
+            query_vector=query,
+            limit=k,
+            query_filter=self._search_filter(filters),
+        )
+        return [result.id for result in res]
+
+    def _search_filter(self, filters: dict | None) -> Filter | None:
+        if not filters:
+            return None
+
+        return Filter(
+            must=[FieldCondition(
+                key = self._primary_field,
+                range = Range(
+                    gt=filters.get('id'),
+                ),
+            )]
+        )
@@ -1,7 +1,7 @@
 import logging
 from contextlib import contextmanager
 from typing import Any, Type
-from ..api import VectorDB, DBConfig, DBCaseConfig, EmptyDBCaseConfig, IndexType
+from ..api import VectorDB, DBConfig, DBCaseConfig, EmptyDBCaseConfig, IndexType, SearchPhase
 from .config import RedisConfig
 import redis
 from redis.commands.search.field import TagField, VectorField, NumericField
@@ -81,6 +81,10 @@ class Redis(VectorDB):
         self.conn = None
 
 
+    def thread_safe_search(self) -> bool:
+        """redis.Redis takes a connection from its pool for each command"""
+        return True
+
     def ready_to_search(self) -> bool:
         """Check if the database is ready to search."""
         pass
@@ -107,7 +111,7 @@ class Redis(VectorDB):
         try:
             with self.conn.pipeline(transaction=False) as pipe:
                 for i, embedding in enumerate(embeddings):
-                    embedding = np.array(embedding).astype(np.float32)
+                    embedding = np.asarray(embedding, dtype=np.float32)
                     pipe.hset(metadata[i], mapping = {
                         "id": str(metadata[i]),
                         "metadata": metadata[i], 
@@ -123,6 +127,34 @@ class Redis(VectorDB):
             return 0, e
         
         return result_len, None
+
+    def delete_embeddings(
+        self,
+        metadata: list[int],
+        **kwargs: Any,
+    ) -> (int, Exception):
+        """Delete the hashes of the ids, should call self.init() first."""
+        assert self.conn is not None
+        try:
+            deleted = self.conn.delete(*metadata) if len(metadata) > 0 else 0
+        except Exception as e:
+            return 0, e
+
+        return deleted, None
+
+    def count_embeddings(self, **kwargs: Any) -> int:
+        """Count the keys, each embedding is a hash of its own, should call self.init() first."""
+        assert self.conn is not None
+        return int(self.conn.dbsize())
+
+    def upsert_embeddings(
+        self,
+        embeddings: list[list[float]],
+        metadata: list[int],
+        **kwargs: Any,
+    ) -> (int, Exception):
+        """HSET in insert_embeddings already overwrites the hashes of the same ids."""
+        return self.insert_embeddings(embeddings, metadata, **kwargs)
     
     def search_embedding(
         self,
@@ -134,7 +166,7 @@ class Redis(VectorDB):
     ) -> (list[int]):
         assert self.conn is not None
         
-        query_vector = np.array(query).astype(np.float32).tobytes()
+        query_vector = np.asarray(query, dtype=np.float32).tobytes()
         query_obj = Query(f"*=>[KNN {k} @vector $vec as score]").sort_by("score").return_fields("id", "score").paging(0, k).dialect(2)
         query_params = {"vec": query_vector}
         
@@ -150,9 +182,13 @@ class Redis(VectorDB):
                 query_obj = Query(f"@id:{ {id_value} }=>[KNN {k} @vector $vec as score]").sort_by("score").return_fields("id", "score").paging(0, k).dialect(2)
             else: #metadata only case, greater than or equal to metadata value
                 query_obj = Query(f"@metadata:[{metadata_value} +inf]=>[KNN {k} @vector $vec as score]").sort_by("score").return_fields("id", "score").paging(0, k).dialect(2) 
+        self.mark_search_phase(SearchPhase.ENCODE)
         res = self.conn.ft(INDEX_NAME).search(query_obj, query_params)
+        self.mark_search_phase(SearchPhase.TRANSPORT)
         # doc in res of format {'id': '9831', 'payload': None, 'score': '1.19209289551e-07'}
-        return [int(doc["id"]) for doc in res.docs]
+        ret = [int(doc["id"]) for doc in res.docs]
+        self.mark_search_phase(SearchPhase.DECODE)
+        return ret
 
     
         
@@ -7,7 +7,7 @@ from contextlib import contextmanager
 import weaviate
 from weaviate.exceptions import WeaviateBaseError
 
-from ..api import VectorDB, DBCaseConfig
+from ..api import VectorDB, DBCaseConfig, SearchPhase
 
 log = logging.getLogger(__name__)
 
@@ -87,6 +87,9 @@ class WeaviateCloud(VectorDB):
                 log.warning(f"Failed to create collection: {self.collection_name} error: {str(e)}")
                 raise e from None
 
+    def need_list_embeddings(self) -> bool:
+        return True
+
     def insert_embeddings(
         self,
         embeddings: Iterable[list[float]],
@@ -133,12 +136,15 @@ class WeaviateCloud(VectorDB):
                 "valueInt": filters.get('id')
             }
             query_obj = query_obj.with_where(where_filter)
+        self.mark_search_phase(SearchPhase.ENCODE)
 
         # Perform the search.
         res = query_obj.do()
+        self.mark_search_phase(SearchPhase.TRANSPORT)
 
         # Organize results.
         ret = [result[self._scalar_field] for result in res["data"]["Get"][self.collection_name]]
+        self.mark_search_phase(SearchPhase.DECODE)
 
         return ret
 
@@ -8,6 +8,7 @@ from collections import namedtuple
 import logging
 import pathlib
 from enum import Enum
+import numpy as np
 import pandas as pd
 from pydantic import validator, PrivateAttr
 import polars as pl
@@ -18,6 +19,7 @@ from .. import config
 from ..backend.clients import MetricType
 from . import utils
 from .data_source import DatasetSource, DatasetReader
+from .ground_truth import ExactGroundTruth
 
 log = logging.getLogger(__name__)
 
@@ -192,7 +194,8 @@ class DatasetManager(BaseModel):
         Args:
             source(DatasetSource): S3 or AliyunOSS, default as S3
             filters(Optional[int | float | str]): combined with dataset's with_gt to
-              compose the correct ground_truth file
+              compose the correct ground_truth file, the exact ground truth is computed
+              if the file isn't there, see ExactGroundTruth
 
         Returns:
             bool: whether the dataset is successfully prepared
@@ -205,8 +208,13 @@ class DatasetManager(BaseModel):
 
         gt_file, test_file = None, None
         if self.data.with_gt:
-            gt_file, test_file = utils.compose_gt_file(filters), "test.parquet"
-            all_files.extend([gt_file, test_file])
+            test_file = "test.parquet"
+            all_files.append(test_file)
+            try:
+                gt_file = utils.compose_gt_file(filters)
+                all_files.append(gt_file)
+            except ValueError:
+                log.info(f"{self.data.name}: no ground truth file of filters {filters}, compute it from the train files")
 
         if not self.data.isCustom:
             source.reader().read(
@@ -215,16 +223,33 @@ class DatasetManager(BaseModel):
                 local_ds_root=self.data_dir,
             )
 
-        if gt_file is not None and test_file is not None:
-            self.test_data = self._read_file(test_file)
-            self.gt_data = self._read_file(gt_file)
-
         prefix = "shuffle_train" if use_shuffled else "train"
         self.train_files = sorted([f.name for f in self.data_dir.glob(f'{prefix}*.parquet')])
         log.debug(f"{self.data.name}: available train files {self.train_files}")
 
+        if test_file is not None:
+            self.test_data = self._read_file(test_file)
+            if len(self.test_data) > 0 and (gt_file is None or not self.data_dir.joinpath(gt_file).exists()):
+                gt_file = self._compute_gt(filters)
+            self.gt_data = self._read_file(gt_file) if gt_file is not None else pd.DataFrame()
+
         return True
 
+    def _compute_gt(self, filters: int | float | str | None = None) -> str:
+        """compute the exact ground truth of the test data, cached in the dataset directory
+
+        Returns:
+            str: the ground truth file
+        """
+        filter_id = round(float(filters) * self.data.size) if filters is not None else None
+        return ExactGroundTruth(
+            self.data_dir,
+            self.train_files,
+            self.data.dir_name,
+            self.data.metric_type,
+            filter_id=filter_id,
+        ).get(self.test_data["id"].to_numpy(), np.stack(self.test_data["emb"]))
+
     def _read_file(self, file_name: str) -> pd.DataFrame:
         """read one file from disk into memory"""
         log.info(f"Read the entire file into memory: {file_name}")
@@ -237,42 +262,149 @@ class DatasetManager(BaseModel):
 
 
 class DataSetIterator:
-    def __init__(self, dataset: DatasetManager):
+    """Iterate the train files in batches of config.NUM_PER_BATCH rows
+
+    Args:
+        dataset(DatasetManager): prepared dataset
+        shard_idx(int): which shard to iterate, in [0, num_shards)
+        num_shards(int): split the (file, row group) pairs of all train files
+            round-robin into num_shards disjoint shards, default to 1, the whole dataset
+        columns(list[str]): columns to read, default to all
+        skip_rows(int): skip the first rows of the shard, whole row groups are not read
+    """
+    def __init__(
+        self,
+        dataset: DatasetManager,
+        shard_idx: int = 0,
+        num_shards: int = 1,
+        columns: list[str] | None = None,
+        skip_rows: int = 0,
+    ):
+        assert 0 <= shard_idx < num_shards, f"invalid shard {shard_idx} of {num_shards}"
         self._ds = dataset
+        self._columns = columns
         self._idx = 0  # file number
         self._cur = None
-        self._sub_idx = [0 for i in range(len(self._ds.train_files))] # iter num for each file
+        self._files = self._shard_files(shard_idx, num_shards)
+        self._shard_row_groups = None
+        self._skip = 0  # rows to skip in the first row group left
+        if skip_rows > 0:
+            self._files, self._skip = self._skip_row_groups(skip_rows)
+
+    def _shard_files(self, shard_idx: int, num_shards: int) -> list[tuple[str, list[int] | None]]:
+        """(file_name, row_groups) to read in this shard, row_groups None means the whole file"""
+        if num_shards == 1:
+            return [(f, None) for f in self._ds.train_files]
+
+        units = [
+            (f, rg)
+            for f in self._ds.train_files
+            for rg in range(ParquetFile(pathlib.Path(self._ds.data_dir, f)).num_row_groups)
+        ]
+        files = {}
+        for f, rg in units[shard_idx::num_shards]:
+            files.setdefault(f, []).append(rg)
+        log.debug(f"shard {shard_idx}/{num_shards} reads {sum(map(len, files.values()))}/{len(units)} row groups")
+        return list(files.items())
+
+    def _row_groups(self) -> list[tuple[str, int, int]]:
+        """(file_name, row_group, num_rows) of all row groups in this shard, in order"""
+        if self._shard_row_groups is None:
+            res = []
+            for f, row_groups in self._files:
+                metadata = ParquetFile(pathlib.Path(self._ds.data_dir, f)).metadata
+                for rg in row_groups if row_groups is not None else range(metadata.num_row_groups):
+                    res.append((f, rg, metadata.row_group(rg).num_rows))
+            self._shard_row_groups = res
+        return self._shard_row_groups
+
+    def cursor(self, rows: int = 0) -> "RowGroupCursor":
+        """position in this shard after the first rows, advanced by the rows consumed after"""
+        return RowGroupCursor(self._row_groups(), rows)
+
+    def _skip_row_groups(self, rows: int) -> tuple[list[tuple[str, list[int]]], int]:
+        """(file_name, row_groups) left after skipping the first rows, and the rows to skip in the first row group"""
+        row_groups = self._row_groups()
+        ends = np.cumsum([num_rows for _, _, num_rows in row_groups], dtype=np.int64)
+        # the first row group ending after the skipped rows
+        i = int(np.searchsorted(ends, rows, side="right"))
+        if i == len(row_groups):
+            left = rows - (int(ends[-1]) if len(ends) > 0 else 0)
+            if left > 0:
+                log.warning(f"skip {left} rows more than the shard has")
+            return [], 0
+        rows -= int(ends[i - 1]) if i > 0 else 0
+
+        files = {}
+        for f, rg, _ in row_groups[i:]:
+            files.setdefault(f, []).append(rg)
+        return list(files.items()), rows
 
     def __iter__(self):
         return self
 
-    def _get_iter(self, file_name: str):
+    def _get_iter(self, file_name: str, row_groups: list[int] | None = None):
         p = pathlib.Path(self._ds.data_dir, file_name)
         log.info(f"Get iterator for {p.name}")
         if not p.exists():
             raise IndexError(f"No such file {p}")
-        return ParquetFile(p, memory_map=True, pre_buffer=True).iter_batches(config.NUM_PER_BATCH)
+        return ParquetFile(p, memory_map=True, pre_buffer=True).iter_batches(
+            config.NUM_PER_BATCH, row_groups=row_groups, columns=self._columns,
+        )
 
     def __next__(self) -> pd.DataFrame:
         """return the data in the next file of the training list"""
-        if self._idx < len(self._ds.train_files):
+        while self._idx < len(self._files):
             if self._cur is None:
-                file_name = self._ds.train_files[self._idx]
-                self._cur = self._get_iter(file_name)
+                self._cur = self._get_iter(*self._files[self._idx])
 
             try:
-                return next(self._cur).to_pandas()
+                df = next(self._cur).to_pandas()
             except StopIteration:
-                if self._idx == len(self._ds.train_files) - 1:
-                    raise StopIteration from None
-
                 self._idx += 1
-                file_name = self._ds.train_files[self._idx]
-                self._cur = self._get_iter(file_name)
-                return next(self._cur).to_pandas()
+                self._cur = None
+                continue
+
+            if self._skip > 0:
+                skipped = min(self._skip, len(df))
+                df, self._skip = df.iloc[skipped:].reset_index(drop=True), self._skip - skipped
+                if len(df) == 0:
+                    continue
+            return df
         raise StopIteration
 
 
+class RowGroupCursor:
+    """(file_name, row_group, offset in the row group) of the next row of a shard, moved forward
+    by the rows consumed, without walking the row groups from the start each time
+
+    Args:
+        row_groups(list[tuple[str, int, int]]): (file_name, row_group, num_rows) of the shard, in order
+        rows(int): rows consumed before
+    """
+    def __init__(self, row_groups: list[tuple[str, int, int]], rows: int = 0):
+        self._row_groups = row_groups
+        self._idx = 0
+        self._offset = 0
+        self.advance(rows)
+
+    @property
+    def position(self) -> tuple[str, int, int] | None:
+        """None if the shard has no more rows"""
+        if self._idx >= len(self._row_groups):
+            return None
+        file_name, row_group, _ = self._row_groups[self._idx]
+        return file_name, row_group, self._offset
+
+    def advance(self, rows: int) -> tuple[str, int, int] | None:
+        """move past the next rows, returns the new position"""
+        self._offset += rows
+        while self._idx < len(self._row_groups) and self._offset >= self._row_groups[self._idx][2]:
+            self._offset -= self._row_groups[self._idx][2]
+            self._idx += 1
+        return self.position
+
+
 class Dataset(Enum):
     """
     Value is Dataset classes, DO NOT use it
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import logging
+import pathlib
+import concurrent.futures
+from collections import deque
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .. import config
+from .clients import MetricType
+
+log = logging.getLogger(__name__)
+
+GROUND_TRUTH_DIR = "ground_truth"
+
+
+class ExactGroundTruth:
+    """Exact top-k neighbors of the test queries in the train files, for datasets without a
+    precomputed neighbors file, e.g. custom datasets or filter rates other than 1% and 99%.
+
+    The train files are streamed in blocks of block_rows, the scores of block_queries queries
+    against a block are one float32 matrix multiplication, so the scores of a block take at most
+    block_queries * block_rows floats whatever the number of queries, and the top k of each block
+    is merged into the running top k. num_workers threads score the blocks, numpy releases the GIL
+    in both. Equal scores are ranked by the smaller id, at the k-th place too.
+
+    The neighbors are cached in the dataset directory by the (dataset, metric, k, filter) key,
+    `ground_truth/neighbors-<metric>-k<k>-<filter>.parquet`, in the columns of neighbors.parquet.
+
+    Args:
+        data_dir(pathlib.Path): dataset directory with the train files
+        train_files(list[str]): train file names in data_dir
+        dataset(str): dataset name, recorded in the file metadata
+        metric_type(MetricType): L2, IP or COSINE
+        k(int): neighbors of each query
+        filter_id(int): only rows with id >= filter_id are neighbors, the filter of the filter cases
+        block_rows(int): train rows scored in each matrix multiplication
+        block_queries(int): queries scored in each matrix multiplication
+        num_workers(int): threads scoring the blocks
+    """
+    def __init__(
+        self,
+        data_dir: pathlib.Path,
+        train_files: list[str],
+        dataset: str,
+        metric_type: MetricType,
+        k: int = config.GROUND_TRUTH_K,
+        filter_id: int | None = None,
+        block_rows: int = config.GROUND_TRUTH_BLOCK_ROWS,
+        block_queries: int = config.GROUND_TRUTH_BLOCK_QUERIES,
+        num_workers: int = config.GROUND_TRUTH_NUM_WORKERS,
+    ):
+        if metric_type not in (MetricType.L2, MetricType.IP, MetricType.COSINE):
+            raise ValueError(f"Exact ground truth doesn't support metric {metric_type}")
+        self.data_dir = pathlib.Path(data_dir)
+        self.train_files = train_files
+        self.dataset = dataset
+        self.metric_type = metric_type
+        self.k = k
+        self.filter_id = filter_id
+        self.block_rows = max(block_rows, 1)
+        self.block_queries = max(block_queries, 1)
+        self.num_workers = max(num_workers, 1)
+
+    @property
+    def file_name(self) -> str:
+        """cache file of the key, relative to data_dir"""
+        filter_label = "nofilter" if self.filter_id is None else f"id{self.filter_id}"
+        return f"{GROUND_TRUTH_DIR}/neighbors-{self.metric_type.value.lower()}-k{self.k}-{filter_label}.parquet"
+
+    def _metadata(self) -> dict:
+        return {
+            "dataset": self.dataset,
+            "metric_type": self.metric_type.value,
+            "k": self.k,
+            "filter_id": self.filter_id,
+            "train_files": self.train_files,
+        }
+
+    def _cached(self, num_queries: int) -> bool:
+        p = self.data_dir.joinpath(self.file_name)
+        if not p.exists():
+            return False
+        pf = pq.ParquetFile(p)
+        metadata = json.loads((pf.schema_arrow.metadata or {}).get(b"ground_truth", b"{}"))
+        if metadata != self._metadata() or pf.metadata.num_rows != num_queries:
+            log.info(f"Ground truth {p} is of another dataset or test data, compute it again")
+            return False
+        return True
+
+    def _blocks(self):
+        """(ids, embeddings) of the train files in blocks of block_rows, rows filtered out are dropped"""
+        for f in self.train_files:
+            pf = pq.ParquetFile(self.data_dir.joinpath(f), memory_map=True)
+            for batch in pf.iter_batches(batch_size=self.block_rows, columns=["id", "emb"]):
+                ids = batch.column("id").to_numpy().astype(np.int64)
+                emb = batch.column("emb").flatten().to_numpy(zero_copy_only=False).astype(np.float32)
+                emb = emb.reshape(len(ids), -1)
+                if self.filter_id is not None:
+                    mask = ids >= self.filter_id
+                    ids, emb = ids[mask], emb[mask]
+                if len(ids) > 0:
+                    yield ids, emb
+
+    def _prepare(self, emb: np.ndarray) -> np.ndarray:
+        if self.metric_type == MetricType.COSINE:
+            emb = emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), np.finfo(np.float32).tiny)
+        return np.ascontiguousarray(emb, dtype=np.float32)
+
+    def _top_k(self, scores: np.ndarray, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """the k largest scores of each row and their ids, unordered, the smaller ids of equal scores at the k-th place"""
+        if scores.shape[1] <= self.k:
+            return scores, ids
+        idx = np.argpartition(scores, -self.k, axis=1)[:, -self.k:]
+        top = np.take_along_axis(scores, idx, axis=1)
+        # argpartition keeps an arbitrary subset of the scores equal to the k-th, re-select the rows where some are left out
+        kth = top.min(axis=1, keepdims=True)
+        for i in np.flatnonzero((scores == kth).sum(axis=1) > (top == kth).sum(axis=1)):
+            idx[i] = np.lexsort((ids[i], -scores[i]))[: self.k]
+        return np.take_along_axis(scores, idx, axis=1), np.take_along_axis(ids, idx, axis=1)
+
+    def _score_block(self, queries: np.ndarray, ids: np.ndarray, emb: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """top k of a block by score, larger is nearer, L2 drops the |q|^2 term that is the same for a query"""
+        emb = self._prepare(emb)
+        norms = np.einsum("ij,ij->i", emb, emb) if self.metric_type == MetricType.L2 else None
+        top_scores, top_ids = [], []
+        for start in range(0, len(queries), self.block_queries):
+            scores = queries[start : start + self.block_queries] @ emb.T
+            if norms is not None:
+                scores *= 2
+                scores -= norms
+            block = self._top_k(scores, np.broadcast_to(ids, scores.shape))
+            top_scores.append(block[0])
+            top_ids.append(block[1])
+        return np.concatenate(top_scores), np.concatenate(top_ids)
+
+    def _merge(self, best: tuple[np.ndarray, np.ndarray] | None, block: tuple[np.ndarray, np.ndarray]):
+        if best is None:
+            return block
+        return self._top_k(np.concatenate([best[0], block[0]], axis=1), np.concatenate([best[1], block[1]], axis=1))
+
+    def compute(self, queries: np.ndarray) -> np.ndarray:
+        """exact neighbor ids of the queries, nearest first, ties by the smaller id
+
+        Returns:
+            np.ndarray: (nq, k) ids, fewer columns if fewer rows pass the filter
+        """
+        queries = self._prepare(queries)
+        best, rows, start = None, 0, time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            pending = deque()
+            for ids, emb in self._blocks():
+                pending.append(executor.submit(self._score_block, queries, ids, emb))
+                rows += len(ids)
+                # bound the blocks in memory
+                while len(pending) > self.num_workers:
+                    best = self._merge(best, pending.popleft().result())
+            while pending:
+                best = self._merge(best, pending.popleft().result())
+
+        if best is None:
+            return np.empty((len(queries), 0), dtype=np.int64)
+        order = np.lexsort((best[1], -best[0]))
+        log.info(
+            f"Computed the exact top {self.k} of {len(queries)} queries in {rows} rows of {self.dataset}, "
+            f"metric={self.metric_type.value}, filter_id={self.filter_id}, dur={round(time.perf_counter() - start, 4)}s"
+        )
+        return np.take_along_axis(best[1], order, axis=1)
+
+    def write(self, test_ids: np.ndarray, neighbors: np.ndarray):
+        """write the neighbors in the columns of neighbors.parquet, id and neighbors_id"""
+        p = self.data_dir.joinpath(self.file_name)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        offsets = np.arange(len(neighbors) + 1, dtype=np.int32) * neighbors.shape[1]
+        table = pa.table({
+            "id": pa.array(np.asarray(test_ids, dtype=np.int64)),
+            "neighbors_id": pa.ListArray.from_arrays(pa.array(offsets), pa.array(neighbors.ravel(), pa.int64())),
+        }).replace_schema_metadata({"ground_truth": json.dumps(self._metadata())})
+
+        tmp = p.with_suffix(".tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, p)
+        log.info(f"Wrote the ground truth to {p}")
+
+    def get(self, test_ids: np.ndarray, queries: np.ndarray) -> str:
+        """compute and write the ground truth unless it's cached
+
+        Returns:
+            str: the ground truth file, relative to data_dir
+        """
+        if self._cached(len(test_ids)):
+            log.info(f"Use the cached ground truth {self.file_name}")
+        else:
+            self.write(test_ids, self.compute(queries))
+        return self.file_name
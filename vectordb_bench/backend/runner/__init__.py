@@ -2,11 +2,19 @@ from .mp_runner import (
     MultiProcessingSearchRunner,
 )
 
+from .async_runner import AsyncSearchRunner
+from .open_loop_runner import OpenLoopSearchRunner
+from .batch_runner import BatchSearchRunner
 from .serial_runner import SerialSearchRunner, SerialInsertRunner
+from .capacity_runner import CapacityInsertRunner
 
 
 __all__ = [
     'MultiProcessingSearchRunner',
+    'AsyncSearchRunner',
+    'OpenLoopSearchRunner',
+    'BatchSearchRunner',
     'SerialSearchRunner',
     'SerialInsertRunner',
+    'CapacityInsertRunner',
 ]
@@ -0,0 +1,201 @@
+import asyncio
+import time
+import traceback
+import concurrent
+import multiprocessing as mp
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+import numpy as np
+from ..clients import api
+from ... import config
+from .histogram import LatencyHistogram
+from .resource_monitor import ResourceMonitor
+from .timeline import Timeline
+from .warmup import Warmup
+from .concurrency_sweep import AdaptiveConcurrencySweep, max_concurrency
+
+
+log = logging.getLogger(__name__)
+
+
+class AsyncSearchRunner:
+    """ asyncio search runner
+
+    Drives `concurrency` in-flight requests from one event loop with
+    VectorDB.search_embedding_async, instead of one process per concurrency.
+    Clients with only sync APIs fall back to a thread pool of max(concurrencies) threads,
+    if their search_embedding is thread-safe.
+
+    Args:
+        k(int): search topk, default to 100
+        concurrency(Iterable): concurrencies or an AdaptiveConcurrencySweep, default config.NUM_CONCURRENCY
+        duration(int): duration for each concurency, default to 30s
+        warmup(Warmup): warm-up phase searched by all in-flight slots before each concurrency
+    """
+    def __init__(
+        self,
+        db: api.VectorDB,
+        test_data: list[list[float]] | np.ndarray,
+        k: int = 100,
+        filters: dict | None = None,
+        concurrencies: Iterable[int] = config.NUM_CONCURRENCY,
+        duration: int = 30,
+        warmup: Warmup | None = None,
+    ):
+        if not db.support_async_search():
+            raise ValueError(
+                f"{db.__class__.__name__} has neither an async search nor a thread-safe search_embedding, "
+                f"search it with the multiprocessing search engine"
+            )
+        self.db = db
+        self.k = k
+        self.filters = filters
+        self.concurrencies = concurrencies
+        self.duration = duration
+        self.warmup = warmup if warmup is not None else Warmup()
+
+        self.test_data = np.ascontiguousarray(test_data, dtype=np.float32)
+        log.debug(f"test dataset columns: {len(test_data)}")
+
+    async def search(self, end_time: float, latencies: LatencyHistogram, timeline: Timeline) -> int:
+        """one in-flight request slot, search the test data endlessly until end_time"""
+        num, idx = len(self.test_data), random.randint(0, len(self.test_data) - 1)
+
+        count = 0
+        as_list = self.db.need_list_embeddings()
+        while time.perf_counter() < end_time:
+            query = self.test_data[idx].tolist() if as_list else self.test_data[idx]
+            s = time.perf_counter()
+            try:
+                await self.db.search_embedding_async(
+                    query,
+                    self.k,
+                    self.filters,
+                )
+            except Exception as e:
+                timeline.record_error()
+                log.warning(f"VectorDB search_embedding_async error: {e}")
+                traceback.print_exc(chain=True)
+                raise e from None
+
+            end = time.perf_counter()
+            latencies.record(end - s)
+            timeline.record(end - s, end=end)
+            count += 1
+            # loop through the test data
+            idx = idx + 1 if idx < num - 1 else 0
+        return count
+
+    async def warm_up(self):
+        """one in-flight request slot, search the test data until the shared self.warmup is done"""
+        num, idx = len(self.test_data), random.randint(0, len(self.test_data) - 1)
+
+        as_list = self.db.need_list_embeddings()
+        while not self.warmup.done(time.perf_counter()):
+            query = self.test_data[idx].tolist() if as_list else self.test_data[idx]
+            s = time.perf_counter()
+            try:
+                await self.db.search_embedding_async(query, self.k, self.filters)
+            except Exception as e:
+                log.warning(f"VectorDB search_embedding_async error in warm-up: {e}")
+                traceback.print_exc(chain=True)
+                raise e from None
+
+            end = time.perf_counter()
+            self.warmup.record(end - s, end)
+            idx = idx + 1 if idx < num - 1 else 0
+
+    async def _search_in_conc(self, conc: int, dur: int) -> tuple[int, float, LatencyHistogram, Timeline]:
+        if self.warmup.enabled:
+            self.warmup.start()
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(conc):
+                    tg.create_task(self.warm_up())
+
+        start = time.perf_counter()
+        latencies, timeline = LatencyHistogram(), Timeline(start)
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(self.search(start + dur, latencies, timeline)) for _ in range(conc)]
+        cost = time.perf_counter() - start
+        return sum(t.result() for t in tasks), cost, latencies, timeline
+
+    async def _run_all_concurrencies(
+        self,
+    ) -> tuple[float, list[int], list[float], list[float], list[dict], list[list[dict]], list[dict], list[dict]]:
+        max_qps = 0
+        conc_num_list = []
+        conc_qps_list = []
+        conc_latency_p99_list = []
+        conc_latency_percentiles_list = []
+        conc_timeline_list = []
+        conc_warmup_list = []
+        conc_resources_list = []
+
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=max_concurrency(self.concurrencies)))
+        try:
+            async with self.db.init_async():
+                for conc in self.concurrencies:
+                    log.info(f"Start async search {self.duration}s in concurrency {conc}, filters: {self.filters}")
+                    with ResourceMonitor() as monitor:
+                        all_count, cost, latencies, timeline = await self._search_in_conc(conc, self.duration)
+                    resources = monitor.summary()
+                    latency_p99 = latencies.percentile(99)
+
+                    qps = round(timeline.qps(cost, config.CONCURRENCY_SKIP_SECONDS), 4)
+                    conc_num_list.append(conc)
+                    conc_qps_list.append(qps)
+                    conc_latency_p99_list.append(latency_p99)
+                    conc_latency_percentiles_list.append(latencies.summary())
+                    conc_timeline_list.append(timeline.to_list())
+                    conc_resources_list.append(resources)
+                    if resources["client_bound"]:
+                        log.warning(f"Client-bound in concurrency {conc}, the qps measures this client: {resources}")
+                    if self.warmup.enabled:
+                        conc_warmup_list.append(self.warmup.summary())
+                        log.info(f"Warm-up in concurrency {conc}: {self.warmup.summary()}")
+                    log.info(f"End async search in concurrency {conc}: dur={cost}s, total_count={all_count}, qps={qps}, latency={latencies.summary()}")
+                    if isinstance(self.concurrencies, AdaptiveConcurrencySweep):
+                        self.concurrencies.record(conc, qps, latency_p99)
+
+                    if qps > max_qps:
+                        max_qps = qps
+                        log.info(f"Update largest qps with concurrency {conc}: current max_qps={max_qps}")
+        except Exception as e:
+            log.warning(f"Fail to search all concurrencies: {self.concurrencies}, max_qps before failure={max_qps}, reason={e}")
+            traceback.print_exc()
+
+            # No results available, raise exception
+            if max_qps == 0.0:
+                raise e from None
+
+        return (
+            max_qps,
+            conc_num_list,
+            conc_qps_list,
+            conc_latency_p99_list,
+            conc_latency_percentiles_list,
+            conc_timeline_list,
+            conc_warmup_list,
+            conc_resources_list,
+        )
+
+    def _run_in_loop(self) -> tuple[float, list[int], list[float], list[float], list[dict], list[list[dict]], list[dict], list[dict]]:
+        log.info(f"{mp.current_process().name:14} start async search in concurrencies: {self.concurrencies}")
+        return asyncio.run(self._run_all_concurrencies())
+
+    def run(self) -> tuple[float, list[int], list[float], list[float], list[dict], list[list[dict]], list[dict], list[dict]]:
+        """
+        Returns:
+            tuple: max_qps, the largest qps of all concurrencies, and one entry per concurrency in each list:
+                concurrencies, qps, latency p99, latency percentiles, per-second timeline,
+                warm-up summary (only of the concurrencies that warmed up), and client resources
+        """
+        with concurrent.futures.ProcessPoolExecutor(mp_context=mp.get_context("spawn"), max_workers=1) as executor:
+            future = executor.submit(self._run_in_loop)
+            return future.result()
+
+    def stop(self) -> None:
+        pass
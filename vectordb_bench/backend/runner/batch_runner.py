@@ -0,0 +1,122 @@
+import time
+import traceback
+import concurrent.futures
+import multiprocessing as mp
+import random
+import logging
+from typing import Iterable
+import numpy as np
+from ..clients import api
+from .histogram import LatencyHistogram
+
+
+log = logging.getLogger(__name__)
+
+
+class BatchSearchRunner:
+    """ batch search runner
+
+    Searches nq query vectors per VectorDB.search_embeddings call for `duration` seconds,
+    for each nq in nq_list, and reports the number of query vectors searched per second.
+
+    Args:
+        nq_list(Iterable): query vectors per request
+        k(int): search topk, default to 100
+        duration(int): duration for each nq, default to 30s
+    """
+    def __init__(
+        self,
+        db: api.VectorDB,
+        test_data: list[list[float]] | np.ndarray,
+        nq_list: Iterable[int],
+        k: int = 100,
+        filters: dict | None = None,
+        duration: int = 30,
+    ):
+        self.db = db
+        self.k = k
+        self.filters = filters
+        self.nq_list = list(nq_list)
+        self.duration = duration
+
+        self.test_data = np.ascontiguousarray(test_data, dtype=np.float32)
+        log.debug(f"test dataset columns: {len(test_data)}")
+
+    def search(self, nq: int, dur: int) -> tuple[int, float, LatencyHistogram]:
+        """search batches of nq test queries endlessly for dur seconds, should be called within self.db.init()
+
+        Returns:
+            tuple[int, float, LatencyHistogram]: searched query vectors, cost, and latencies of each request
+        """
+        num, idx = len(self.test_data), random.randint(0, len(self.test_data) - 1)
+
+        start_time = time.perf_counter()
+        count = 0
+        latencies = LatencyHistogram()
+        while time.perf_counter() < start_time + dur:
+            queries = self.test_data.take(np.arange(idx, idx + nq), axis=0, mode="wrap")
+            s = time.perf_counter()
+            try:
+                results = self.db.search_embeddings(
+                    queries,
+                    self.k,
+                    self.filters,
+                )
+            except Exception as e:
+                log.warning(f"VectorDB search_embeddings error: {e}")
+                traceback.print_exc(chain=True)
+                raise e from None
+
+            latencies.record(time.perf_counter() - s)
+            assert len(results) == nq, f"search_embeddings returns {len(results)} results for {nq} queries"
+            count += nq
+            # loop through the test data
+            idx = (idx + nq) % num
+
+        return count, time.perf_counter() - start_time, latencies
+
+    def _run_all_nq(self) -> tuple[float, list[int], list[float], list[float], list[dict]]:
+        max_vps = 0
+        nq_list = []
+        vps_list = []
+        latency_p99_list = []
+        latency_percentiles_list = []
+        try:
+            with self.db.init():
+                for nq in self.nq_list:
+                    log.info(f"Start batch search {self.duration}s in nq {nq}, filters: {self.filters}")
+                    count, cost, latencies = self.search(nq, self.duration)
+
+                    vps = round(count / cost, 4)
+                    nq_list.append(nq)
+                    vps_list.append(vps)
+                    latency_p99_list.append(latencies.percentile(99))
+                    latency_percentiles_list.append(latencies.summary())
+                    log.info(
+                        f"End batch search in nq {nq}: dur={cost}s, total_vectors={count}, "
+                        f"vectors_per_second={vps}, latency={latencies.summary()}"
+                    )
+
+                    if vps > max_vps:
+                        max_vps = vps
+        except Exception as e:
+            log.warning(f"Fail to batch search all nq: {self.nq_list}, max_vps before failure={max_vps}, reason={e}")
+            traceback.print_exc()
+
+            # No results available, raise exception
+            if max_vps == 0.0:
+                raise e from None
+
+        return max_vps, nq_list, vps_list, latency_p99_list, latency_percentiles_list
+
+    def run(self) -> tuple[float, list[int], list[float], list[float], list[dict]]:
+        """
+        Returns:
+            tuple: largest vectors per second, nq list, vectors per second, latency p99 and percentiles of requests in each nq
+        """
+        with concurrent.futures.ProcessPoolExecutor(mp_context=mp.get_context("spawn"), max_workers=1) as executor:
+            future = executor.submit(self._run_all_nq)
+            return future.result()
+
+    def stop(self) -> None:
+        pass
@@ -0,0 +1,242 @@
+import re
+import time
+import logging
+import traceback
+import concurrent.futures
+import multiprocessing as mp
+from enum import Enum
+from itertools import count as count_from
+
+import numpy as np
+
+from vectordb_bench import config
+from vectordb_bench.backend.clients import api
+from vectordb_bench.backend.dataset import DatasetManager
+from vectordb_bench.models import LoadTimeoutError
+
+from .. import utils
+from .util import PrefetchIterator, SharedNDArray, stack_embeddings
+
+log = logging.getLogger(__name__)
+
+# retries of a batch failing with transient errors or rejected rows, backing off
+# exponentially from 1s up to CAPACITY_MAX_BACKOFF seconds
+CAPACITY_MAX_RETRIES = 5
+CAPACITY_MAX_BACKOFF = 30
+# retries of a batch failing with unclassified errors
+CAPACITY_MAX_UNKNOWN_RETRIES = 1
+
+TRANSIENT_ERROR = re.compile(
+    r"time(d)?[ _-]?out|deadline|unavailable|connection|reset by peer|refused|temporar|try again|"
+    r"too many requests|rate[ _-]?limit|throttl|busy|\b429\b|\b503\b",
+    re.IGNORECASE,
+)
+LIMIT_ERROR = re.compile(
+    r"out of (shared )?memory|\boom\b|maxmemory|memory pressure|not enough memory|data too large|"
+    r"insufficient (memory|resources|storage|disk)|no space left|disk (usage )?(is )?full|flood[ _-]?stage|"
+    r"(index|pod|collection|storage|disk) is full|quota|resources? exhausted|resource_exhausted|capacity|"
+    r"limit (reached|exceeded)|exceed(s|ed)? the (\w+ )?limit|max(imum)? (number of )?(vectors|rows|entities|documents)",
+    re.IGNORECASE,
+)
+
+
+class InsertErrorKind(str, Enum):
+    LIMIT = "limit"  # the db runs out of resources, the capacity is reached
+    TRANSIENT = "transient"  # retry after a backoff
+    UNKNOWN = "unknown"
+
+
+def classify_insert_error(e: BaseException) -> InsertErrorKind:
+    """classify an insert error by its type and message, transient patterns win over the limit ones,
+    e.g. a rate limit or an exceeded deadline"""
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return InsertErrorKind.TRANSIENT
+    msg = f"{type(e).__name__}: {e}"
+    if TRANSIENT_ERROR.search(msg):
+        return InsertErrorKind.TRANSIENT
+    if LIMIT_ERROR.search(msg):
+        return InsertErrorKind.LIMIT
+    return InsertErrorKind.UNKNOWN
+
+
+class CapacityInsertRunner:
+    """Insert the dataset endlessly until the db reaches its capacity, by load_concurrency workers.
+
+    The dataset is read once into shared memory, every worker slices batches of batch_size
+    rows from it and inserts all of them again and again, shifting the ids of each round by
+    a multiple of the id span, so the ids of all workers and rounds are unique.
+
+    Each insert error is classified instead of retried blindly. A limit error stops all the
+    workers right away, transient errors and rejected rows (fewer rows inserted than sent)
+    are retried with exponential backoff, unclassified errors are retried once. A batch that
+    still fails reaches the limit too. An error of a worker outside the inserts, e.g. in
+    db.init(), fails the case instead.
+
+    Args:
+        timeout(float): seconds to load until LoadTimeoutError, default to the capacity timeout
+        load_concurrency(int): insert worker processes
+        batch_size(int): rows per insert request
+    """
+    def __init__(
+        self,
+        db: api.VectorDB,
+        dataset: DatasetManager,
+        normalize: bool,
+        timeout: float | None = None,
+        load_concurrency: int = 1,
+        batch_size: int = config.CAPACITY_NUM_PER_BATCH,
+    ):
+        self.db = db
+        self.dataset = dataset
+        self.normalize = normalize
+        self.timeout = timeout if isinstance(timeout, (int, float)) else config.CAPACITY_TIMEOUT_IN_SECONDS
+        self.load_concurrency = max(load_concurrency, 1)
+        self.batch_size = batch_size
+
+    def _read_dataset(self) -> tuple[np.ndarray, np.ndarray]:
+        data_df = [data_df for data_df in self.dataset]
+        embeddings = stack_embeddings([emb for df in data_df for emb in df["emb"]], self.normalize)
+        ids = np.concatenate([df["id"].to_numpy(dtype=np.int64) for df in data_df])
+        log.info(f"Read {len(ids)} embeddings of {self.dataset.data.name} for the capacity case")
+        return embeddings, ids
+
+    def _batches(self, worker_idx: int, num_rows: int, id_span: int):
+        """(start, end, id offset) of the batches of every round of a worker, endlessly"""
+        for round_idx in count_from():
+            offset = (round_idx * self.load_concurrency + worker_idx) * id_span
+            for start in range(0, num_rows, self.batch_size):
+                yield start, min(start + self.batch_size, num_rows), offset
+
+    def _insert_batch(self, embeddings, ids: list[int]) -> tuple[int, str | None]:
+        """insert one batch with retries
+
+        Returns:
+            tuple[int, str | None]: inserted rows, and the reason if the limit is reached
+        """
+        inserted, retries, unknown_retries = 0, 0, 0
+        while True:
+            try:
+                count, error = self.db.insert_embeddings(embeddings=embeddings[inserted:], metadata=ids[inserted:])
+            except Exception as e:
+                count, error = 0, e
+            inserted += count
+            if error is None and inserted >= len(ids):
+                return inserted, None
+
+            if error is None:
+                kind, reason = InsertErrorKind.TRANSIENT, f"rejected {len(ids) - inserted}/{len(ids)} rows"
+            else:
+                kind, reason = classify_insert_error(error), f"{type(error).__name__}: {error}"
+                if kind == InsertErrorKind.UNKNOWN:
+                    unknown_retries += 1
+                    kind = InsertErrorKind.TRANSIENT if unknown_retries <= CAPACITY_MAX_UNKNOWN_RETRIES else InsertErrorKind.LIMIT
+
+            if kind == InsertErrorKind.LIMIT:
+                return inserted, reason
+            retries += 1
+            if retries > CAPACITY_MAX_RETRIES:
+                return inserted, f"still failing after {CAPACITY_MAX_RETRIES} retries, {reason}"
+
+            backoff = min(2 ** (retries - 1), CAPACITY_MAX_BACKOFF)
+            log.info(f"({mp.current_process().name:16}) Insert failed, {reason}, retry {retries} in {backoff}s")
+            time.sleep(backoff)
+
+    def task(self, worker_idx: int, embeddings: SharedNDArray, ids: SharedNDArray, progress, stop) -> str | None:
+        """insert until the limit is reached or stop is set, publishes the inserted rows to progress[worker_idx]
+
+        Returns:
+            str | None: the reason if this worker reaches the limit
+        """
+        id_span = int(ids.array.max()) + 1
+        as_list = self.db.need_list_embeddings()
+        batches = PrefetchIterator(
+            self._batches(worker_idx, len(ids), id_span),
+            lambda batch: (
+                (ids[batch[0] : batch[1]] + batch[2]).tolist(),
+                embeddings[batch[0] : batch[1]].tolist() if as_list else embeddings[batch[0] : batch[1]],
+            ),
+            depth=config.LOAD_PREFETCH_DEPTH,
+        )
+
+        count, reason, next_log = 0, None, 100_000
+        with self.db.init(), batches:
+            for metadata, emb in batches:
+                if stop.is_set():
+                    break
+                inserted, reason = self._insert_batch(emb, metadata)
+                count += inserted
+                progress[worker_idx] = count
+                if reason is not None:
+                    log.info(f"({mp.current_process().name:16}) Reach the limit, count={count}, reason={reason}")
+                    stop.set()
+                    break
+                if count >= next_log:
+                    log.info(f"({mp.current_process().name:16}) Loaded {count} embeddings into VectorDB")
+                    next_log += 100_000
+
+        embeddings.close()
+        ids.close()
+        return reason
+
+    def run_endlessness(self) -> int:
+        """insert until the db reaches its limit
+
+        Returns:
+            int: rows inserted by all workers
+
+        Raises:
+            LoadTimeoutError: the limit isn't reached in timeout
+        """
+        embeddings, ids = self._read_dataset()
+        with self.db.init():
+            self.db.ready_to_load()
+
+        shared_embeddings, shared_ids = SharedNDArray(embeddings), SharedNDArray(ids)
+        del embeddings, ids
+        start = time.perf_counter()
+        try:
+            with mp.Manager() as m:
+                progress, stop = m.list([0] * self.load_concurrency), m.Event()
+                with concurrent.futures.ProcessPoolExecutor(
+                    mp_context=mp.get_context("spawn"),
+                    max_workers=self.load_concurrency,
+                ) as executor:
+                    futures = [
+                        executor.submit(self.task, idx, shared_embeddings, shared_ids, progress, stop)
+                        for idx in range(self.load_concurrency)
+                    ]
+                    try:
+                        done, not_done = concurrent.futures.wait(
+                            futures,
+                            timeout=self.timeout,
+                            return_when=concurrent.futures.FIRST_EXCEPTION,
+                        )
+                    finally:
+                        stop.set()
+                    concurrent.futures.wait(futures)
+
+                    max_load_count = sum(progress)
+                    dur = time.perf_counter() - start
+                    # a worker error returns from the wait before the timeout, with the other workers not done
+                    errors = [f.exception() for f in futures if f.exception() is not None]
+                    if len(errors) > 0:
+                        for e in errors:
+                            traceback.print_exception(e)
+                        log.warning(f"Capacity insert worker error: {errors[0]}, insertion counts={max_load_count}")
+                        raise errors[0] from None
+
+                    if len(not_done) > 0:
+                        msg = f"capacity case load timeout in {self.timeout}s"
+                        log.info(f"{msg}, insertion counts={utils.numerize(max_load_count)}, {max_load_count}")
+                        raise LoadTimeoutError(msg)
+
+                    reasons = [f.result() for f in futures if f.result() is not None]
+        finally:
+            shared_embeddings.close()
+            shared_ids.close()
+
+        log.info(
+            f"Capacity case load reach limit, insertion counts={utils.numerize(max_load_count)}, {max_load_count}, "
+            f"dur={round(dur, 4)}s, rate={round(max_load_count / dur, 4)}/s, reasons={reasons}"
+        )
+        return max_load_count
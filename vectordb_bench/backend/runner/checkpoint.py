@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import shutil
+import logging
+import pathlib
+
+from vectordb_bench.backend.dataset import DatasetManager
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = "load_checkpoints"
+
+
+class LoadCheckpoint:
+    """Progress of a load, persisted after every acknowledged batch so an interrupted load
+    can continue from it instead of starting over.
+
+    Each shard of the load has its own file under the dataset directory,
+    `load_checkpoints/<key>/shard-XX-of-YY.json`, written only by the worker of that shard,
+    with the rows inserted and the (file, row group, offset) position of the next row.
+    Files are replaced atomically, a crash leaves the previous checkpoint.
+
+    Args:
+        key(str): identifies the load, e.g. the case and the db label, a checkpoint is only resumed by the same key
+    """
+    def __init__(self, dataset: DatasetManager, key: str):
+        self.dataset = dataset
+        self.key = "".join(c if c.isalnum() or c in "-_." else "_" for c in key) or "default"
+        self.dir = pathlib.Path(dataset.data_dir, CHECKPOINT_DIR, self.key)
+
+    def _path(self, shard_idx: int, num_shards: int) -> pathlib.Path:
+        return self.dir.joinpath(f"shard-{shard_idx:02d}-of-{num_shards:02d}.json")
+
+    def save(self, shard_idx: int, num_shards: int, inserted: int, position: tuple[str, int, int] | None):
+        """record the rows of the shard inserted so far, and the position of the next row, None at the end"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        p = self._path(shard_idx, num_shards)
+        tmp = p.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "dataset": self.dataset.data.dir_name,
+                "shard": shard_idx,
+                "num_shards": num_shards,
+                "inserted": inserted,
+                "file": position[0] if position else None,
+                "row_group": position[1] if position else None,
+                "offset": position[2] if position else None,
+                "updated_at": time.time(),
+            }, f)
+        os.replace(tmp, p)
+
+    def load(self, shard_idx: int, num_shards: int) -> int:
+        """rows of the shard already inserted, 0 without a checkpoint
+
+        Raises:
+            ValueError: the checkpoint is of a load in a different number of shards
+        """
+        others = [p.name for p in self.dir.glob("shard-*.json") if not p.name.endswith(f"-of-{num_shards:02d}.json")]
+        if len(others) > 0:
+            raise ValueError(
+                f"load checkpoint {self.dir} was saved with a different load concurrency: {others}, "
+                f"resume with the same load concurrency or load from scratch"
+            )
+
+        p = self._path(shard_idx, num_shards)
+        if not p.exists():
+            return 0
+        with open(p) as f:
+            return int(json.load(f)["inserted"])
+
+    def exists(self) -> bool:
+        """any shard of a previous load is saved"""
+        return any(self.dir.glob("shard-*.json"))
+
+    def total(self, num_shards: int) -> int:
+        """rows inserted by all shards"""
+        return sum(self.load(i, num_shards) for i in range(num_shards))
+
+    def clear(self):
+        if self.dir.exists():
+            log.info(f"Remove the load checkpoint {self.dir}")
+            shutil.rmtree(self.dir)
@@ -0,0 +1,220 @@
+import time
+import logging
+import traceback
+import multiprocessing as mp
+from contextlib import closing
+from functools import partial
+
+import numpy as np
+
+from vectordb_bench import config
+from vectordb_bench.backend.clients import api
+from vectordb_bench.backend.dataset import DatasetManager, DataSetIterator
+from vectordb_bench.models import ChurnMode
+
+from .mixed_runner import MixedReadWriteRunner
+from . import evaluation
+from .mp_runner import WORKER_SYNC_TIMEOUT
+from .timeline import Timeline
+from .util import PrefetchIterator, get_data
+
+log = logging.getLogger(__name__)
+
+# keys of the write stats in the series of MixedReadWriteRunner
+CHURN_SERIES_KEYS = {
+    "inserted": "churned",
+    "insert_count": "churn_count",
+    "insert_errors": "churn_errors",
+    "insert_latency_p99": "churn_latency_p99",
+}
+
+
+class ChurnRunner(MixedReadWriteRunner):
+    """Churn workload replacing churn_rate of the loaded dataset per minute while searching.
+
+    The whole dataset should be loaded before. Writers cycle through disjoint shards of
+    the dataset and replace each chunk of rows with the same embeddings, by upsert_embeddings
+    or by delete_embeddings then insert_embeddings. The data stays the same after each chunk,
+    so the recall samples of the readers are scored against the full ground truth. In the
+    delete_insert mode, the rows of the chunks between their delete and insert are left out of
+    it, so that the drop of recall and qps comes from the deletes and the index alone, not from
+    the rows missing in the meantime.
+
+    With compact, the first writer calls VectorDB.optimize() after churn_duration, readers keep
+    searching during it and read_dur_after_write seconds after, showing the recovery.
+
+    Args:
+        churn_rate(float): fraction of the dataset replaced per minute by all writers
+        churn_duration(int): seconds of churn
+        mode(ChurnMode): replace rows by upsert, or delete then insert
+        compact(bool): optimize after the churn
+    """
+    def __init__(
+        self,
+        db: api.VectorDB,
+        dataset: DatasetManager,
+        churn_rate: float = 0.1,
+        churn_duration: int = 300,
+        mode: ChurnMode = ChurnMode.UPSERT,
+        compact: bool = False,
+        num_writers: int = 1,
+        num_readers: int = 1,
+        normalize: bool = False,
+        k: int = 100,
+        filters: dict | None = None,
+        read_dur_after_write: int = 30,
+    ):
+        assert churn_rate > 0 and churn_duration > 0
+        if not db.support_delete():
+            raise RuntimeError(f"{db.__class__.__name__} doesn't support delete_embeddings, can't run churn")
+
+        self.churn_rate = churn_rate
+        self.churn_duration = churn_duration
+        self.mode = ChurnMode(mode)
+        self.compact = compact
+        super().__init__(
+            db=db,
+            dataset=dataset,
+            insert_rate=max(1, round(churn_rate * dataset.data.size / 60)),
+            num_writers=num_writers,
+            num_readers=num_readers,
+            normalize=normalize,
+            k=k,
+            filters=filters,
+            read_dur_after_write=read_dur_after_write,
+        )
+
+    def _cycle(self, shard_idx: int):
+        """chunks of the shard_idx-th shard, repeated endlessly"""
+        while True:
+            batches = PrefetchIterator(
+                DataSetIterator(self.dataset, shard_idx, self.num_writers),
+                partial(get_data, normalize=self.normalize, as_list=self.db.need_list_embeddings()),
+                depth=config.LOAD_PREFETCH_DEPTH,
+            )
+            with batches:
+                for emb, metadata in batches:
+                    for i in range(0, len(metadata), self.chunk_size):
+                        yield emb[i : i + self.chunk_size], metadata[i : i + self.chunk_size]
+
+    def _replace(self, emb, metadata) -> tuple[int, Exception | None]:
+        if self.mode == ChurnMode.UPSERT:
+            return self.db.upsert_embeddings(emb, metadata)
+
+        _, error = self.db.delete_embeddings(metadata)
+        if error is not None:
+            return 0, error
+        return self.db.insert_embeddings(emb, metadata)
+
+    def write_worker(self, shard_idx: int, barrier, progress, stop) -> tuple[Timeline, tuple[float, float] | None]:
+        """replace the rows of the shard_idx-th shard for churn_duration seconds, then optimize in the first writer
+
+        progress[shard_idx] is the (start, end) rows of the shard sent since the start, the rows in
+        between, modulo the shard size, are missing in the delete_insert mode.
+
+        Returns:
+            tuple[Timeline, tuple[float, float] | None]: churn timeline, and the start and end seconds of optimize
+        """
+        rate = self.insert_rate / self.num_writers
+        count, sent, compaction = 0, 0, None
+        with self.db.init():
+            progress[shard_idx] = (0, 0)
+            barrier.wait(timeout=WORKER_SYNC_TIMEOUT)
+            timeline = Timeline()
+            due, end_time = timeline.start, timeline.start + self.churn_duration
+            with closing(self._cycle(shard_idx)) as chunks:
+                for emb, metadata in chunks:
+                    # paced without bursting to catch up after a slow replacement
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    s = time.perf_counter()
+                    if s >= end_time or stop.is_set():
+                        break
+                    due = max(due, s) + len(metadata) / rate
+                    if self.mode == ChurnMode.DELETE_INSERT:
+                        progress[shard_idx] = (sent, sent + len(metadata))
+
+                    try:
+                        churned, error = self._replace(emb, metadata)
+                    except Exception as e:
+                        timeline.record_error()
+                        log.warning(f"VectorDB {self.mode.value} error: {e}")
+                        traceback.print_exc(chain=True)
+                        raise e from None
+                    if error is not None:
+                        timeline.record_error()
+                        raise error
+
+                    timeline.record(time.perf_counter() - s, count=churned)
+                    count += churned
+                    sent += len(metadata)
+                    progress[shard_idx] = (sent, sent)
+
+            log.info(f"({mp.current_process().name:16}) Finish churning shard {shard_idx}/{self.num_writers}, count={count}")
+            if self.compact and shard_idx == 0 and not stop.is_set():
+                s = time.perf_counter()
+                self.db.optimize()
+                compaction = (s - timeline.start, time.perf_counter() - timeline.start)
+                log.info(f"({mp.current_process().name:16}) Finish optimizing after churn, dur={compaction[1] - compaction[0]:.4f}s")
+
+        return timeline, compaction
+
+    def _sample_truths(self, samples: list[tuple]) -> list[np.ndarray | None]:
+        """the full top k ground truth, without the rows deleted and not inserted again at each sample
+        in the delete_insert mode, None if fewer than k are left"""
+        gt = self._ground_truth()
+        if self.mode != ChurnMode.DELETE_INSERT:
+            return [gt[idx][:self.k] for _, idx, _, _ in samples]
+
+        shard_of, pos_of = self._id_positions()
+        present = pos_of != np.iinfo(np.int64).max
+        shard_rows = np.bincount(shard_of[present], minlength=self.num_writers)
+
+        truths = []
+        for _, idx, _, progress in samples:
+            gt_row = gt[idx][(gt[idx] != evaluation.PAD_ID) & (gt[idx] < len(pos_of))]
+            gt_row = gt_row[present[gt_row]]
+            start, end = np.asarray(progress, dtype=np.int64).T
+            shard = shard_of[gt_row]
+            # the shard is replaced cyclically, from start to end modulo its rows
+            missing = (pos_of[gt_row] - start[shard]) % shard_rows[shard] < (end - start)[shard]
+            truth = gt_row[~missing][:self.k]
+            truths.append(truth if len(truth) == self.k else None)
+        return truths
+
+    def _phase(self, second: int, compaction: tuple[float, float] | None) -> str:
+        if second < self.churn_duration:
+            return "churn"
+        if compaction is not None and second < compaction[1]:
+            return "compact"
+        return "after"
+
+    def run(self) -> list[dict]:
+        """
+        Returns:
+            list[dict]: per-second series of the phase (churn, compact or after), churned rows,
+                churn and search counts and latencies, and the mean recall of the samples in that second
+        """
+        try:
+            write_results, reads, samples = self._run_workers()
+        finally:
+            self.stop()
+
+        writes, compaction = Timeline(), None
+        for timeline, optimized in write_results:
+            writes.merge(timeline)
+            compaction = optimized or compaction
+
+        series = []
+        for second in self._series(writes, reads, self._score(samples)):
+            series.append({
+                "second": second["second"],
+                "phase": self._phase(second["second"], compaction),
+                **{CHURN_SERIES_KEYS.get(key, key): value for key, value in second.items() if key != "second"},
+            })
+        log.info(
+            f"Churn workload done: mode={self.mode.value}, churned={writes.count()}, searched={reads.count()}, "
+            f"compaction={compaction}, seconds={len(series)}"
+        )
+        return series
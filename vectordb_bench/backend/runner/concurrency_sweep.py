@@ -0,0 +1,110 @@
+import logging
+from typing import Iterable
+
+
+log = logging.getLogger(__name__)
+
+
+def max_concurrency(concurrencies: Iterable[int]) -> int:
+    """largest level of a list of concurrencies, or of a sweep with its max_concurrency like
+    an AdaptiveConcurrencySweep, without iterating the sweep"""
+    if hasattr(concurrencies, "max_concurrency"):
+        return concurrencies.max_concurrency
+    return max(concurrencies)
+
+
+class AdaptiveConcurrencySweep:
+    """Concurrencies to search, chosen from the results of the previous levels.
+
+    Ramps up exponentially from min_concurrency until qps stops improving by
+    plateau_threshold, the p99 latency exceeds latency_p99_slo, or max_concurrency
+    is reached. Then bisects between the best level and its tested neighbours
+    for refine_steps rounds.
+
+    Iterate it like a list of concurrencies, and call record() after searching
+    each level, the next level depends on it.
+
+    Args:
+        min_concurrency(int): the first level
+        max_concurrency(int): upper bound of the levels
+        growth(int): ramp up factor
+        plateau_threshold(float): stop ramping up if qps improves less than this ratio
+        latency_p99_slo(float): stop ramping up if p99 latency exceeds this, in seconds,
+            levels above the slo are never the best one
+        refine_steps(int): bisection rounds around the best level
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int,
+        max_concurrency: int,
+        growth: int = 2,
+        plateau_threshold: float = 0.05,
+        latency_p99_slo: float | None = None,
+        refine_steps: int = 2,
+    ):
+        assert 1 <= min_concurrency <= max_concurrency, f"invalid concurrency range [{min_concurrency}, {max_concurrency}]"
+        assert growth >= 2, f"growth should be at least 2, got {growth}"
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.growth = growth
+        self.plateau_threshold = plateau_threshold
+        self.latency_p99_slo = latency_p99_slo
+        self.refine_steps = refine_steps
+        self.results: dict[int, tuple[float, float]] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"adaptive[{self.min_concurrency}, {self.max_concurrency}](plateau_threshold={self.plateau_threshold}, "
+            f"latency_p99_slo={self.latency_p99_slo})"
+        )
+
+    def record(self, conc: int, qps: float, latency_p99: float):
+        self.results[conc] = (qps, latency_p99)
+
+    def _within_slo(self, conc: int) -> bool:
+        return self.latency_p99_slo is None or self.results[conc][1] <= self.latency_p99_slo
+
+    def best(self) -> int | None:
+        """concurrency of the largest qps within the slo, the lower one on ties"""
+        candidates = [conc for conc in sorted(self.results) if self._within_slo(conc)]
+        return max(candidates, key=lambda conc: self.results[conc][0], default=None)
+
+    def _should_stop(self, conc: int, prev_best: int | None) -> bool:
+        qps, latency_p99 = self.results[conc]
+        if not self._within_slo(conc):
+            log.info(f"Stop ramping up at concurrency {conc}: latency p99 {latency_p99}s exceeds slo {self.latency_p99_slo}s")
+            return True
+        if prev_best is not None and qps < self.results[prev_best][0] * (1 + self.plateau_threshold):
+            log.info(f"Stop ramping up at concurrency {conc}: qps {qps} plateaus at concurrency {prev_best}")
+            return True
+        return False
+
+    def __iter__(self):
+        self.results = {}
+
+        conc = self.min_concurrency
+        while True:
+            prev_best = self.best()
+            yield conc
+            if conc not in self.results or self._should_stop(conc, prev_best) or conc >= self.max_concurrency:
+                break
+            conc = min(conc * self.growth, self.max_concurrency)
+
+        for _ in range(self.refine_steps):
+            best = self.best()
+            if best is None:
+                return
+
+            tested = sorted(self.results)
+            i = tested.index(best)
+            neighbours = tested[max(i - 1, 0) : i + 2]
+            candidates = sorted({(best + n) // 2 for n in neighbours} - set(self.results))
+            if len(candidates) == 0:
+                return
+
+            log.info(f"Refine around concurrency {best} with {candidates}")
+            for c in candidates:
+                yield c
+                if c not in self.results:
+                    return
@@ -0,0 +1,415 @@
+import time
+import socket
+import logging
+import traceback
+import concurrent.futures
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Iterable
+
+import numpy as np
+
+from vectordb_bench import config
+from vectordb_bench.backend.clients import DB
+from vectordb_bench.backend.clients.api import DBCaseConfig, DBConfig
+
+from .concurrency_sweep import AdaptiveConcurrencySweep, max_concurrency
+from .histogram import LatencyHistogram
+from .mp_runner import MultiProcessingSearchRunner
+from .timeline import Timeline
+from .warmup import Warmup
+
+log = logging.getLogger(__name__)
+
+SKIP_SECONDS = config.CONCURRENCY_SKIP_SECONDS
+# seconds from all agents being ready to their shared start, covers sending the start time
+DISTRIBUTED_START_LEAD = 1
+# request/reply rounds to estimate the clock offset of an agent, the one with the shortest round trip wins
+CLOCK_SYNC_ROUNDS = 5
+# seconds between an agent's attempts to connect to the coordinator
+AGENT_RECONNECT_INTERVAL = 5
+
+
+def authkey() -> bytes:
+    """config.DISTRIBUTED_AUTHKEY, the connections exchange pickles so there is no default
+
+    Raises:
+        ValueError: DISTRIBUTED_AUTHKEY is not set
+    """
+    if not config.DISTRIBUTED_AUTHKEY:
+        msg = "DISTRIBUTED_AUTHKEY is not set, set the same secret on the coordinator and its agents"
+        log.warning(msg)
+        raise ValueError(msg)
+    return config.DISTRIBUTED_AUTHKEY.encode()
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    """host:port to (host, port)"""
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"invalid address {address}, expected host:port")
+    return host, int(port)
+
+
+class AgentTask:
+    """what an agent needs to run the concurrent search of a case, sent by the coordinator"""
+
+    def __init__(
+        self,
+        db: DB,
+        db_config: DBConfig,
+        db_case_config: DBCaseConfig,
+        test_data: np.ndarray,
+        k: int,
+        filters: dict | None,
+        duration: int,
+        warmup: Warmup,
+        max_concurrency: int,
+    ):
+        self.db = db
+        self.db_config = db_config
+        self.db_case_config = db_case_config
+        self.test_data = test_data
+        self.k = k
+        self.filters = filters
+        self.duration = duration
+        self.warmup = warmup
+        self.max_concurrency = max_concurrency
+
+
+class DistributedSearchRunner:
+    """Concurrent search coordinated across agents, for more offered load than one client host.
+
+    The coordinator listens on `address` for `num_agents` agents, started by `vectordbbench agent`
+    on other hosts or locally. It estimates the clock offset of every agent and sends it an
+    AgentTask. For every concurrency level, each agent starts that many search workers, and when
+    all of them are ready the coordinator sends one start time in its own clock, so the measured
+    windows of all agents line up. Agents stream back their latency histogram and timeline of the
+    level, merged into one result as if a single MultiProcessingSearchRunner searched at
+    `num_agents` times the concurrency.
+
+    Concurrencies can also be an AdaptiveConcurrencySweep, it picks the per-agent level.
+
+    Trust model: connections are authenticated with config.DISTRIBUTED_AUTHKEY, which is required,
+    and nothing else. Messages are pickles, so a peer holding the authkey can run code on the other
+    side, and the AgentTask carries the db config with its credentials in plaintext. Run the
+    coordinator and agents on a trusted network or through a tunnel, the default address only
+    listens on the loopback interface.
+
+    Args:
+        num_agents(int): agents to wait for
+        address(str): host:port to listen on
+        connect_timeout(float): seconds to wait for all the agents to connect
+    """
+    def __init__(
+        self,
+        db: DB,
+        db_config: DBConfig,
+        db_case_config: DBCaseConfig,
+        test_data: np.ndarray,
+        num_agents: int,
+        address: str,
+        k: int = 100,
+        filters: dict | None = None,
+        concurrencies: Iterable[int] = config.NUM_CONCURRENCY,
+        duration: int = 30,
+        warmup: Warmup | None = None,
+        connect_timeout: float = config.DISTRIBUTED_CONNECT_TIMEOUT,
+    ):
+        assert num_agents > 0
+        self.authkey = authkey()
+        self.num_agents = num_agents
+        self.address = parse_address(address)
+        self.concurrencies = concurrencies
+        self.connect_timeout = connect_timeout
+        self.task = AgentTask(
+            db=db,
+            db_config=db_config,
+            db_case_config=db_case_config,
+            test_data=np.asarray(test_data, dtype=np.float32),
+            k=k,
+            filters=filters,
+            duration=duration,
+            warmup=warmup if warmup is not None else Warmup(),
+            max_concurrency=max_concurrency(concurrencies),
+        )
+
+    @staticmethod
+    def _recv(conn: Connection, expected: str):
+        kind, payload = conn.recv()
+        if kind == "error":
+            raise RuntimeError(f"search agent failed: {payload}")
+        if kind != expected:
+            raise RuntimeError(f"expected {expected} from the search agent, got {kind}")
+        return payload
+
+    def _handshake(self, conn: Connection) -> str:
+        """serve the clock sync of a new agent and send it the task, returns its name"""
+        name = self._recv(conn, "hello")
+        for _ in range(CLOCK_SYNC_ROUNDS):
+            self._recv(conn, "clock")
+            conn.send(("clock", time.time()))
+        conn.send(("task", self.task))
+        return name
+
+    def _wake(self):
+        """unblock a pending accept, closing the listener doesn't"""
+        host, port = self.address
+        try:
+            socket.create_connection(("127.0.0.1" if host in ("", "0.0.0.0") else host, port), timeout=1).close()
+        except OSError:
+            pass
+
+    def _accept(self, listener: Listener) -> list[Connection]:
+        conns, future = [], None
+        deadline = time.perf_counter() + self.connect_timeout
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                while len(conns) < self.num_agents:
+                    future = executor.submit(listener.accept)
+                    try:
+                        conn = future.result(timeout=max(deadline - time.perf_counter(), 0))
+                    except concurrent.futures.TimeoutError:
+                        msg = f"only {len(conns)}/{self.num_agents} search agents connected in {self.connect_timeout}s"
+                        log.warning(msg)
+                        raise TimeoutError(msg) from None
+                    conns.append(conn)
+                    log.info(f"Search agent {self._handshake(conn)} connected, {len(conns)}/{self.num_agents}")
+            except BaseException:
+                if future is not None and not future.done():
+                    self._wake()
+                for conn in conns:
+                    conn.close()
+                raise
+        return conns
+
+    def _search_in_conc(
+        self, conns: list[Connection], conc: int,
+    ) -> tuple[int, float, LatencyHistogram, Timeline, Warmup | None, dict]:
+        for conn in conns:
+            conn.send(("level", conc))
+        for conn in conns:
+            self._recv(conn, "ready")
+
+        start_at = time.time() + DISTRIBUTED_START_LEAD
+        for conn in conns:
+            conn.send(("start", start_at))
+        log.info(f"Start search in concurrency {conc} on each of {len(conns)} agents")
+
+        all_count, cost, latencies, timeline, warmup, agent_resources = 0, 0.0, LatencyHistogram(), Timeline(), None, []
+        for conn in conns:
+            count, agent_cost, agent_latencies, agent_timeline, agent_warmup, resources = self._recv(conn, "result")
+            all_count += count
+            cost = max(cost, agent_cost)
+            latencies.merge(agent_latencies)
+            timeline.merge(agent_timeline)
+            if agent_warmup is not None:
+                warmup = agent_warmup if warmup is None else warmup.merge(agent_warmup)
+            agent_resources.append(resources)
+        resources = {"client_bound": any(r["client_bound"] for r in agent_resources), "agents": agent_resources}
+        return all_count, cost, latencies, timeline, warmup, resources
+
+    def run(self) -> tuple[float, list[int], list[float], list[float], list[dict], list[list[dict]], list[dict], list[dict]]:
+        """
+        Returns:
+            tuple: the same as MultiProcessingSearchRunner.run(), the concurrencies are the totals of all agents
+        """
+        max_qps = 0
+        conc_num_list = []
+        conc_qps_list = []
+        conc_latency_p99_list = []
+        conc_latency_percentiles_list = []
+        conc_timeline_list = []
+        conc_warmup_list = []
+        conc_resources_list = []
+
+        log.info(f"Wait for {self.num_agents} search agents on {self.address[0]}:{self.address[1]}")
+        with Listener(self.address, authkey=self.authkey) as listener:
+            conns = self._accept(listener)
+        try:
+            for conc in self.concurrencies:
+                all_count, cost, latencies, timeline, warmup, resources = self._search_in_conc(conns, conc)
+                latency_p99 = latencies.percentile(99)
+                qps = round(timeline.qps(cost, SKIP_SECONDS), 4)
+
+                conc_num_list.append(conc * len(conns))
+                conc_qps_list.append(qps)
+                conc_latency_p99_list.append(latency_p99)
+                conc_latency_percentiles_list.append(latencies.summary())
+                conc_timeline_list.append(timeline.to_list())
+                conc_resources_list.append(resources)
+                if resources["client_bound"]:
+                    log.warning(f"Client-bound agents in concurrency {conc}, the qps measures the agents: {resources}")
+                if warmup is not None:
+                    conc_warmup_list.append(warmup.summary())
+                log.info(
+                    f"End search in concurrency {conc} x {len(conns)} agents: dur={cost}s, total_count={all_count}, "
+                    f"qps={qps}, latency={latencies.summary()}"
+                )
+                if isinstance(self.concurrencies, AdaptiveConcurrencySweep):
+                    self.concurrencies.record(conc, qps, latency_p99)
+                max_qps = max(max_qps, qps)
+
+            for conn in conns:
+                conn.send(("stop", None))
+            for conn in conns:
+                self._recv(conn, "done")
+        except Exception as e:
+            log.warning(f"Fail to search all concurrencies on the agents, max_qps before failure={max_qps}, reason={e}")
+            traceback.print_exc()
+            if max_qps == 0.0:
+                raise e from None
+        finally:
+            for conn in conns:
+                conn.close()
+
+        return (
+            max_qps,
+            conc_num_list,
+            conc_qps_list,
+            conc_latency_p99_list,
+            conc_latency_percentiles_list,
+            conc_timeline_list,
+            conc_warmup_list,
+            conc_resources_list,
+        )
+
+    def stop(self) -> None:
+        pass
+
+
+class AgentLevels:
+    """concurrency levels sent by the coordinator, until it stops the agent"""
+
+    def __init__(self, conn: Connection, max_concurrency: int):
+        self.conn = conn
+        self.max_concurrency = max_concurrency
+        self.stopped = False
+
+    def __iter__(self):
+        while True:
+            kind, payload = self.conn.recv()
+            if kind == "stop":
+                self.stopped = True
+                return
+            assert kind == "level", f"expected a level from the coordinator, got {kind}"
+            yield payload
+
+    def __repr__(self) -> str:
+        return f"AgentLevels(max_concurrency={self.max_concurrency})"
+
+
+class AgentSearchRunner(MultiProcessingSearchRunner):
+    """MultiProcessingSearchRunner of an agent, its levels and start times come from the coordinator"""
+
+    def __init__(self, db, conn: Connection, clock_offset: float, task: AgentTask):
+        super().__init__(
+            db=db,
+            test_data=task.test_data,
+            k=task.k,
+            filters=task.filters,
+            concurrencies=AgentLevels(conn, task.max_concurrency),
+            duration=task.duration,
+            warmup=task.warmup,
+        )
+        self.conn = conn
+        self.clock_offset = clock_offset
+        self.error = None  # the failure sent to the coordinator
+
+    def _send_error(self, e: Exception):
+        self.error = f"{type(e).__name__}: {e}"
+        self.conn.send(("error", self.error))
+
+    def __getstate__(self):
+        # the coordinator connection stays in the agent process, workers don't need it
+        state = self.__dict__.copy()
+        state["conn"], state["concurrencies"] = None, None
+        return state
+
+    def _wait_workers_ready(self, ready_q, workers):
+        try:
+            super()._wait_workers_ready(ready_q, workers)
+        except Exception as e:
+            self._send_error(e)
+            raise e from None
+
+    def _search_in_conc(self, m, conc, dur, task_q, result_q, workers):
+        self.conn.send(("ready", conc))
+        kind, start_at = self.conn.recv()
+        assert kind == "start", f"expected the start time from the coordinator, got {kind}"
+        delay = start_at - self.clock_offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            log.warning(f"Start concurrency {conc} {-delay:.4f}s late, increase DISTRIBUTED_START_LEAD")
+
+        try:
+            res = super()._search_in_conc(m, conc, dur, task_q, result_q, workers)
+        except Exception as e:
+            self._send_error(e)
+            raise e from None
+        self.conn.send(("result", res))
+        return res
+
+
+def _sync_clock(conn: Connection) -> float:
+    """offset of the coordinator clock to the local clock, from the round trip with the least delay"""
+    best_rtt, offset = float("inf"), 0.0
+    for _ in range(CLOCK_SYNC_ROUNDS):
+        t0 = time.time()
+        conn.send(("clock", None))
+        _, coordinator_time = conn.recv()
+        t1 = time.time()
+        if t1 - t0 < best_rtt:
+            best_rtt, offset = t1 - t0, coordinator_time - (t0 + t1) / 2
+    log.info(f"Clock offset to the coordinator: {offset:.6f}s, round trip {best_rtt:.6f}s")
+    return offset
+
+
+def serve_agent(conn: Connection):
+    """run the task of one coordinator connection, a failure is sent to the coordinator instead of done"""
+    conn.send(("hello", socket.gethostname()))
+    clock_offset = _sync_clock(conn)
+    _, task = conn.recv()
+
+    runner = None
+    try:
+        db = task.db.init_cls(
+            dim=task.test_data.shape[1],
+            db_config=task.db_config.to_dict(),
+            db_case_config=task.db_case_config,
+            drop_old=False,
+        )
+        runner = AgentSearchRunner(db, conn, clock_offset, task)
+        max_qps = runner.run()[0]
+        # the runner keeps the results of the levels before a failure, the coordinator needs the failure
+        if not runner.concurrencies.stopped:
+            raise RuntimeError(runner.error or "the search ended before the coordinator stopped it")
+    except Exception as e:
+        log.warning(f"Search agent failed: {e}")
+        traceback.print_exc()
+        if runner is None or runner.error is None:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("done", None))
+    log.info(f"Search agent done, max_qps of this agent={max_qps}")
+
+
+def run_agent(address: str, once: bool = False):
+    """connect to the coordinator at address and serve its tasks, reconnecting for the next case unless once"""
+    key = authkey()
+    while True:
+        try:
+            conn = Client(parse_address(address), authkey=key)
+        except ConnectionRefusedError:
+            log.debug(f"Coordinator {address} not listening, retry in {AGENT_RECONNECT_INTERVAL}s")
+            time.sleep(AGENT_RECONNECT_INTERVAL)
+            continue
+
+        log.info(f"Connected to the coordinator {address}")
+        with conn:
+            try:
+                serve_agent(conn)
+            except (EOFError, OSError) as e:
+                log.warning(f"Lost the coordinator {address}: {e}")
+        if once:
+            return
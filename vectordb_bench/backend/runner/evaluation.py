@@ -0,0 +1,81 @@
+import logging
+from typing import Iterable
+
+import numpy as np
+
+
+log = logging.getLogger(__name__)
+
+# fills rows with fewer than k ids, never matches anything
+PAD_ID = -1
+
+
+def to_id_matrix(rows: Iterable[Iterable[int]], k: int) -> np.ndarray:
+    """first k ids of each row in an (nq, k) int64 matrix, short rows are padded with PAD_ID"""
+    rows = list(rows)
+    matrix = np.full((len(rows), k), PAD_ID, dtype=np.int64)
+    for i, row in enumerate(rows):
+        row = np.asarray(row[:k], dtype=np.int64)
+        matrix[i, :len(row)] = row
+    return matrix
+
+
+def match_ground_truth(results: np.ndarray, ground_truth: np.ndarray) -> np.ndarray:
+    """rank of every result id in the ground truth of its query
+
+    Ids are mapped to dense codes and keyed by query, so all (nq, k) results are
+    looked up in the sorted ground truth keys with one searchsorted.
+
+    Args:
+        results(np.ndarray): (nq, k) result ids
+        ground_truth(np.ndarray): (nq, gt_k) ground truth ids, nearest first
+
+    Returns:
+        np.ndarray: (nq, k) int64 ranks in ground truth, -1 for misses and padding
+    """
+    nq, gt_k = ground_truth.shape
+    assert len(results) == nq, f"got results of {len(results)} queries for {nq} ground truth rows"
+    if results.size == 0 or ground_truth.size == 0:
+        return np.full(results.shape, -1, dtype=np.int64)
+
+    _, codes = np.unique(np.concatenate((ground_truth.ravel(), results.ravel())), return_inverse=True)
+    codes = codes.astype(np.int64).ravel()
+    row_offsets = np.arange(nq, dtype=np.int64)[:, np.newaxis] * (codes.max() + 1)
+    gt_keys = (codes[:ground_truth.size].reshape(ground_truth.shape) + row_offsets).ravel()
+    result_keys = (codes[ground_truth.size:].reshape(results.shape) + row_offsets).ravel()
+
+    # stable sort, the nearest one wins if the ground truth has duplicated ids
+    order = np.argsort(gt_keys, kind="stable")
+    sorted_keys = gt_keys[order]
+    pos = np.minimum(np.searchsorted(sorted_keys, result_keys), len(sorted_keys) - 1)
+    found = (sorted_keys[pos] == result_keys) & (results.ravel() != PAD_ID)
+    return np.where(found, order[pos] % gt_k, -1).reshape(results.shape)
+
+
+def calc_recalls(ranks: np.ndarray, k: int) -> np.ndarray:
+    """per query recall@k, results[:, :k] hit in ground_truth[:, :k] over k"""
+    ranks = ranks[:, :k]
+    return ((ranks >= 0) & (ranks < k)).sum(axis=1) / k
+
+
+def calc_ndcgs(ranks: np.ndarray, k: int) -> np.ndarray:
+    """per query ndcg@k with binary relevance, each ground truth id counts once"""
+    ranks = ranks[:, :k]
+    hits = np.zeros((len(ranks), k), dtype=bool)
+    rows, cols = np.nonzero((ranks >= 0) & (ranks < k))
+    hits[rows, ranks[rows, cols]] = True
+
+    discounts = 1 / np.log2(np.arange(k) + 2)
+    return hits @ discounts / discounts.sum()
+
+
+def distribution(values: np.ndarray, ndigits: int = 4) -> dict[str, float]:
+    """min, low percentiles, median and mean of per-query values"""
+    if len(values) == 0:
+        return {}
+
+    res = {"min": float(np.min(values))}
+    for p in (1, 5, 10, 50):
+        res[f"p{p}"] = float(np.percentile(values, p))
+    res["mean"] = float(np.mean(values))
+    return {key: round(value, ndigits) for key, value in res.items()}
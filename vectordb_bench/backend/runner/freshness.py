@@ -0,0 +1,157 @@
+import time
+import queue
+import random
+import logging
+import traceback
+import concurrent.futures
+import multiprocessing as mp
+from contextlib import contextmanager
+
+import numpy as np
+
+from vectordb_bench.backend.clients import api
+
+from .histogram import LatencyHistogram
+from .timeline import Timeline
+
+log = logging.getLogger(__name__)
+
+# topk searched with the embedding of a probed row, the row should be among them
+FRESHNESS_K = 10
+# seconds between two searches of the same pending row
+FRESHNESS_POLL_INTERVAL = 0.05
+# warn if searching all pending rows once takes longer, the latencies are that coarse
+FRESHNESS_SLOW_ROUND = 1
+
+# sentinels of the probe queue
+_FINISH, _ABORT = None, False
+
+
+class FreshnessProbe:
+    """Time-to-searchable of inserted rows, from insert_embeddings returning to the row being
+    returned by a search of its own embedding.
+
+    Insert workers submit `samples` random rows of every inserted batch. A probe process
+    with its own connection searches each pending row about every FRESHNESS_POLL_INTERVAL
+    seconds until it's in the top FRESHNESS_K results, or gives up after `timeout` seconds.
+    The latency is an upper bound, within a poll interval plus a search latency.
+
+    Rows are submitted from any process, so the times are wall clock.
+
+    Args:
+        samples(int): rows probed per inserted batch
+        timeout(float): seconds a row is probed before counting it as a timeout
+    """
+    def __init__(self, db: api.VectorDB, samples: int = 1, timeout: float = 60):
+        assert samples > 0, f"freshness samples should be positive, got {samples}"
+        self.db = db
+        self.samples = samples
+        self.timeout = timeout
+        self.queue = None
+        self.start_time = time.time()
+        self.result: dict = {}
+
+    @contextmanager
+    def running(self):
+        """run the probe process until the with block exits and all the pending rows are resolved,
+        then the summary is in self.result. Call submit() within the block."""
+        with mp.Manager() as m, concurrent.futures.ProcessPoolExecutor(
+            mp_context=mp.get_context("spawn"),
+            max_workers=1,
+        ) as executor:
+            self.queue, self.start_time = m.Queue(), time.time()
+            future = executor.submit(self.probe)
+            try:
+                yield self
+            except BaseException:
+                self.queue.put(_ABORT)
+                raise
+            else:
+                self.queue.put(_FINISH)
+                self.result = future.result()
+            finally:
+                self.queue = None
+
+    def submit(self, embeddings: np.ndarray | list[list[float]], metadata: list[int]):
+        """probe random rows of a batch that insert_embeddings just returned"""
+        inserted_at = time.time()
+        idx = random.sample(range(len(metadata)), min(self.samples, len(metadata)))
+        self.queue.put((inserted_at, [metadata[i] for i in idx], [embeddings[i] for i in idx]))
+
+    def _search(self, query) -> list[int]:
+        try:
+            return self.db.search_embedding(query, FRESHNESS_K)
+        except Exception as e:
+            log.warning(f"VectorDB search_embedding error: {e}")
+            traceback.print_exc(chain=True)
+            raise e from None
+
+    def probe(self) -> dict:
+        """search the submitted rows until the runner finishes and no row is pending"""
+        latencies, timeline = LatencyHistogram(), Timeline(self.start_time)
+        pending: dict[int, tuple[float, np.ndarray | list[float]]] = {}
+        probed, timeouts, finished, warned = 0, 0, False, False
+        with self.db.init():
+            while not finished or len(pending) > 0:
+                # block for new rows only if there's nothing to search
+                block = len(pending) == 0
+                while not finished:
+                    try:
+                        item = self.queue.get(block=block)
+                    except queue.Empty:
+                        break
+                    block = False
+                    if item is _ABORT:
+                        log.info(f"Freshness probe aborted, {len(pending)} rows pending")
+                        return {}
+                    if item is _FINISH:
+                        finished = True
+                        break
+                    inserted_at, ids, embeddings = item
+                    probed += len(ids)
+                    pending.update((i, (inserted_at, emb)) for i, emb in zip(ids, embeddings, strict=True))
+
+                round_start = time.time()
+                for i, (inserted_at, emb) in list(pending.items()):
+                    res = self._search(emb)
+                    now = time.time()
+                    if i in res:
+                        latencies.record(now - inserted_at)
+                        timeline.record(now - inserted_at, end=inserted_at)
+                        del pending[i]
+                    elif now - inserted_at >= self.timeout:
+                        timeline.record_error(end=inserted_at)
+                        timeouts += 1
+                        del pending[i]
+
+                if not warned and time.time() - round_start > FRESHNESS_SLOW_ROUND:
+                    log.warning(
+                        f"Freshness probe takes {time.time() - round_start:.4f}s to search the pending rows once, "
+                        f"the latencies are that coarse, use fewer freshness samples for a finer resolution"
+                    )
+                    warned = True
+                if len(pending) > 0:
+                    time.sleep(FRESHNESS_POLL_INTERVAL)
+
+        log.info(
+            f"Freshness probe done: probed={probed}, visible={latencies.count}, timeouts={timeouts}, "
+            f"latency={latencies.summary()}"
+        )
+        return {
+            "probed": probed,
+            "visible": latencies.count,
+            "timeouts": timeouts,
+            "latency": latencies.summary(),
+            # by the second the rows were inserted
+            "timeline": [
+                {
+                    "second": b["second"],
+                    "visible": b["count"],
+                    "timeouts": b["errors"],
+                    "latency_p50": b["latency_p50"],
+                    "latency_p99": b["latency_p99"],
+                    "latency_max": b["latency_max"],
+                }
+                for b in timeline.to_list()
+            ],
+        }
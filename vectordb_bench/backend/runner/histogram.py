@@ -0,0 +1,163 @@
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# percentiles reported for every latency histogram, label -> percentile
+LATENCY_PERCENTILES = {
+    "p50": 50,
+    "p90": 90,
+    "p95": 95,
+    "p99": 99,
+    "p99.9": 99.9,
+}
+
+
+def bucket_index(values_us: np.ndarray, sub_bucket_bits: int) -> np.ndarray:
+    """log-linear bucket of each latency in microseconds, see LatencyHistogram"""
+    _, bit_length = np.frexp(values_us.astype(np.float64))
+    shift = np.maximum(bit_length - sub_bucket_bits, 0)
+    return shift * (1 << (sub_bucket_bits - 1)) + (values_us >> shift)
+
+
+def bucket_highest_us(idx: int, sub_bucket_bits: int) -> int:
+    """largest latency in microseconds of a bucket"""
+    half = 1 << (sub_bucket_bits - 1)
+    if idx < 2 * half:
+        return idx
+    shift = (idx - 2 * half) // half + 1
+    sub = idx - shift * half
+    return ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """HDR-style latency histogram with fixed memory.
+
+    Latencies are recorded in microseconds into log-linear buckets: values below
+    2^sub_bucket_bits are exact, above that every power-of-2 range is split into
+    2^(sub_bucket_bits-1) buckets, so the relative error is below 2^-(sub_bucket_bits-1).
+    Records are buffered and flushed into the counts vectorized, so recording costs
+    about a list append. Pickling only ships non-empty buckets.
+
+    Examples:
+        >>> h = LatencyHistogram()
+        >>> h.record(0.0012)
+        >>> h.merge(other).percentile(99)
+    """
+
+    FLUSH_SIZE = 4096
+
+    def __init__(self, sub_bucket_bits: int = 10, max_value: float = 24 * 3600):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.max_value_us = int(max_value * 1e6)
+
+        self._counts = np.zeros(self._index(np.array([self.max_value_us]))[0] + 1, dtype=np.int64)
+        self._buffer = []
+
+        self._min_us = np.iinfo(np.int64).max
+        self._max_us = 0
+        self._sum_us = 0
+
+    def _index(self, values_us: np.ndarray) -> np.ndarray:
+        return bucket_index(values_us, self.sub_bucket_bits)
+
+    def _highest_equivalent_us(self, idx: int) -> int:
+        return bucket_highest_us(idx, self.sub_bucket_bits)
+
+    def record(self, latency: float):
+        """record one latency in seconds"""
+        self._buffer.append(latency)
+        if len(self._buffer) >= self.FLUSH_SIZE:
+            self._flush()
+
+    def record_many(self, latencies: list[float] | np.ndarray):
+        """record latencies in seconds"""
+        self._flush()
+        self._record_us(np.asarray(latencies, dtype=np.float64))
+
+    def _flush(self):
+        if len(self._buffer) > 0:
+            self._record_us(np.array(self._buffer, dtype=np.float64))
+            self._buffer = []
+
+    def _record_us(self, latencies: np.ndarray):
+        if latencies.size == 0:
+            return
+        values_us = np.clip(np.rint(latencies * 1e6), 0, self.max_value_us).astype(np.int64)
+        self._counts += np.bincount(self._index(values_us), minlength=self._counts.size)
+        self._min_us = min(self._min_us, int(values_us.min()))
+        self._max_us = max(self._max_us, int(values_us.max()))
+        self._sum_us += int(values_us.sum())
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """merge other histogram into this one, returns self"""
+        assert self.sub_bucket_bits == other.sub_bucket_bits and self.max_value_us == other.max_value_us, \
+            "cannot merge histograms with different bucket layouts"
+        self._flush()
+        other._flush()
+        self._counts += other._counts
+        self._min_us = min(self._min_us, other._min_us)
+        self._max_us = max(self._max_us, other._max_us)
+        self._sum_us += other._sum_us
+        return self
+
+    @classmethod
+    def merge_all(cls, histograms: list["LatencyHistogram"]) -> "LatencyHistogram":
+        merged = cls(histograms[0].sub_bucket_bits, histograms[0].max_value_us / 1e6) if histograms else cls()
+        for h in histograms:
+            merged.merge(h)
+        return merged
+
+    @property
+    def count(self) -> int:
+        self._flush()
+        return int(self._counts.sum())
+
+    @property
+    def min(self) -> float:
+        return self._min_us / 1e6 if self.count > 0 else 0.0
+
+    @property
+    def max(self) -> float:
+        return self._max_us / 1e6 if self.count > 0 else 0.0
+
+    @property
+    def mean(self) -> float:
+        count = self.count
+        return self._sum_us / count / 1e6 if count > 0 else 0.0
+
+    @property
+    def sum(self) -> float:
+        self._flush()
+        return self._sum_us / 1e6
+
+    def percentile(self, p: float) -> float:
+        """latency in seconds at percentile p, p in [0, 100]"""
+        count = self.count
+        if count == 0:
+            return 0.0
+
+        rank = max(int(np.ceil(p / 100 * count)), 1)
+        idx = int(np.searchsorted(np.cumsum(self._counts), rank))
+        return min(self._highest_equivalent_us(idx), self._max_us) / 1e6
+
+    def summary(self, ndigits: int = 6) -> dict[str, float]:
+        """p50/p90/p95/p99/p99.9/max/mean in seconds"""
+        res = {label: round(self.percentile(p), ndigits) for label, p in LATENCY_PERCENTILES.items()}
+        res["max"] = round(self.max, ndigits)
+        res["mean"] = round(self.mean, ndigits)
+        return res
+
+    def __getstate__(self) -> dict:
+        self._flush()
+        nonzero = np.flatnonzero(self._counts)
+        state = self.__dict__.copy()
+        state["_counts"] = (self._counts.size, nonzero, self._counts[nonzero])
+        return state
+
+    def __setstate__(self, state: dict):
+        size, nonzero, counts = state["_counts"]
+        state["_counts"] = np.zeros(size, dtype=np.int64)
+        state["_counts"][nonzero] = counts
+        self.__dict__.update(state)
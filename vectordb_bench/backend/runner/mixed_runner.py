@@ -0,0 +1,325 @@
+import time
+import random
+import logging
+import traceback
+import concurrent.futures
+import multiprocessing as mp
+from functools import partial
+from threading import BrokenBarrierError
+
+import numpy as np
+
+from vectordb_bench import config
+from vectordb_bench.backend.clients import api
+from vectordb_bench.backend.dataset import DatasetManager, DataSetIterator
+
+from . import evaluation
+from .mp_runner import WORKER_SYNC_TIMEOUT
+from .rate_runner import TOKEN_BUCKET_TICK
+from .timeline import Timeline
+from .util import PrefetchIterator, SharedNDArray, get_data, stack_embeddings
+
+log = logging.getLogger(__name__)
+
+# recall samples per second of each reader, scored after the run
+RECALL_SAMPLES_PER_SECOND = 10
+# seconds between the checks of the stop event in readers
+STOP_CHECK_INTERVAL = 0.5
+
+
+class MixedReadWriteRunner:
+    """Mixed workload of num_writers writers and num_readers readers running simultaneously.
+
+    Writers insert disjoint shards of the dataset, each one sequentially at
+    insert_rate / num_writers rows per second, and publish how many rows of its shard
+    are inserted. Readers search the test data closed-loop, and sample the results of up
+    to RECALL_SAMPLES_PER_SECOND queries per second together with the inserted rows of
+    every writer right before the query.
+
+    After the run, every sample is scored against its ground truth restricted to the
+    inserted ids. The ground truth is ranked over the whole dataset, so its inserted ids
+    in the same order are exactly the nearest neighbours among the inserted rows, as long
+    as k of them are inserted, samples with fewer are skipped.
+
+    All workers are released by one barrier and bucket their stats by the seconds since,
+    so the per-second series of inserts, searches and recall line up.
+
+    Args:
+        insert_rate(int): rows per second of all writers
+        num_writers(int): insert processes
+        num_readers(int): search processes
+        read_dur_after_write(int): seconds readers keep searching after all writes are done
+    """
+    def __init__(
+        self,
+        db: api.VectorDB,
+        dataset: DatasetManager,
+        insert_rate: int = 1000,
+        num_writers: int = 1,
+        num_readers: int = 1,
+        normalize: bool = False,
+        k: int = 100,
+        filters: dict | None = None,
+        read_dur_after_write: int = 30,
+    ):
+        assert insert_rate > 0 and num_writers > 0 and num_readers > 0
+        self.db = db
+        self.dataset = dataset
+        self.insert_rate = insert_rate
+        self.num_writers = num_writers
+        self.num_readers = num_readers
+        self.normalize = normalize
+        self.k = k
+        self.filters = filters
+        self.read_dur_after_write = read_dur_after_write
+
+        writer_rate = insert_rate / num_writers
+        self.chunk_size = max(1, min(config.NUM_PER_BATCH, round(writer_rate * TOKEN_BUCKET_TICK)))
+        self.test_data = SharedNDArray(stack_embeddings(dataset.test_data["emb"], normalize))
+
+    def write_worker(self, shard_idx: int, barrier, progress, stop) -> Timeline:
+        """insert the shard_idx-th shard in order until done or stop is set, publishes the inserted rows to progress[shard_idx]"""
+        rate = self.insert_rate / self.num_writers
+        batches = PrefetchIterator(
+            DataSetIterator(self.dataset, shard_idx, self.num_writers),
+            partial(get_data, normalize=self.normalize, as_list=self.db.need_list_embeddings()),
+            depth=config.LOAD_PREFETCH_DEPTH,
+        )
+        count = 0
+        with self.db.init(), batches:
+            barrier.wait(timeout=WORKER_SYNC_TIMEOUT)
+            timeline = Timeline()
+            due = timeline.start
+            for emb, metadata in batches:
+                if stop.is_set():
+                    break
+                for i in range(0, len(metadata), self.chunk_size):
+                    # paced without bursting to catch up after a slow insert
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    s = time.perf_counter()
+                    due = max(due, s) + len(metadata[i : i + self.chunk_size]) / rate
+
+                    try:
+                        inserted, error = self.db.insert_embeddings(emb[i : i + self.chunk_size], metadata[i : i + self.chunk_size])
+                    except Exception as e:
+                        timeline.record_error()
+                        log.warning(f"VectorDB insert_embeddings error: {e}")
+                        traceback.print_exc(chain=True)
+                        raise e from None
+                    if error is not None:
+                        timeline.record_error()
+                        raise error
+
+                    timeline.record(time.perf_counter() - s, count=inserted)
+                    count += inserted
+                    progress[shard_idx] = count
+
+        log.info(f"({mp.current_process().name:16}) Finish inserting shard {shard_idx}/{self.num_writers}, count={count}")
+        return timeline
+
+    def read_worker(self, test_data: SharedNDArray, barrier, progress, stop) -> tuple[Timeline, list[tuple]]:
+        """search the test data until stop is set
+
+        Returns:
+            tuple[Timeline, list[tuple]]: search timeline, and (second, query idx, result ids,
+                inserted rows of every writer) of the sampled queries
+        """
+        num, idx = len(test_data), random.randint(0, len(test_data) - 1)
+        as_list = self.db.need_list_embeddings()
+        samples = []
+        with self.db.init():
+            barrier.wait(timeout=WORKER_SYNC_TIMEOUT)
+            timeline = Timeline()
+            next_sample = next_check = timeline.start
+            while True:
+                now = time.perf_counter()
+                if now >= next_check:
+                    if stop.is_set():
+                        break
+                    next_check = now + STOP_CHECK_INTERVAL
+
+                snapshot = None
+                if now >= next_sample:
+                    snapshot = list(progress)
+                    next_sample = now + 1 / RECALL_SAMPLES_PER_SECOND
+
+                query = test_data[idx].tolist() if as_list else test_data[idx]
+                s = time.perf_counter()
+                try:
+                    res = self.db.search_embedding(query, self.k, self.filters)
+                except Exception as e:
+                    timeline.record_error()
+                    log.warning(f"VectorDB search_embedding error: {e}")
+                    traceback.print_exc(chain=True)
+                    raise e from None
+
+                end = time.perf_counter()
+                timeline.record(end - s, end=end)
+                if snapshot is not None:
+                    samples.append((int(end - timeline.start), idx, res, snapshot))
+                idx = idx + 1 if idx < num - 1 else 0
+
+        test_data.close()
+        return timeline, samples
+
+    def _id_positions(self) -> tuple[np.ndarray, np.ndarray]:
+        """writer shard and position in the shard of every id, indexed by id"""
+        shards = [
+            np.concatenate([
+                np.empty(0, dtype=np.int64),
+                *(df["id"].to_numpy() for df in DataSetIterator(self.dataset, i, self.num_writers, columns=["id"])),
+            ])
+            for i in range(self.num_writers)
+        ]
+        max_id = max(ids.max() for ids in shards if len(ids) > 0)
+        shard_of = np.zeros(max_id + 1, dtype=np.int64)
+        pos_of = np.full(max_id + 1, np.iinfo(np.int64).max, dtype=np.int64)
+        for i, ids in enumerate(shards):
+            shard_of[ids] = i
+            pos_of[ids] = np.arange(len(ids))
+        return shard_of, pos_of
+
+    def _ground_truth(self) -> np.ndarray:
+        neighbors = self.dataset.gt_data["neighbors_id"]
+        return evaluation.to_id_matrix(neighbors, max(len(n) for n in neighbors))
+
+    def _sample_truths(self, samples: list[tuple]) -> list[np.ndarray | None]:
+        """top k ground truth among the ids inserted at each sample, None if fewer than k are inserted"""
+        shard_of, pos_of = self._id_positions()
+        gt = self._ground_truth()
+
+        truths = []
+        for _, idx, _, progress in samples:
+            gt_row = gt[idx][(gt[idx] != evaluation.PAD_ID) & (gt[idx] < len(pos_of))]
+            inserted = pos_of[gt_row] < np.asarray(progress)[shard_of[gt_row]]
+            truth = gt_row[inserted][:self.k]
+            truths.append(truth if len(truth) == self.k else None)
+        return truths
+
+    def _score(self, samples: list[tuple]) -> dict[int, list[float]]:
+        """recall of the samples against their ground truth, grouped by second"""
+        seconds, results, truths = [], [], []
+        for (second, _, res, _), truth in zip(samples, self._sample_truths(samples), strict=True):
+            if truth is None:
+                continue
+            seconds.append(second)
+            results.append(res)
+            truths.append(truth)
+
+        recalls = evaluation.calc_recalls(
+            evaluation.match_ground_truth(
+                evaluation.to_id_matrix(results, self.k),
+                evaluation.to_id_matrix(truths, self.k),
+            ),
+            self.k,
+        ) if len(truths) > 0 else []
+
+        res = {}
+        for second, recall in zip(seconds, recalls, strict=True):
+            res.setdefault(second, []).append(recall)
+        log.info(f"Scored {len(truths)}/{len(samples)} recall samples, skipped the ones without k ground truth neighbours")
+        return res
+
+    def _series(self, writes: Timeline, reads: Timeline, recalls: dict[int, list[float]], ndigits: int = 6) -> list[dict]:
+        write_list = {b["second"]: b for b in writes.to_list()}
+        read_list = {b["second"]: b for b in reads.to_list()}
+        inserted, series = 0, []
+        for second in range(max([*write_list, *read_list], default=-1) + 1):
+            w, r = write_list.get(second, {}), read_list.get(second, {})
+            inserted += w.get("count", 0)
+            second_recalls = recalls.get(second, [])
+            series.append({
+                "second": second,
+                "inserted": inserted,
+                "insert_count": w.get("count", 0),
+                "insert_errors": w.get("errors", 0),
+                "insert_latency_p99": w.get("latency_p99", 0.0),
+                "search_count": r.get("count", 0),
+                "search_errors": r.get("errors", 0),
+                "search_latency_p50": r.get("latency_p50", 0.0),
+                "search_latency_p99": r.get("latency_p99", 0.0),
+                "recall": round(float(np.mean(second_recalls)), ndigits) if len(second_recalls) > 0 else None,
+                "recall_samples": len(second_recalls),
+            })
+        return series
+
+    def _run_workers(self) -> tuple[list, Timeline, list[tuple]]:
+        """run the writers and readers until all writes are done and read_dur_after_write passes
+
+        Returns:
+            tuple[list, Timeline, list[tuple]]: results of the writers, merged search timeline
+                and recall samples of the readers
+        """
+        with mp.Manager() as m:
+            progress, stop = m.list([0] * self.num_writers), m.Event()
+            barrier = m.Barrier(self.num_writers + self.num_readers + 1)
+            with concurrent.futures.ProcessPoolExecutor(
+                mp_context=mp.get_context("spawn"),
+                max_workers=self.num_writers + self.num_readers,
+            ) as executor:
+                writers = [
+                    executor.submit(self.write_worker, i, barrier, progress, stop)
+                    for i in range(self.num_writers)
+                ]
+                readers = [
+                    executor.submit(self.read_worker, self.test_data, barrier, progress, stop)
+                    for _ in range(self.num_readers)
+                ]
+                try:
+                    barrier.wait(timeout=WORKER_SYNC_TIMEOUT)
+                except BrokenBarrierError:
+                    raise RuntimeError(f"Failed to sync mixed workers in {WORKER_SYNC_TIMEOUT}s") from None
+                log.info(
+                    f"Start mixed workload, writers={self.num_writers}, readers={self.num_readers}, "
+                    f"insert_rate={self.insert_rate}"
+                )
+
+                try:
+                    # readers never end before stop, wait until all writers are done or any worker fails
+                    pending = set(writers + readers)
+                    while any(w in pending for w in writers):
+                        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                        for f in done:
+                            if f.exception() is not None:
+                                raise f.exception()
+                        if any(r in done for r in readers):
+                            raise RuntimeError("Mixed reader exits before the writes are done")
+                    write_results = [w.result() for w in writers]
+                    log.info(f"All writes done, keep searching for {self.read_dur_after_write}s")
+
+                    done, _ = concurrent.futures.wait(readers, timeout=self.read_dur_after_write, return_when=concurrent.futures.FIRST_EXCEPTION)
+                    for f in done:
+                        if f.exception() is not None:
+                            raise f.exception()
+                finally:
+                    stop.set()
+
+                reads, samples = Timeline(), []
+                for r in readers:
+                    timeline, reader_samples = r.result()
+                    reads.merge(timeline)
+                    samples.extend(reader_samples)
+        return write_results, reads, samples
+
+    def run(self) -> list[dict]:
+        """
+        Returns:
+            list[dict]: per-second series of inserted rows, insert and search counts and
+                latencies, and the mean recall of the samples in that second
+        """
+        try:
+            write_results, reads, samples = self._run_workers()
+        finally:
+            self.stop()
+
+        writes = Timeline()
+        for timeline in write_results:
+            writes.merge(timeline)
+        series = self._series(writes, reads, self._score(samples))
+        log.info(f"Mixed workload done: inserted={writes.count()}, searched={reads.count()}, seconds={len(series)}")
+        return series
+
+    def stop(self) -> None:
+        self.test_data.close()
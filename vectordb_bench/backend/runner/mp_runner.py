@@ -2,70 +2,160 @@ import time
 import traceback
 import concurrent
 import multiprocessing as mp
+import queue
 import random
 import logging
-from typing import Iterable
+from multiprocessing.managers import SyncManager
+from threading import BrokenBarrierError
+from contextlib import nullcontext
+from typing import Iterable, NamedTuple
 import numpy as np
 from ..clients import api
 from ... import config
+from .util import SharedNDArray
+from .concurrency_sweep import AdaptiveConcurrencySweep, max_concurrency
+from .histogram import LatencyHistogram
+from .resource_monitor import ResourceMonitor
+from .timeline import Timeline
+from .trace import QueryTrace
+from .warmup import Warmup
 
 
 NUM_PER_BATCH = config.NUM_PER_BATCH
+SKIP_SECONDS = config.CONCURRENCY_SKIP_SECONDS
+WORKER_SYNC_TIMEOUT = 60
+WARMUP_SYNC_INTERVAL = 0.2  # seconds between the warm-up progress updates of the workers
 log = logging.getLogger(__name__)
 
 
+class WarmupSync(NamedTuple):
+    """shared by the workers of one concurrency to finish the warm-up together"""
+    progress: dict  # worker -> Warmup.progress()
+    done: object  # Event set by the runner when the merged warm-up is done
+    barrier: object  # Barrier of the workers and the runner, the measured windows start on release
+
+
 class MultiProcessingSearchRunner:
     """ multiprocessing search runner
 
     Args:
         k(int): search topk, default to 100
-        concurrency(Iterable): concurrencies, default [1, 5, 10, 15, 20, 25, 30, 35]
+        concurrency(Iterable): concurrencies or an AdaptiveConcurrencySweep, default config.NUM_CONCURRENCY
         duration(int): duration for each concurency, default to 30s
+
+    The test data is placed once in shared memory, workers attach to it as a read-only
+    numpy view instead of unpickling their own copy.
+
+    One pool of workers is kept for the whole sweep and grown on demand up to the largest
+    concurrency. Each worker opens the db connection once and is gated per concurrency level
+    by a shared barrier, so process spawn and connection setup are only paid once.
+
+    concurrencies can also be an AdaptiveConcurrencySweep, which picks the next level
+    from the qps and latency of the searched ones.
+
+    Every worker also keeps a per-second timeline of count, errors and latencies,
+    merged by the parent for each concurrency. The first CONCURRENCY_SKIP_SECONDS
+    seconds are excluded from the reported qps.
+
+    With an enabled warmup, every worker searches through the warm-up phase before
+    its measured window of each concurrency, the warm-up stats are reported apart.
+
+    With a QueryTrace, every query of the measured windows is also written to it.
     """
     def __init__(
         self,
         db: api.VectorDB,
-        test_data: list[list[float]],
+        test_data: list[list[float]] | np.ndarray,
         k: int = 100,
         filters: dict | None = None,
         concurrencies: Iterable[int] = config.NUM_CONCURRENCY,
         duration: int = 30,
+        warmup: Warmup | None = None,
+        trace: QueryTrace | None = None,
     ):
         self.db = db
         self.k = k
         self.filters = filters
         self.concurrencies = concurrencies
         self.duration = duration
+        self.warmup = warmup if warmup is not None else Warmup()
+        self.trace = trace
 
-        self.test_data = test_data
+        self.test_data = SharedNDArray(np.asarray(test_data, dtype=np.float32))
         log.debug(f"test dataset columns: {len(test_data)}")
 
-    def search(self, test_data: list[list[float]], q: mp.Queue, cond: mp.Condition) -> tuple[int, float]:
-        # sync all process
-        q.put(1)
-        with cond:
-            cond.wait()
+    def warm_up(self, test_data: SharedNDArray, idx: int, worker: int = 0, sync: WarmupSync | None = None) -> int:
+        """search the test data until self.warmup is done, returns the next idx
 
-        with self.db.init():
-            num, idx = len(test_data), random.randint(0, len(test_data) - 1)
+        With sync, the worker publishes its progress and searches until the runner decides that
+        the warm-up of all the workers is done, then waits for all of them to start measuring together.
+        """
+        num = len(test_data)
+        self.warmup.start()
+        next_sync = self.warmup.start_time
+        as_list = self.db.need_list_embeddings()
+        while True:
+            now = time.perf_counter()
+            if sync is None:
+                if self.warmup.done(now):
+                    break
+            elif now >= next_sync:
+                sync.progress[worker] = self.warmup.progress()
+                if sync.done.is_set():
+                    break
+                next_sync = now + WARMUP_SYNC_INTERVAL
+
+            query = test_data[idx].tolist() if as_list else test_data[idx]
+            s = time.perf_counter()
+            try:
+                self.db.search_embedding(query, self.k, self.filters)
+            except Exception as e:
+                log.warning(f"VectorDB search_embedding error in warm-up: {e}")
+                traceback.print_exc(chain=True)
+                raise e from None
 
-            start_time = time.perf_counter()
-            count = 0
-            latencies = []
-            while time.perf_counter() < start_time + self.duration:
+            end = time.perf_counter()
+            self.warmup.record(end - s, end)
+            idx = idx + 1 if idx < num - 1 else 0
+
+        log.debug(f"{mp.current_process().name:16} warm-up: {self.warmup.summary()}")
+        if sync is not None:
+            sync.barrier.wait(timeout=WORKER_SYNC_TIMEOUT)
+        return idx
+
+    def search(
+        self, test_data: SharedNDArray, dur: int, conc: int = 1, worker: int = 0, sync: WarmupSync | None = None,
+    ) -> tuple[int, float, LatencyHistogram, Timeline, Warmup]:
+        """search the test data endlessly for dur seconds after the warm-up, should be called within self.db.init()"""
+        num, idx = len(test_data), random.randint(0, len(test_data) - 1)
+        if self.warmup.enabled:
+            idx = self.warm_up(test_data, idx, worker, sync)
+
+        start_time = time.perf_counter()
+        count = 0
+        latencies, timeline = LatencyHistogram(), Timeline(start_time)
+        as_list = self.db.need_list_embeddings()
+        with self.trace.writer("concurrent", conc, worker) if self.trace is not None else nullcontext() as trace:
+            while time.perf_counter() < start_time + dur:
+                query = test_data[idx].tolist() if as_list else test_data[idx]
                 s = time.perf_counter()
                 try:
-                    self.db.search_embedding(
-                        test_data[idx],
+                    res = self.db.search_embedding(
+                        query,
                         self.k,
                         self.filters,
                     )
                 except Exception as e:
+                    timeline.record_error()
                     log.warning(f"VectorDB search_embedding error: {e}")
                     traceback.print_exc(chain=True)
                     raise e from None
 
-                latencies.append(time.perf_counter() - s)
+                end = time.perf_counter()
+                latencies.record(end - s)
+                timeline.record(end - s, end=end)
+                if trace is not None:
+                    trace.record(idx, s, end - s, res)
                 count += 1
                 # loop through the test data
                 idx = idx + 1 if idx < num - 1 else 0
@@ -73,13 +163,36 @@ class MultiProcessingSearchRunner:
                 if count % 500 == 0:
                     log.debug(f"({mp.current_process().name:16}) search_count: {count}, latest_latency={time.perf_counter()-s}")
 
-        total_dur = round(time.perf_counter() - start_time, 4)
-        log.info(
-            f"{mp.current_process().name:16} search {self.duration}s: "
+            # the trace is flushed on exit, out of the measured window
+            total_dur = round(time.perf_counter() - start_time, 4)
+        log.debug(
+            f"{mp.current_process().name:16} search {dur}s: "
             f"actual_dur={total_dur}s, count={count}, qps in this process: {round(count / total_dur, 4):3}"
          )
 
-        return (count, total_dur, latencies)
+        return (count, total_dur, latencies, timeline, self.warmup)
+
+    def search_worker(self, test_data: SharedNDArray, ready_q: mp.Queue, task_q: mp.Queue, result_q: mp.Queue) -> int:
+        """long-lived worker, keeps the db connection open and serves search tasks until receives None"""
+        served = 0
+        with self.db.init():
+            ready_q.put(1)
+            while True:
+                task = task_q.get(block=True)
+                if task is None:
+                    break
+
+                dur, barrier, conc, worker, sync = task
+                try:
+                    barrier.wait(timeout=WORKER_SYNC_TIMEOUT)
+                    result_q.put(self.search(test_data, dur, conc, worker, sync))
+                except Exception as e:
+                    result_q.put(e)
+                served += 1
+
+        test_data.close()
+        log.debug(f"{mp.current_process().name:16} exits, served {served} concurrency levels")
+        return served
 
     @staticmethod
     def get_mp_context():
@@ -87,44 +200,146 @@ class MultiProcessingSearchRunner:
         log.debug(f"MultiProcessingSearchRunner get multiprocessing start method: {mp_start_method}")
         return mp.get_context(mp_start_method)
 
+    def _wait_workers_ready(self, ready_q: mp.Queue, workers: list[concurrent.futures.Future]):
+        start = time.perf_counter()
+        while ready_q.qsize() < len(workers):
+            self._check_workers_alive(workers)
+            time.sleep(0.1)
+        log.info(f"All {len(workers)} search workers are ready, cost={round(time.perf_counter() - start, 4)}s")
 
+    @staticmethod
+    def _check_workers_alive(workers: list[concurrent.futures.Future]):
+        for w in workers:
+            if w.done():
+                e = w.exception()
+                raise e if e is not None else RuntimeError("search worker exited unexpectedly")
+
+    def _wait_warmup(self, sync: WarmupSync, conc: int, result_q: mp.Queue, workers: list[concurrent.futures.Future]):
+        """decide when the warm-up of all conc workers is done from their merged progress, then release
+        them to start measuring together, the progress published last may be WARMUP_SYNC_INTERVAL old"""
+        merged = Warmup(self.warmup.duration, self.warmup.queries, self.warmup.steady_state)
+        while True:
+            time.sleep(WARMUP_SYNC_INTERVAL)
+            self._check_workers_alive(workers)
+            if result_q.qsize() > 0:
+                # a worker failed in the warm-up, release the others to report
+                sync.barrier.abort()
+                return
+            if merged.done_all(list(sync.progress.values()), conc, time.perf_counter() - WARMUP_SYNC_INTERVAL):
+                break
+
+        sync.done.set()
+        try:
+            sync.barrier.wait(timeout=WORKER_SYNC_TIMEOUT)
+        except BrokenBarrierError:
+            self._check_workers_alive(workers)
+            raise RuntimeError(f"Failed to sync {conc} search workers after the warm-up in {WORKER_SYNC_TIMEOUT}s") from None
+        log.info(f"All {conc} search workers are warmed up, start measuring")
+
+    def _search_in_conc(
+        self,
+        m: SyncManager,
+        conc: int,
+        dur: int,
+        task_q: mp.Queue,
+        result_q: mp.Queue,
+        workers: list[concurrent.futures.Future],
+    ) -> tuple[int, float, LatencyHistogram, Timeline, Warmup | None, dict]:
+        """Gate conc idle workers with a barrier, search for dur seconds in all of them
+
+        Returns:
+            tuple[int, float, LatencyHistogram, Timeline, Warmup | None, dict]: total count, cost of the measured windows,
+                merged latencies, timeline and warm-up in this concurrency, and the client resources meanwhile
+        """
+        barrier = m.Barrier(conc + 1)
+        sync = WarmupSync(m.dict(), m.Event(), m.Barrier(conc + 1)) if self.warmup.enabled else None
+        for worker in range(conc):
+            task_q.put((dur, barrier, conc, worker, sync))
 
-    def _run_all_concurrencies_mem_efficient(self) -> float:
+        try:
+            barrier.wait(timeout=WORKER_SYNC_TIMEOUT)
+        except BrokenBarrierError:
+            self._check_workers_alive(workers)
+            raise RuntimeError(f"Failed to sync {conc} search workers in {WORKER_SYNC_TIMEOUT}s") from None
+        log.info(f"Syncing all process and start concurrency search, concurrency={conc}")
+        if sync is not None:
+            self._wait_warmup(sync, conc, result_q, workers)
+
+        all_count, cost, latencies, timeline, warmup = 0, 0.0, LatencyHistogram(), Timeline(), None
+        with ResourceMonitor() as monitor:
+            for _ in range(conc):
+                while True:
+                    try:
+                        res = result_q.get(timeout=1)
+                        break
+                    except queue.Empty:
+                        self._check_workers_alive(workers)
+
+                if isinstance(res, Exception):
+                    raise res
+                all_count += res[0]
+                cost = max(cost, res[1])
+                latencies.merge(res[2])
+                timeline.merge(res[3])
+                if res[4].enabled:
+                    warmup = res[4] if warmup is None else warmup.merge(res[4])
+        return all_count, cost, latencies, timeline, warmup, monitor.summary()
+
+    def _run_all_concurrencies_mem_efficient(
+        self, duration: int,
+    ) -> tuple[float, list[int], list[float], list[float], list[dict], list[list[dict]], list[dict], list[dict]]:
         max_qps = 0
         conc_num_list = []
         conc_qps_list = []
         conc_latency_p99_list = []
+        conc_latency_percentiles_list = []
+        conc_timeline_list = []
+        conc_warmup_list = []
+        conc_resources_list = []
+        max_conc = max_concurrency(self.concurrencies)
         try:
-            for conc in self.concurrencies:
-                with mp.Manager() as m:
-                    q, cond = m.Queue(), m.Condition()
-                    with concurrent.futures.ProcessPoolExecutor(mp_context=self.get_mp_context(), max_workers=conc) as executor:
-                        log.info(f"Start search {self.duration}s in concurrency {conc}, filters: {self.filters}")
-                        future_iter = [executor.submit(self.search, self.test_data, q, cond) for i in range(conc)]
-                        # Sync all processes
-                        while q.qsize() < conc:
-                            sleep_t = conc if conc < 10 else 10
-                            time.sleep(sleep_t)
-
-                        with cond:
-                            cond.notify_all()
-                            log.info(f"Syncing all process and start concurrency search, concurrency={conc}")
-
-                        start = time.perf_counter()
-                        all_count = sum([r.result()[0] for r in future_iter])
-                        latencies = sum([r.result()[2] for r in future_iter], start=[])
-                        latency_p99 = np.percentile(latencies, 0.99)
-                        cost = time.perf_counter() - start
-
-                        qps = round(all_count / cost, 4)
-                        conc_num_list.append(conc)
-                        conc_qps_list.append(qps)
-                        conc_latency_p99_list.append(latency_p99)
-                        log.info(f"End search in concurrency {conc}: dur={cost}s, total_count={all_count}, qps={qps}")
-
-                if qps > max_qps:
-                    max_qps = qps
-                    log.info(f"Update largest qps with concurrency {conc}: current max_qps={max_qps}")
+            with mp.Manager() as m:
+                ready_q, task_q, result_q = m.Queue(), m.Queue(), m.Queue()
+                with concurrent.futures.ProcessPoolExecutor(mp_context=self.get_mp_context(), max_workers=max_conc) as executor:
+                    workers = []
+                    try:
+                        for conc in self.concurrencies:
+                            if len(workers) < conc:
+                                log.info(f"Start {conc - len(workers)} more search workers for concurrencies: {self.concurrencies}")
+                                workers.extend(
+                                    executor.submit(self.search_worker, self.test_data, ready_q, task_q, result_q)
+                                    for _ in range(conc - len(workers))
+                                )
+                                self._wait_workers_ready(ready_q, workers)
+
+                            log.info(f"Start search {duration}s in concurrency {conc}, filters: {self.filters}")
+                            all_count, cost, latencies, timeline, warmup, resources = self._search_in_conc(
+                                m, conc, duration, task_q, result_q, workers,
+                            )
+                            latency_p99 = latencies.percentile(99)
+
+                            qps = round(timeline.qps(cost, SKIP_SECONDS), 4)
+                            conc_num_list.append(conc)
+                            conc_qps_list.append(qps)
+                            conc_latency_p99_list.append(latency_p99)
+                            conc_latency_percentiles_list.append(latencies.summary())
+                            conc_timeline_list.append(timeline.to_list())
+                            conc_resources_list.append(resources)
+                            if resources["client_bound"]:
+                                log.warning(f"Client-bound in concurrency {conc}, the qps measures this client: {resources}")
+                            if warmup is not None:
+                                conc_warmup_list.append(warmup.summary())
+                                log.info(f"Warm-up in concurrency {conc}: {warmup.summary()}")
+                            log.info(f"End search in concurrency {conc}: dur={cost}s, total_count={all_count}, qps={qps}, latency={latencies.summary()}")
+                            if isinstance(self.concurrencies, AdaptiveConcurrencySweep):
+                                self.concurrencies.record(conc, qps, latency_p99)
+
+                            if qps > max_qps:
+                                max_qps = qps
+                                log.info(f"Update largest qps with concurrency {conc}: current max_qps={max_qps}")
+                    finally:
+                        for _ in workers:
+                            task_q.put(None)
         except Exception as e:
             log.warning(f"Fail to search all concurrencies: {self.concurrencies}, max_qps before failure={max_qps}, reason={e}")
             traceback.print_exc()
@@ -133,102 +348,32 @@ class MultiProcessingSearchRunner:
             if max_qps == 0.0:
                 raise e from None
 
-        finally:
-            self.stop()
-
-        return max_qps, conc_num_list, conc_qps_list, conc_latency_p99_list
-
-    def run(self) -> float:
+        return (
+            max_qps,
+            conc_num_list,
+            conc_qps_list,
+            conc_latency_p99_list,
+            conc_latency_percentiles_list,
+            conc_timeline_list,
+            conc_warmup_list,
+            conc_resources_list,
+        )
+
+    def run(self) -> tuple[float, list[int], list[float], list[float], list[dict], list[list[dict]], list[dict], list[dict]]:
         """
         Returns:
-            float: largest qps
+            tuple: max_qps, the largest qps of all concurrencies, and one entry per concurrency in each list:
+                concurrencies, qps, latency p99, latency percentiles, per-second timeline,
+                warm-up summary (only of the concurrencies that warmed up), and client resources
         """
-        return self._run_all_concurrencies_mem_efficient()
-
-    def stop(self) -> None:
-        pass
-
-    def run_by_dur(self, duration: int) -> float:
-        return self._run_by_dur(duration)
-
-    def _run_by_dur(self, duration: int) -> float:
-        max_qps = 0
         try:
-            for conc in self.concurrencies:
-                with mp.Manager() as m:
-                    q, cond = m.Queue(), m.Condition()
-                    with concurrent.futures.ProcessPoolExecutor(mp_context=self.get_mp_context(), max_workers=conc) as executor:
-                        log.info(f"Start search_by_dur {duration}s in concurrency {conc}, filters: {self.filters}")
-                        future_iter = [executor.submit(self.search_by_dur, duration, self.test_data, q, cond) for i in range(conc)]
-                        # Sync all processes
-                        while q.qsize() < conc:
-                            sleep_t = conc if conc < 10 else 10
-                            time.sleep(sleep_t)
-
-                        with cond:
-                            cond.notify_all()
-                            log.info(f"Syncing all process and start concurrency search, concurrency={conc}")
-
-                        start = time.perf_counter()
-                        all_count = sum([r.result() for r in future_iter])
-                        cost = time.perf_counter() - start
-
-                        qps = round(all_count / cost, 4)
-                        log.info(f"End search in concurrency {conc}: dur={cost}s, total_count={all_count}, qps={qps}")
-
-                if qps > max_qps:
-                    max_qps = qps
-                    log.info(f"Update largest qps with concurrency {conc}: current max_qps={max_qps}")
-        except Exception as e:
-            log.warning(f"Fail to search all concurrencies: {self.concurrencies}, max_qps before failure={max_qps}, reason={e}")
-            traceback.print_exc()
-
-            # No results available, raise exception
-            if max_qps == 0.0:
-                raise e from None
-
+            return self._run_all_concurrencies_mem_efficient(self.duration)
         finally:
             self.stop()
 
-        return max_qps
-
-
-    def search_by_dur(self, dur: int, test_data: list[list[float]], q: mp.Queue, cond: mp.Condition) -> int:
-        # sync all process
-        q.put(1)
-        with cond:
-            cond.wait()
-
-        with self.db.init():
-            num, idx = len(test_data), random.randint(0, len(test_data) - 1)
-
-            start_time = time.perf_counter()
-            count = 0
-            while time.perf_counter() < start_time + dur:
-                s = time.perf_counter()
-                try:
-                    self.db.search_embedding(
-                        test_data[idx],
-                        self.k,
-                        self.filters,
-                    )
-                except Exception as e:
-                    log.warning(f"VectorDB search_embedding error: {e}")
-                    traceback.print_exc(chain=True)
-                    raise e from None
-
-                count += 1
-                # loop through the test data
-                idx = idx + 1 if idx < num - 1 else 0
-
-                if count % 500 == 0:
-                    log.debug(f"({mp.current_process().name:16}) search_count: {count}, latest_latency={time.perf_counter()-s}")
-
-        total_dur = round(time.perf_counter() - start_time, 4)
-        log.debug(
-            f"{mp.current_process().name:16} search {self.duration}s: "
-            f"actual_dur={total_dur}s, count={count}, qps in this process: {round(count / total_dur, 4):3}"
-         )
-
-        return count
+    def stop(self) -> None:
+        self.test_data.close()
 
+    def run_by_dur(self, duration: int) -> float:
+        max_qps, *_ = self._run_all_concurrencies_mem_efficient(duration)
+        return max_qps
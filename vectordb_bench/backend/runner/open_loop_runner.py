@@ -0,0 +1,161 @@
+import asyncio
+import time
+import traceback
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+import numpy as np
+from ... import config
+from ..clients import api
+from .async_runner import AsyncSearchRunner
+from .histogram import LatencyHistogram
+
+
+log = logging.getLogger(__name__)
+
+
+class OpenLoopSearchRunner(AsyncSearchRunner):
+    """ open-loop search runner
+
+    Schedules queries at a target rate regardless of whether previous queries returned,
+    and sweeps a list of target rates instead of concurrencies. Latency is measured from
+    the intended send time, so queueing delay behind slow responses is not omitted
+    (coordinated-omission correction). Failed and timed-out queries are recorded too,
+    they are the tail under overload, and the errors of each rate are reported.
+
+    Args:
+        k(int): search topk, default to 100
+        target_qps_list(Iterable): target arrival rates to sweep, queries per second
+        duration(int): duration for each target rate, default to 30s
+        poisson(bool): poisson inter-arrival times if True, otherwise fixed intervals
+        max_in_flight(int): max outstanding requests, late queries are queued
+            and their waiting time is counted into latency
+        timeout(float): seconds a query waits for its response before it fails, None waits forever
+    """
+    def __init__(
+        self,
+        db: api.VectorDB,
+        test_data: list[list[float]] | np.ndarray,
+        target_qps_list: Iterable[float],
+        k: int = 100,
+        filters: dict | None = None,
+        duration: int = 30,
+        poisson: bool = False,
+        max_in_flight: int = 256,
+        timeout: float | None = config.OPEN_LOOP_REQUEST_TIMEOUT,
+    ):
+        target_qps_list = list(target_qps_list)
+        if len(target_qps_list) == 0:
+            raise ValueError("open-loop search needs at least one target qps")
+        super().__init__(
+            db=db,
+            test_data=test_data,
+            k=k,
+            filters=filters,
+            concurrencies=[max_in_flight],
+            duration=duration,
+        )
+        self.target_qps_list = target_qps_list
+        self.poisson = poisson
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+    async def _send(self, query: np.ndarray | list[float], intended: float, sem: asyncio.Semaphore, latencies: LatencyHistogram, errors: list[Exception]):
+        """search one query, its latency from the intended send time is recorded whether it succeeds, fails or times out"""
+        try:
+            async with sem:
+                await asyncio.wait_for(self.db.search_embedding_async(query, self.k, self.filters), self.timeout)
+        except Exception as e:
+            errors.append(e)
+        latencies.record(time.perf_counter() - intended)
+
+    async def _search_at_rate(self, rate: float, dur: int) -> tuple[int, int, float, LatencyHistogram]:
+        """issue queries at rate for dur seconds
+
+        Returns:
+            tuple[int, int, float, LatencyHistogram]: succeeded count, errors, cost,
+                and latencies from intended send time of all the queries
+        """
+        num, idx = len(self.test_data), random.randint(0, len(self.test_data) - 1)
+        sem = asyncio.Semaphore(self.max_in_flight)
+        latencies, errors, pending = LatencyHistogram(), [], set()
+        rng = np.random.default_rng()
+        interval = 1 / rate
+        as_list = self.db.need_list_embeddings()
+
+        start = time.perf_counter()
+        intended = start
+        while intended < start + dur:
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            query = self.test_data[idx].tolist() if as_list else self.test_data[idx]
+            task = asyncio.create_task(self._send(query, intended, sem, latencies, errors))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+            idx = idx + 1 if idx < num - 1 else 0
+            intended += rng.exponential(interval) if self.poisson else interval
+
+        await asyncio.gather(*pending)
+        cost = time.perf_counter() - start
+
+        count = latencies.count - len(errors)
+        if len(errors) > 0:
+            log.warning(f"{len(errors)} searches failed at target qps {rate}, first error: {type(errors[0]).__name__}: {errors[0]}")
+            if count == 0:
+                raise errors[0]
+        return count, len(errors), cost, latencies
+
+    async def _run_all_rates(self) -> tuple[float, list[float], list[float], list[float], list[dict], list[int], list[float]]:
+        max_qps = 0
+        target_qps_list = []
+        qps_list = []
+        latency_p99_list = []
+        latency_percentiles_list = []
+        error_count_list = []
+        success_ratio_list = []
+
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_in_flight))
+        try:
+            async with self.db.init_async():
+                for rate in self.target_qps_list:
+                    log.info(f"Start open-loop search {self.duration}s at target qps {rate}, poisson={self.poisson}, filters: {self.filters}")
+                    count, errors, cost, latencies = await self._search_at_rate(rate, self.duration)
+                    latency_p99 = latencies.percentile(99)
+
+                    qps = round(count / cost, 4)
+                    target_qps_list.append(rate)
+                    qps_list.append(qps)
+                    latency_p99_list.append(latency_p99)
+                    latency_percentiles_list.append(latencies.summary())
+                    error_count_list.append(errors)
+                    success_ratio_list.append(round(count / latencies.count, 4))
+                    log.info(
+                        f"End open-loop search at target qps {rate}: dur={cost}s, total_count={count}, "
+                        f"errors={errors}, qps={qps}, latency={latencies.summary()}"
+                    )
+
+                    if qps > max_qps:
+                        max_qps = qps
+        except Exception as e:
+            log.warning(f"Fail to search all target qps: {self.target_qps_list}, max_qps before failure={max_qps}, reason={e}")
+            traceback.print_exc()
+
+            # No results available, raise exception
+            if max_qps == 0.0:
+                raise e from None
+
+        return max_qps, target_qps_list, qps_list, latency_p99_list, latency_percentiles_list, error_count_list, success_ratio_list
+
+    def _run_in_loop(self) -> tuple[float, list[float], list[float], list[float], list[dict], list[int], list[float]]:
+        """
+        Returns:
+            tuple: max_qps, the largest succeeded qps of all rates, and one entry per rate in each list:
+                target rates, succeeded qps, latency p99, latency percentiles of all the queries,
+                failed and timed-out queries, and the ratio of the queries that succeeded
+        """
+        return asyncio.run(self._run_all_rates())
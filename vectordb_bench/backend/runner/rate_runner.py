@@ -1,7 +1,13 @@
 import logging
+import math
 import time
+import threading
+from typing import Iterable, Iterator
 from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import multiprocessing as mp
+from contextlib import nullcontext
+import numpy as np
 
 
 from vectordb_bench.backend.clients import api
@@ -9,11 +15,30 @@ from vectordb_bench.backend.dataset import DataSetIterator
 from vectordb_bench.backend.utils import time_it
 from vectordb_bench import config
 
-from .util import get_data, is_futures_completed, get_future_exceptions
+from .util import get_data, PrefetchIterator
+from .freshness import FreshnessProbe
+from .timeline import Timeline
 log = logging.getLogger(__name__)
 
 
+# seconds of rows per insert request at low rates, so that they are paced by small requests
+TOKEN_BUCKET_TICK = 0.1
+
+
 class RatedMultiThreadingInsertRunner:
+    """Inserts the dataset at `rate` rows per second, paced by a token bucket.
+
+    Tokens accrue at `rate` rows per second, up to one request. A request of up to
+    `chunk_size` rows, sliced from the dataset batches, is sent as soon as its tokens
+    are available. At most `max_in_flight` requests are outstanding, when the db applies
+    backpressure the scheduler blocks and the achieved rate falls below the target.
+
+    The queue given to run_with_rate is signaled every `rate` rows sent, i.e. once per
+    second of the target rate.
+
+    With freshness_samples, rows of each request are probed for the time until they are
+    searchable, see FreshnessProbe.
+    """
     def __init__(
         self,
         rate: int, # numRows per second
@@ -21,59 +46,129 @@ class RatedMultiThreadingInsertRunner:
         dataset_iter: DataSetIterator,
         normalize: bool = False,
         timeout: float | None = None,
+        max_in_flight: int = mp.cpu_count(),
+        freshness_samples: int = 0,
     ):
+        assert rate > 0, f"insert rate should be positive, got {rate}"
         self.timeout = timeout if isinstance(timeout, (int, float)) else None
         self.dataset = dataset_iter
         self.db = db
         self.normalize = normalize
         self.insert_rate = rate
-        self.batch_rate = rate // config.NUM_PER_BATCH
+        self.chunk_size = max(1, min(config.NUM_PER_BATCH, round(rate * TOKEN_BUCKET_TICK)))
+        self.max_in_flight = max_in_flight
+        self.freshness = FreshnessProbe(db, freshness_samples) if freshness_samples > 0 else None
+
+    def send_insert_task(self, db, emb: np.ndarray | list[list[float]], metadata: list[int], timeline: Timeline | None = None, lock=None):
+        """insert a request, an insert error fails the load like the serial insert, the rows are not skipped"""
+        s = time.perf_counter()
+        try:
+            count, error = db.insert_embeddings(emb, metadata)
+            if error is not None:
+                raise error
+        except Exception as e:
+            if timeline is not None:
+                with lock:
+                    timeline.record_error()
+            raise e from None
+
+        if timeline is not None:
+            with lock:
+                timeline.record(time.perf_counter() - s, count=count)
+        if self.freshness is not None:
+            self.freshness.submit(emb, metadata)
+
+    def _chunks(self, batches: Iterable) -> Iterator[tuple[np.ndarray | list[list[float]], list[int]]]:
+        for emb, metadata in batches:
+            for i in range(0, len(metadata), self.chunk_size):
+                yield emb[i : i + self.chunk_size], metadata[i : i + self.chunk_size]
+
+    def run_with_rate(self, q: mp.Queue) -> tuple[list[dict], float]:
+        """insert the dataset at self.insert_rate, signals q every self.insert_rate rows sent
 
-    def send_insert_task(self, db, emb: list[list[float]], metadata: list[str]):
-        db.insert_embeddings(emb, metadata)
+        Returns:
+            tuple[list[dict], float]: per-second insert timeline, with the target, sent rows,
+                the seconds blocked by max_in_flight, and with the probe, the freshness p99 and
+                timeouts of the rows inserted in each second. And the insert duration, excluding
+                the wait for the rows still probed after it.
+        """
+        with self.freshness.running() if self.freshness is not None else nullcontext():
+            res, dur = self._run_with_rate(q)
+
+        if self.freshness is not None and len(self.freshness.result) > 0:
+            freshness = {b["second"]: b for b in self.freshness.result["timeline"]}
+            for bucket in res:
+                probed = freshness.get(bucket["second"], {})
+                bucket["freshness_p99"] = probed.get("latency_p99", 0.0)
+                bucket["freshness_timeouts"] = probed.get("timeouts", 0)
+            log.info(f"Insert freshness: {({k: v for k, v in self.freshness.result.items() if k != 'timeline'})}")
+        return res, dur
 
     @time_it
-    def run_with_rate(self, q: mp.Queue):
-        with ThreadPoolExecutor(max_workers=mp.cpu_count()) as executor:
-            executing_futures = []
-
-            @time_it
-            def submit_by_rate() -> bool:
-                rate = self.batch_rate
-                for data in self.dataset:
-                    emb, metadata = get_data(data, self.normalize)
-                    executing_futures.append(executor.submit(self.send_insert_task, self.db, emb, metadata))
-                    rate -= 1
-
-                    if rate == 0:
-                        return False
-                return rate == self.batch_rate
-
-            with self.db.init():
+    def _run_with_rate(self, q: mp.Queue) -> list[dict]:
+        rate = self.insert_rate
+        timeline, lock = Timeline(), threading.Lock()
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        sent, blocked, errors = {}, {}, []
+
+        def on_done(future):
+            in_flight.release()
+            if future.exception() is not None:
+                errors.append(future.exception())
+
+        # keep one second of batches decoded, so the scheduler doesn't wait on decoding
+        depth = max(config.LOAD_PREFETCH_DEPTH, math.ceil(rate / config.NUM_PER_BATCH)) if config.LOAD_PREFETCH_DEPTH > 0 else 0
+        batches = PrefetchIterator(
+            self.dataset,
+            partial(get_data, normalize=self.normalize, as_list=self.db.need_list_embeddings()),
+            depth=depth,
+        )
+        with batches, self.db.init(), ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            tokens, last = 0.0, timeline.start
+            total_sent, signaled = 0, 0
+            for emb, metadata in self._chunks(batches):
+                n = len(metadata)
                 while True:
-                    start_time = time.perf_counter()
-                    finished, elapsed_time = submit_by_rate()
-                    if finished is True:
-                        q.put(None, block=True)
-                        log.info(f"End of dataset, left unfinished={len(executing_futures)}")
-                        return
+                    now = time.perf_counter()
+                    tokens, last = min(tokens + (now - last) * rate, max(n, self.chunk_size)), now
+                    if tokens >= n:
+                        break
+                    time.sleep((n - tokens) / rate)
+
+                while not in_flight.acquire(timeout=1) and len(errors) == 0:
+                    log.debug(f"{self.max_in_flight} insert requests in flight for over 1s, the db applies backpressure")
+                waited = time.perf_counter() - now
+                if len(errors) > 0:
+                    break
+
+                second = int(now - timeline.start)
+                blocked[second] = blocked.get(second, 0) + waited
+                sent[second] = sent.get(second, 0) + n
+                tokens -= n
+                executor.submit(self.send_insert_task, self.db, emb, metadata, timeline, lock).add_done_callback(on_done)
 
+                total_sent += n
+                while total_sent >= (signaled + 1) * rate:
                     q.put(True, block=False)
-                    wait_interval = 1 - elapsed_time if elapsed_time < 1 else 0.001
-
-                    e, completed = is_futures_completed(executing_futures, wait_interval)
-                    if completed is True:
-                        ex = get_future_exceptions(executing_futures)
-                        if ex is not None:
-                            log.warn(f"task error, terminating, err={ex}")
-                            q.put(None)
-                            executor.shutdown(wait=True, cancel_futures=True)
-                            raise ex
-                        else:
-                            log.debug(f"Finished {len(executing_futures)} insert-{config.NUM_PER_BATCH} task in 1s, wait_interval={wait_interval:.2f}")
-                        executing_futures = []
-                    else:
-                        log.warning(f"Failed to finish tasks in 1s, {e}, waited={wait_interval:.2f}, try to check the next round")
-                    dur = time.perf_counter() - start_time
-                    if dur < 1:
-                        time.sleep(1 - dur)
+                    signaled += 1
+
+            executor.shutdown(wait=True)
+
+        if len(errors) > 0:
+            log.warning(f"task error, terminating, err={errors[0]}")
+            q.put(None)
+            raise errors[0]
+
+        q.put(None, block=True)
+        dur = time.perf_counter() - timeline.start
+        log.info(
+            f"End of dataset, target_rate={rate}, sent={total_sent}, inserted={timeline.count()}, "
+            f"achieved_rate={round(timeline.count() / dur, 4)}"
+        )
+
+        res = timeline.to_list()
+        for bucket in res:
+            bucket["target"] = rate
+            bucket["sent"] = sent.get(bucket["second"], 0)
+            bucket["blocked"] = round(blocked.get(bucket["second"], 0), 4)
+        return res
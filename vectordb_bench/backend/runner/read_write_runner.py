@@ -2,12 +2,12 @@ import logging
 from typing import Iterable
 import multiprocessing as mp
 import concurrent
-import numpy as np
 import math
 
 from .mp_runner import MultiProcessingSearchRunner
 from .serial_runner import SerialSearchRunner
 from .rate_runner import RatedMultiThreadingInsertRunner
+from .util import stack_embeddings
 from vectordb_bench.backend.clients import api
 from vectordb_bench.backend.dataset import DatasetManager
 
@@ -38,10 +38,7 @@ class ReadWriteRunner(MultiProcessingSearchRunner, RatedMultiThreadingInsertRunn
 
         log.info(f"Init runner, concurencys={concurrencies}, search_stage={search_stage}, stage_search_dur={read_dur_after_write}")
 
-        test_emb = np.stack(dataset.test_data["emb"])
-        if normalize:
-            test_emb = test_emb / np.linalg.norm(test_emb, axis=1)[:, np.newaxis]
-        test_emb = test_emb.tolist()
+        test_emb = stack_embeddings(dataset.test_data["emb"], normalize)
 
         MultiProcessingSearchRunner.__init__(
             self,
@@ -67,15 +64,18 @@ class ReadWriteRunner(MultiProcessingSearchRunner, RatedMultiThreadingInsertRunn
 
     def run_read_write(self):
         futures = []
-        with mp.Manager() as m:
-            q = m.Queue()
-            with concurrent.futures.ProcessPoolExecutor(mp_context=mp.get_context("spawn"), max_workers=2) as executor:
-                futures.append(executor.submit(self.run_with_rate, q))
-                futures.append(executor.submit(self.run_search_by_sig, q))
-
-                for future in concurrent.futures.as_completed(futures):
-                    res = future.result()
-                    log.info(f"Result = {res}")
+        try:
+            with mp.Manager() as m:
+                q = m.Queue()
+                with concurrent.futures.ProcessPoolExecutor(mp_context=mp.get_context("spawn"), max_workers=2) as executor:
+                    futures.append(executor.submit(self.run_with_rate, q))
+                    futures.append(executor.submit(self.run_search_by_sig, q))
+
+                    for future in concurrent.futures.as_completed(futures):
+                        res = future.result()
+                        log.info(f"Result = {res}")
+        finally:
+            self.stop()
 
         log.info("Concurrent read write all done")
 
@@ -94,7 +94,7 @@ class ReadWriteRunner(MultiProcessingSearchRunner, RatedMultiThreadingInsertRunn
                     perc = int(stage * 100)
                     log.info(f"Insert {perc}% done, total batch={total_batch}")
                     log.info(f"[{batch}/{total_batch}] Serial search - {perc}% start")
-                    recall, ndcg, p99 =self.serial_search_runner.run()
+                    recall, ndcg, p99, *_ = self.serial_search_runner.run()
 
                     if idx < len(self.search_stage) - 1:
                         stage_search_dur = (self.data_volume  * (self.search_stage[idx + 1] - stage) // self.insert_rate) // len(self.concurrencies)
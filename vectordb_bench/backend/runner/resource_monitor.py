@@ -0,0 +1,124 @@
+import os
+import time
+import logging
+import threading
+
+import psutil
+
+from ... import config
+
+log = logging.getLogger(__name__)
+
+
+class ResourceMonitor:
+    """CPU, context switches and memory of the benchmark client while a stage runs.
+
+    A thread samples the process tree of `pid`, the runner and all its worker processes,
+    every `interval` seconds and once more on exit. CPU time and context switches are
+    accumulated per process since the monitor started, or since the process spawned.
+
+    The stage is flagged client-bound if the tree uses threshold of all the cores, or a single
+    process, usually a search worker, uses threshold of one core. Either way the client is the
+    bottleneck, not the database, and adding concurrency only measures the client.
+
+    Use it as a context manager, then summary().
+
+    Args:
+        pid(int): root of the process tree, default to this process
+        interval(float): seconds between samples
+        threshold(float): cpu utilization from 0 to 1 to flag client-bound
+    """
+    def __init__(
+        self,
+        pid: int | None = None,
+        interval: float = config.RESOURCE_SAMPLE_INTERVAL,
+        threshold: float = config.CLIENT_BOUND_CPU_THRESHOLD,
+    ):
+        self.root = psutil.Process(pid if pid is not None else os.getpid())
+        self.interval = interval
+        self.threshold = threshold
+        self.cpu_count = psutil.cpu_count() or 1
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._procs: dict[int, psutil.Process] = {}
+        self._baseline: dict[int, tuple[float, int, int]] = {}  # cpu seconds, voluntary and involuntary switches
+        self._last: dict[int, tuple[float, int, int]] = {}
+        self._start = self._end = 0.0
+        self._last_time, self._last_cpu = 0.0, 0.0
+        self._cores_max, self._rss_max = 0.0, 0
+
+    def _processes(self) -> list[psutil.Process]:
+        try:
+            procs = [self.root, *self.root.children(recursive=True)]
+        except psutil.NoSuchProcess:
+            return []
+        # keep the Process objects, psutil tells a reused pid apart by its create time
+        return [self._procs.setdefault(p.pid, p) for p in procs]
+
+    def _sample(self):
+        now, rss = time.perf_counter(), 0
+        for p in self._processes():
+            try:
+                with p.oneshot():
+                    cpu = p.cpu_times()
+                    switches = p.num_ctx_switches()
+                    rss += p.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            self._last[p.pid] = (cpu.user + cpu.system, switches.voluntary, switches.involuntary)
+            if self._start == 0.0:
+                self._baseline[p.pid] = self._last[p.pid]
+
+        total_cpu = self._cpu()
+        if self._start == 0.0:
+            self._start = now
+        elif now > self._last_time:
+            self._cores_max = max(self._cores_max, (total_cpu - self._last_cpu) / (now - self._last_time))
+        self._last_time, self._last_cpu = now, total_cpu
+        self._rss_max = max(self._rss_max, rss)
+
+    def _delta(self, pid: int) -> tuple[float, int, int]:
+        last, base = self._last[pid], self._baseline.get(pid, (0.0, 0, 0))
+        return last[0] - base[0], last[1] - base[1], last[2] - base[2]
+
+    def _cpu(self) -> float:
+        return sum(self._delta(pid)[0] for pid in self._last)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        self._end = time.perf_counter()
+
+    def summary(self) -> dict:
+        """cpu cores used in average and in the busiest interval, cpu utilization of all cores, cores
+        used by the busiest process, context switches, peak rss of the tree in bytes, and the flag"""
+        dur = max(self._end - self._start, 1e-9)
+        deltas = [self._delta(pid) for pid in self._last]
+        cores_avg = sum(d[0] for d in deltas) / dur
+        process_max = max((d[0] for d in deltas), default=0.0) / dur
+        utilization = cores_avg / self.cpu_count
+        return {
+            "duration": round(dur, 4),
+            "cpu_count": self.cpu_count,
+            "cpu_cores_avg": round(cores_avg, 4),
+            "cpu_cores_max": round(max(self._cores_max, cores_avg), 4),
+            "cpu_utilization": round(utilization, 4),
+            "process_cpu_max": round(process_max, 4),
+            "processes": len(deltas),
+            "ctx_switches_voluntary": sum(d[1] for d in deltas),
+            "ctx_switches_involuntary": sum(d[2] for d in deltas),
+            "rss_max": self._rss_max,
+            "client_bound": utilization >= self.threshold or process_max >= self.threshold,
+        }
@@ -3,186 +3,282 @@ import logging
 import traceback
 import concurrent
 import multiprocessing as mp
-import math
+from contextlib import nullcontext
+from functools import partial
 import psutil
 
 import numpy as np
 import pandas as pd
 
 from ..clients import api
-from ...metric import calc_ndcg, calc_recall, get_ideal_dcg
-from ...models import LoadTimeoutError, PerformanceTimeoutError
+from ...models import PerformanceTimeoutError, LoadResumeError
 from .. import utils
 from ... import config
-from vectordb_bench.backend.dataset import DatasetManager
+from . import evaluation
+from .checkpoint import LoadCheckpoint
+from .freshness import FreshnessProbe
+from .histogram import LatencyHistogram
+from .timeline import Timeline
+from .trace import QueryTrace
+from .util import PrefetchIterator, get_data
+from vectordb_bench.backend.dataset import DatasetManager, DataSetIterator
 
 NUM_PER_BATCH = config.NUM_PER_BATCH
-LOAD_MAX_TRY_COUNT = 10
-WAITTING_TIME = 60
 
 log = logging.getLogger(__name__)
 
 class SerialInsertRunner:
-    def __init__(self, db: api.VectorDB, dataset: DatasetManager, normalize: bool, timeout: float | None = None):
+    """Insert the train data of the dataset
+
+    Args:
+        load_concurrency(int): worker processes of the performance case load, each
+            inserts a disjoint shard of the train file row groups, default to 1
+        freshness_samples(int): rows of each inserted batch probed for the time to be
+            searchable, see FreshnessProbe, default to 0 that disables the probe
+        checkpoint(LoadCheckpoint): saves the progress of each shard after every inserted batch,
+            default to None that doesn't, a checkpoint write per batch is part of the load duration.
+            It's cleared once the load finishes, only an interrupted load leaves it to resume
+        resume(bool): continue from the checkpoint after verifying the db row count matches it,
+            otherwise the checkpoint is cleared and the load starts over
+    """
+    def __init__(
+        self,
+        db: api.VectorDB,
+        dataset: DatasetManager,
+        normalize: bool,
+        timeout: float | None = None,
+        load_concurrency: int = 1,
+        freshness_samples: int = 0,
+        checkpoint: LoadCheckpoint | None = None,
+        resume: bool = False,
+    ):
         self.timeout = timeout if isinstance(timeout, (int, float)) else None
         self.dataset = dataset
         self.db = db
         self.normalize = normalize
+        self.load_concurrency = max(load_concurrency, 1)
+        self.freshness = FreshnessProbe(db, freshness_samples) if freshness_samples > 0 else None
+        self.checkpoint = checkpoint
+        self.resume = resume and checkpoint is not None
 
-    def task(self) -> int:
+    def task(self, shard_idx: int = 0, num_shards: int = 1) -> tuple[int, Timeline]:
         count = 0
+        skip = self.checkpoint.load(shard_idx, num_shards) if self.checkpoint is not None else 0
         with self.db.init():
-            log.info(f"({mp.current_process().name:16}) Start inserting embeddings in batch {config.NUM_PER_BATCH}")
+            log.info(
+                f"({mp.current_process().name:16}) Start inserting embeddings of shard {shard_idx}/{num_shards} "
+                f"in batch {config.NUM_PER_BATCH}, skip {skip} rows inserted before"
+            )
             start = time.perf_counter()
-            for data_df in self.dataset:
-                all_metadata = data_df['id'].tolist()
-
-                emb_np = np.stack(data_df['emb'])
-                if self.normalize:
-                    log.debug("normalize the 100k train data")
-                    all_embeddings = (emb_np / np.linalg.norm(emb_np, axis=1)[:, np.newaxis]).tolist()
-                else:
-                    all_embeddings = emb_np.tolist()
-                del(emb_np)
-                log.debug(f"batch dataset size: {len(all_embeddings)}, {len(all_metadata)}")
-
-                insert_count, error = self.db.insert_embeddings(
-                    embeddings=all_embeddings,
-                    metadata=all_metadata,
-                )
-                if error is not None:
-                    raise error
-
-                assert insert_count == len(all_metadata)
-                count += insert_count
-                if count % 100_000 == 0:
-                    log.info(f"({mp.current_process().name:16}) Loaded {count} embeddings into VectorDB")
-
-            log.info(f"({mp.current_process().name:16}) Finish loading all dataset into VectorDB, dur={time.perf_counter()-start}")
-            return count
-
-    def endless_insert_data(self, all_embeddings, all_metadata, left_id: int = 0) -> int:
-        with self.db.init():
-            # unique id for endlessness insertion
-            all_metadata = [i+left_id for i in all_metadata]
-
-            NUM_BATCHES = math.ceil(len(all_embeddings)/NUM_PER_BATCH)
-            log.info(f"({mp.current_process().name:16}) Start inserting {len(all_embeddings)} embeddings in batch {NUM_PER_BATCH}")
-            count = 0
-            for batch_id in range(NUM_BATCHES):
-                retry_count = 0
-                already_insert_count = 0
-                metadata = all_metadata[batch_id*NUM_PER_BATCH : (batch_id+1)*NUM_PER_BATCH]
-                embeddings = all_embeddings[batch_id*NUM_PER_BATCH : (batch_id+1)*NUM_PER_BATCH]
-
-                log.debug(f"({mp.current_process().name:16}) batch [{batch_id:3}/{NUM_BATCHES}], Start inserting {len(metadata)} embeddings")
-                while retry_count < LOAD_MAX_TRY_COUNT:
+            timeline = Timeline(start)
+            dataset_iter = DataSetIterator(self.dataset, shard_idx, num_shards, skip_rows=skip)
+            cursor = dataset_iter.cursor(skip) if self.checkpoint is not None else None
+            batches = PrefetchIterator(
+                dataset_iter,
+                partial(get_data, normalize=self.normalize, as_list=self.db.need_list_embeddings()),
+                depth=config.LOAD_PREFETCH_DEPTH,
+            )
+            with batches:
+                for all_embeddings, all_metadata in batches:
+                    log.debug(f"batch dataset size: {len(all_embeddings)}, {len(all_metadata)}")
+
+                    s = time.perf_counter()
                     insert_count, error = self.db.insert_embeddings(
-                        embeddings=embeddings[already_insert_count :],
-                        metadata=metadata[already_insert_count :],
+                        embeddings=all_embeddings,
+                        metadata=all_metadata,
                     )
-                    already_insert_count += insert_count
                     if error is not None:
-                        retry_count += 1
-                        time.sleep(WAITTING_TIME)
-
-                        log.info(f"Failed to insert data, try {retry_count} time")
-                        if retry_count >= LOAD_MAX_TRY_COUNT:
-                            raise error
-                    else:
-                        break
-                log.debug(f"({mp.current_process().name:16}) batch [{batch_id:3}/{NUM_BATCHES}], Finish inserting {len(metadata)} embeddings")
-
-                assert already_insert_count == len(metadata)
-                count += already_insert_count
-            log.info(f"({mp.current_process().name:16}) Finish inserting {len(all_embeddings)} embeddings in batch {NUM_PER_BATCH}")
-        return count
+                        timeline.record_error()
+                        raise error
+                    timeline.record(time.perf_counter() - s, count=insert_count)
+                    if self.freshness is not None:
+                        self.freshness.submit(all_embeddings, all_metadata)
+
+                    assert insert_count == len(all_metadata)
+                    count += insert_count
+                    if self.checkpoint is not None:
+                        self.checkpoint.save(shard_idx, num_shards, skip + count, cursor.advance(insert_count))
+                    if count % 100_000 == 0:
+                        log.info(f"({mp.current_process().name:16}) Loaded {count} embeddings into VectorDB")
+
+            log.info(f"({mp.current_process().name:16}) Finish loading shard {shard_idx}/{num_shards} into VectorDB, count={count}, dur={time.perf_counter()-start}")
+            return count, timeline
 
     @utils.time_it
-    def _insert_all_batches(self) -> int:
+    def _insert_all_batches(self) -> tuple[int, list[dict]]:
         """Performance case only"""
-        with concurrent.futures.ProcessPoolExecutor(mp_context=mp.get_context('spawn'), max_workers=1) as executor:
-            future = executor.submit(self.task)
-            try:
-                count = future.result(timeout=self.timeout)
-            except TimeoutError as e:
-                msg = f"VectorDB load dataset timeout in {self.timeout}"
-                log.warning(msg)
+        num = self.load_concurrency
+        with concurrent.futures.ProcessPoolExecutor(mp_context=mp.get_context('spawn'), max_workers=num) as executor:
+            futures = [executor.submit(self.task, idx, num) for idx in range(num)]
+            done, not_done = concurrent.futures.wait(
+                futures,
+                timeout=self.timeout,
+                return_when=concurrent.futures.FIRST_EXCEPTION,
+            )
+
+            errors = [f.exception() for f in done if f.exception() is not None]
+            if len(errors) > 0 or len(not_done) > 0:
                 for pid, _ in executor._processes.items():
                     psutil.Process(pid).kill()
-                raise PerformanceTimeoutError(msg) from e
-            except Exception as e:
-                log.warning(f"VectorDB load dataset error: {e}")
-                raise e from e
-            else:
-                return count
-
-    def run_endlessness(self) -> int:
-        """run forever util DB raises exception or crash"""
-        # datasets for load tests are quite small, can fit into memory
-        # only 1 file
-        data_df = [data_df for data_df in self.dataset][0]
-        all_embeddings, all_metadata = np.stack(data_df["emb"]).tolist(), data_df['id'].tolist()
-
-        start_time = time.perf_counter()
-        max_load_count, times = 0, 0
-        try:
-            with self.db.init():
-                self.db.ready_to_load()
-            while time.perf_counter() - start_time < self.timeout:
-                count = self.endless_insert_data(all_embeddings, all_metadata, left_id=max_load_count)
-                max_load_count += count
-                times += 1
-                log.info(f"Loaded {times} entire dataset, current max load counts={utils.numerize(max_load_count)}, {max_load_count}")
-        except Exception as e:
-            log.info(f"Capacity case load reach limit, insertion counts={utils.numerize(max_load_count)}, {max_load_count}, err={e}")
-            traceback.print_exc()
-            return max_load_count
-        else:
-            msg = f"capacity case load timeout in {self.timeout}s"
-            log.info(msg)
-            raise LoadTimeoutError(msg)
 
-    def run(self) -> int:
-        count, dur = self._insert_all_batches()
-        return count
+            if len(errors) > 0:
+                log.warning(f"VectorDB load dataset error: {errors[0]}")
+                raise errors[0] from errors[0]
+            if len(not_done) > 0:
+                msg = f"VectorDB load dataset timeout in {self.timeout}"
+                log.warning(msg)
+                raise PerformanceTimeoutError(msg)
+
+            count, timeline = 0, Timeline()
+            for f in futures:
+                shard_count, shard_timeline = f.result()
+                count += shard_count
+                timeline.merge(shard_timeline)
+            return count, timeline.to_list()
+
+    def _unacknowledged_ids(self, shard_idx: int, num_shards: int, inserted: int) -> list[int]:
+        """ids of the batch a shard may have inserted after its last checkpoint"""
+        ids = []
+        for df in DataSetIterator(self.dataset, shard_idx, num_shards, columns=["id"], skip_rows=inserted):
+            ids.extend(df["id"].tolist())
+            if len(ids) >= NUM_PER_BATCH:
+                break
+        return ids[:NUM_PER_BATCH]
+
+    def _verify_checkpoint(self) -> int:
+        """check the rows in the db match the checkpoint before resuming from it. Rows of the batches
+        inserted but not acknowledged when the load was interrupted are deleted first, if the db can.
+
+        Returns:
+            int: rows inserted before the checkpoint
+        """
+        num = self.load_concurrency
+        inserted = [self.checkpoint.load(idx, num) for idx in range(num)]
+        total = sum(inserted)
+        if not self.db.support_count():
+            log.warning(
+                f"{self.db.__class__.__name__} doesn't support count_embeddings, "
+                f"resume the load from the checkpoint of {total} rows unverified"
+            )
+            return total
+
+        with self.db.init():
+            count = self.db.count_embeddings()
+            if count > total and self.db.support_delete():
+                ids = [i for idx in range(num) for i in self._unacknowledged_ids(idx, num, inserted[idx])]
+                log.info(f"VectorDB has {count - total} rows more than the load checkpoint, delete the unacknowledged batches")
+                _, error = self.db.delete_embeddings(ids)
+                if error is not None:
+                    raise error
+                count = self.db.count_embeddings()
+
+        if count != total:
+            msg = f"VectorDB has {count} rows but the load checkpoint has {total}, can't resume the load, load from scratch"
+            log.warning(msg)
+            raise LoadResumeError(msg)
+        log.info(f"Resume the load from the checkpoint, {total} rows already inserted: {inserted}")
+        return total
+
+    def run(self) -> tuple[tuple[int, list[dict], dict, int | None], float]:
+        """
+        Returns:
+            tuple[tuple[int, list[dict], dict, int | None], float]: inserted count, per-second insert timeline,
+                the time-to-searchable summary of the probed rows, empty without the probe,
+                and the rows inserted before the checkpoint of a resumed load, None if the load wasn't resumed.
+                And the insert duration, excluding the wait for the rows still probed after it.
+                A resumed load only counts and times the rows inserted after the checkpoint.
+        """
+        resumed_rows = None
+        if self.resume:
+            resumed_rows = self._verify_checkpoint()
+        elif self.checkpoint is not None:
+            self.checkpoint.clear()
+        with self.freshness.running() if self.freshness is not None else nullcontext():
+            (count, timeline), dur = self._insert_all_batches()
+        # the load is complete, a later resume_load starts over
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+        return (count, timeline, self.freshness.result if self.freshness is not None else {}, resumed_rows), dur
+
+
+OTHER_PHASE = "other"  # time of the call not marked by the client, e.g. the python call and the runner
+
+
+def record_search_phases(phase_latencies: dict[str, LatencyHistogram], durations: dict[api.SearchPhase, float], latency: float):
+    """record the phase durations of one search_embedding call, and the rest of its latency as OTHER_PHASE"""
+    for phase, duration in durations.items():
+        phase_latencies.setdefault(phase.value, LatencyHistogram()).record(duration)
+    phase_latencies.setdefault(OTHER_PHASE, LatencyHistogram()).record(max(latency - sum(durations.values()), 0.0))
+
+
+def search_breakdown(phase_latencies: dict[str, LatencyHistogram], latencies: LatencyHistogram) -> dict[str, dict]:
+    """latency percentiles of each search phase and its share of the total latency, empty if the client marks no phase"""
+    total = latencies.sum
+    return {
+        phase: {**h.summary(), "share": round(h.sum / total, 4) if total > 0 else 0.0}
+        for phase, h in phase_latencies.items()
+    }
 
 
 class SerialSearchRunner:
+    """ serial search runner
+
+    Searches every test query once and scores the results against the ground truth.
+    Clients marking the SearchPhase of search_embedding also get the breakdown of the latency.
+
+    Args:
+        k(int): search topk, default to 100
+        recall_k_list(list[int]): also report recall/ndcg at these k, scored from the results of
+            a second search with max(*recall_k_list) if it's larger than k, the recall, ndcg and
+            latency at k always come from a search at k. Ks beyond the ground truth are dropped.
+        trace(QueryTrace): also write every query to it
+    """
     def __init__(
         self,
         db: api.VectorDB,
-        test_data: list[list[float]],
+        test_data: np.ndarray | list[list[float]],
         ground_truth: pd.DataFrame,
         k: int = 100,
         filters: dict | None = None,
+        recall_k_list: list[int] | None = None,
+        trace: QueryTrace | None = None,
     ):
         self.db = db
         self.k = k
         self.filters = filters
+        self.trace = trace
+
+        gt_k = len(ground_truth['neighbors_id'][0]) if len(ground_truth) > 0 else k
+        self.recall_k_list = sorted({rk for rk in recall_k_list or [] if rk <= gt_k})
+        if len(self.recall_k_list) < len(set(recall_k_list or [])):
+            log.warning(f"ground truth only has {gt_k} neighbors, drop recall k beyond it: {recall_k_list}")
+        self.search_k = max([self.k, *self.recall_k_list])
 
-        if isinstance(test_data[0], np.ndarray):
-            self.test_data = [query.tolist() for query in test_data]
+        if db.need_list_embeddings():
+            self.test_data = np.asarray(test_data).tolist()
         else:
-            self.test_data = test_data
+            self.test_data = np.ascontiguousarray(test_data, dtype=np.float32)
         self.ground_truth = ground_truth
 
-    def search(self, args: tuple[list, pd.DataFrame]):
-        log.info(f"{mp.current_process().name:14} start search the entire test_data to get recall and latency")
-        with self.db.init():
-            test_data, ground_truth = args
-            ideal_dcg = get_ideal_dcg(self.k)
-
-            log.debug(f"test dataset size: {len(test_data)}")
-            log.debug(f"ground truth size: {ground_truth.columns}, shape: {ground_truth.shape}")
-
-            latencies, recalls, ndcgs = [], [], []
+    def _search_all(
+        self, test_data: list, k: int, trace: QueryTrace | None = None, phases: api.SearchPhases | None = None,
+    ) -> tuple[list[list[int]], LatencyHistogram, dict[str, LatencyHistogram]]:
+        """search every query once at k
+
+        Returns:
+            tuple: results, latencies, and the latencies of each search phase if phases is given
+        """
+        latencies, results, phase_latencies = LatencyHistogram(), [], {}
+        self.db.search_phases = phases
+        with trace.writer("serial") if trace is not None else nullcontext() as writer:
             for idx, emb in enumerate(test_data):
                 s = time.perf_counter()
+                if phases is not None:
+                    phases.start(s)
                 try:
-                    results = self.db.search_embedding(
+                    res = self.db.search_embedding(
                         emb,
-                        self.k,
+                        k,
                         self.filters,
                     )
 
@@ -191,38 +287,92 @@ class SerialSearchRunner:
                     traceback.print_exc(chain=True)
                     raise e from None
 
-                latencies.append(time.perf_counter() - s)
-
-                gt = ground_truth['neighbors_id'][idx]
-                recalls.append(calc_recall(self.k, gt[:self.k], results))
-                ndcgs.append(calc_ndcg(gt[:self.k], results, ideal_dcg))
+                latency = time.perf_counter() - s
+                latencies.record(latency)
+                results.append(res)
+                if phases is not None and len(phases.durations) > 0:
+                    record_search_phases(phase_latencies, phases.durations, latency)
+                if writer is not None:
+                    writer.record(idx, s, latency, res)
+
+                if len(results) % 100 == 0:
+                    log.debug(f"({mp.current_process().name:14}) search_count={len(results):3}, latest_latency={latency}")
+        self.db.search_phases = None
+        return results, latencies, phase_latencies
+
+    def _ranks(self, results: list[list[int]], ground_truth: pd.DataFrame, k: int) -> np.ndarray:
+        return evaluation.match_ground_truth(
+            evaluation.to_id_matrix(results, k),
+            evaluation.to_id_matrix(ground_truth['neighbors_id'][:len(results)], k),
+        )
 
+    def search(self, args: tuple[list, pd.DataFrame]):
+        log.info(f"{mp.current_process().name:14} start search the entire test_data to get recall and latency")
+        with self.db.init():
+            test_data, ground_truth = args
 
-                if len(latencies) % 100 == 0:
-                    log.debug(f"({mp.current_process().name:14}) search_count={len(latencies):3}, latest_latency={latencies[-1]}, latest recall={recalls[-1]}")
+            log.debug(f"test dataset size: {len(test_data)}")
+            log.debug(f"ground truth size: {ground_truth.columns}, shape: {ground_truth.shape}")
 
-        avg_latency = round(np.mean(latencies), 4)
+            results, latencies, phase_latencies = self._search_all(test_data, self.k, self.trace, api.SearchPhases())
+            # the curve beyond k needs deeper results, searched again so that k doesn't change the headline metrics
+            curve_results = results
+            if self.search_k > self.k:
+                log.info(f"{mp.current_process().name:14} search the entire test_data again at k={self.search_k} for the recall curve")
+                curve_results, _, _ = self._search_all(test_data, self.search_k)
+
+        # score all results at once after the timed loop
+        ranks = self._ranks(results, ground_truth, self.k)
+        curve_ranks = self._ranks(curve_results, ground_truth, self.search_k)
+        recalls = evaluation.calc_recalls(ranks, self.k)
+        ndcgs = evaluation.calc_ndcgs(ranks, self.k)
+        recall_curve = {rk: round(np.mean(evaluation.calc_recalls(curve_ranks, rk)), 4) for rk in self.recall_k_list}
+        ndcg_curve = {rk: round(np.mean(evaluation.calc_ndcgs(curve_ranks, rk)), 4) for rk in self.recall_k_list}
+
+        avg_latency = round(latencies.mean, 4)
         avg_recall = round(np.mean(recalls), 4)
         avg_ndcg = round(np.mean(ndcgs), 4)
-        cost = round(np.sum(latencies), 4)
-        p99 = round(np.percentile(latencies, 99), 4)
+        cost = round(latencies.sum, 4)
+        p99 = round(latencies.percentile(99), 4)
+        recall_distribution = evaluation.distribution(recalls)
+        ndcg_distribution = evaluation.distribution(ndcgs)
+        breakdown = search_breakdown(phase_latencies, latencies)
         log.info(
             f"{mp.current_process().name:14} search entire test_data: "
             f"cost={cost}s, "
-            f"queries={len(latencies)}, "
+            f"queries={latencies.count}, "
             f"avg_recall={avg_recall}, "
             f"avg_ndcg={avg_ndcg},"
             f"avg_latency={avg_latency}, "
-            f"p99={p99}"
+            f"p99={p99}, "
+            f"latency={latencies.summary()}, "
+            f"recall={recall_distribution}, "
+            f"recall_curve={recall_curve}, "
+            f"breakdown={breakdown}"
          )
-        return (avg_recall, avg_ndcg, p99)
-
-
-    def _run_in_subprocess(self) -> tuple[float, float]:
+        return (
+            avg_recall,
+            avg_ndcg,
+            p99,
+            latencies.summary(),
+            recall_distribution,
+            ndcg_distribution,
+            recall_curve,
+            ndcg_curve,
+            breakdown,
+        )
+
+
+    def _run_in_subprocess(self) -> tuple[float, float, float, dict, dict, dict, dict, dict, dict]:
         with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
             future = executor.submit(self.search, (self.test_data, self.ground_truth))
             result = future.result()
             return result
 
-    def run(self) -> tuple[float, float]:
+    def run(self) -> tuple[float, float, float, dict, dict, dict, dict, dict, dict]:
+        """
+        Returns:
+            tuple: recall, ndcg, serial latency p99, latency percentiles, per-query recall and ndcg distributions,
+                recall and ndcg at each of recall_k_list, and the breakdown of the latency into search phases
+        """
         return self._run_in_subprocess()
@@ -0,0 +1,162 @@
+import time
+import logging
+
+import numpy as np
+
+from .histogram import bucket_index, bucket_highest_us
+
+log = logging.getLogger(__name__)
+
+# coarser buckets than the per-window histograms, relative error below 2^-(bits-1), about 6%
+TIMELINE_SUB_BUCKET_BITS = 5
+TIMELINE_MAX_LATENCY_US = 3600 * 10**6
+# latencies buffered in a bucket before they are folded into its sparse buckets
+TIMELINE_FLUSH_SIZE = 4096
+
+
+class TimelineBucket:
+    """count, errors and latencies within one second.
+
+    A timeline of a multi-day load has hundreds of thousands of these, so the latencies are a
+    sparse histogram: only the non-empty buckets of the coarse log-linear layout are kept, as two
+    small arrays, and latencies are buffered until the second is over or the buffer is full.
+    The per-window percentiles come from the full resolution LatencyHistogram of the runners.
+    """
+    __slots__ = ("count", "errors", "max_us", "_indexes", "_counts", "_buffer")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.max_us = 0
+        self._indexes = np.empty(0, dtype=np.uint16)
+        self._counts = np.empty(0, dtype=np.uint32)
+        self._buffer = None
+
+    def record(self, latency: float):
+        if self._buffer is None:
+            self._buffer = []
+        self._buffer.append(latency)
+        if len(self._buffer) >= TIMELINE_FLUSH_SIZE:
+            self.compact()
+
+    def _add(self, indexes: np.ndarray, counts: np.ndarray):
+        indexes, inverse = np.unique(np.concatenate([self._indexes, indexes]), return_inverse=True)
+        merged = np.zeros(len(indexes), dtype=np.uint32)
+        np.add.at(merged, inverse, np.concatenate([self._counts, counts]))
+        self._indexes, self._counts = indexes.astype(np.uint16), merged
+
+    def compact(self):
+        """fold the buffered latencies into the sparse buckets"""
+        if self._buffer is None:
+            return
+        values_us = np.clip(np.rint(np.array(self._buffer, dtype=np.float64) * 1e6), 0, TIMELINE_MAX_LATENCY_US).astype(np.int64)
+        self._buffer = None
+        self.max_us = max(self.max_us, int(values_us.max()))
+        self._add(bucket_index(values_us, TIMELINE_SUB_BUCKET_BITS), np.ones(len(values_us), dtype=np.uint32))
+
+    def merge(self, other: "TimelineBucket") -> "TimelineBucket":
+        self.compact()
+        other.compact()
+        self.count += other.count
+        self.errors += other.errors
+        self.max_us = max(self.max_us, other.max_us)
+        self._add(other._indexes, other._counts)
+        return self
+
+    @property
+    def latency_max(self) -> float:
+        self.compact()
+        return self.max_us / 1e6
+
+    def percentile(self, p: float) -> float:
+        """latency in seconds at percentile p, p in [0, 100]"""
+        self.compact()
+        total = int(self._counts.sum())
+        if total == 0:
+            return 0.0
+        rank = max(int(np.ceil(p / 100 * total)), 1)
+        pos = int(np.searchsorted(np.cumsum(self._counts), rank))
+        return min(bucket_highest_us(int(self._indexes[pos]), TIMELINE_SUB_BUCKET_BITS), self.max_us) / 1e6
+
+    def __getstate__(self) -> tuple:
+        self.compact()
+        return self.count, self.errors, self.max_us, self._indexes, self._counts
+
+    def __setstate__(self, state: tuple):
+        self.count, self.errors, self.max_us, self._indexes, self._counts = state
+        self._buffer = None
+
+
+class Timeline:
+    """Per-second buckets of count, errors and latency histogram.
+
+    Buckets are keyed by whole seconds since `start`. Workers started at the same
+    time (e.g. released by one barrier) each keep their own timeline, and the parent
+    merges them second by second.
+
+    Args:
+        start(float): time.perf_counter() the timeline starts from, default to now
+    """
+
+    def __init__(self, start: float | None = None):
+        self.start = time.perf_counter() if start is None else start
+        self.buckets: dict[int, TimelineBucket] = {}
+        self._last = None  # second of the last record
+
+    def _bucket(self, end: float | None) -> TimelineBucket:
+        second = max(int((time.perf_counter() if end is None else end) - self.start), 0)
+        if second != self._last:
+            # the previous second is most likely over, don't keep its buffer
+            if self._last in self.buckets:
+                self.buckets[self._last].compact()
+            self._last = second
+        if second not in self.buckets:
+            self.buckets[second] = TimelineBucket()
+        return self.buckets[second]
+
+    def record(self, latency: float, count: int = 1, end: float | None = None):
+        """record a successful request of `count` items that finished at `end`"""
+        bucket = self._bucket(end)
+        bucket.count += count
+        bucket.record(latency)
+
+    def record_error(self, end: float | None = None):
+        self._bucket(end).errors += 1
+
+    def merge(self, other: "Timeline") -> "Timeline":
+        """merge other timeline second by second, returns self"""
+        for second, bucket in other.buckets.items():
+            if second in self.buckets:
+                self.buckets[second].merge(bucket)
+            else:
+                self.buckets[second] = bucket
+        return self
+
+    def count(self, skip_seconds: int = 0) -> int:
+        """total count, excluding the first `skip_seconds` seconds"""
+        return sum(b.count for s, b in self.buckets.items() if s >= skip_seconds)
+
+    def qps(self, dur: float, skip_seconds: int = 0) -> float:
+        """qps over dur seconds, the first `skip_seconds` seconds are excluded if dur is long enough"""
+        if 0 < skip_seconds < dur:
+            return self.count(skip_seconds) / (dur - skip_seconds)
+        return self.count() / dur
+
+    def to_list(self, ndigits: int = 6) -> list[dict]:
+        """one dict per second from 0 to the last second, empty seconds included"""
+        if len(self.buckets) == 0:
+            return []
+
+        res = []
+        empty = TimelineBucket()
+        for second in range(max(self.buckets) + 1):
+            bucket = self.buckets.get(second, empty)
+            res.append({
+                "second": second,
+                "count": bucket.count,
+                "errors": bucket.errors,
+                "latency_p50": round(bucket.percentile(50), ndigits),
+                "latency_p99": round(bucket.percentile(99), ndigits),
+                "latency_max": round(bucket.latency_max, ndigits),
+            })
+        return res
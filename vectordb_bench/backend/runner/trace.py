@@ -0,0 +1,151 @@
+import os
+import time
+import uuid
+import logging
+import pathlib
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ... import config
+from . import evaluation
+
+log = logging.getLogger(__name__)
+
+# columns of the files, run_id, db, case, stage and concurrency are in the partition path
+TRACE_SCHEMA = pa.schema([
+    ("worker", pa.int32()),
+    ("query_idx", pa.int64()),
+    ("send_ts", pa.float64()),  # unix seconds
+    ("latency", pa.float64()),  # seconds
+    ("result_ids", pa.list_(pa.int64())),
+    ("recall", pa.float64()),  # recall@k, null without ground truth
+])
+
+
+class QueryTrace:
+    """Opt-in sink of every measured query, for analysis after the run.
+
+    Each worker opens its own QueryTraceWriter per stage and concurrency, records are
+    appended to plain lists on the hot path and written as one Arrow record batch every
+    buffer_rows queries and on close, so a run costs one flush per buffer, not per query.
+
+    Files are hive-partitioned, read `root` as one dataset by pyarrow or pandas to get the
+    partition keys as columns too:
+    `<root>/run_id=<run_id>/db=<db>/case=<case>/stage=<stage>/concurrency=<n>/part-*.parquet`
+
+    Args:
+        root(pathlib.Path): directory of all the traces
+        run_id(str): run_id of the task
+        db(str): db name of the task
+        case(str): case of the task
+        ground_truth(np.ndarray): (nq, gt_k) ground truth ids to score the recall of each query, optional
+        k(int): recall@k of each query
+        buffer_rows(int): queries per record batch
+    """
+    def __init__(
+        self,
+        root: pathlib.Path,
+        run_id: str,
+        db: str,
+        case: str,
+        ground_truth: np.ndarray | None = None,
+        k: int = 100,
+        buffer_rows: int = config.TRACE_BUFFER_ROWS,
+    ):
+        self.root = pathlib.Path(root)
+        self.run_id = run_id
+        self.db = db
+        self.case = case
+        self.ground_truth = ground_truth[:, :k] if ground_truth is not None else None
+        self.k = k
+        self.buffer_rows = max(buffer_rows, 1)
+
+    def partition(self, stage: str, concurrency: int) -> pathlib.Path:
+        return self.root.joinpath(
+            f"run_id={self.run_id}", f"db={self.db}", f"case={self.case}",
+            f"stage={stage}", f"concurrency={concurrency}",
+        )
+
+    def writer(self, stage: str, concurrency: int = 1, worker: int = 0) -> "QueryTraceWriter":
+        return QueryTraceWriter(self, stage, concurrency, worker)
+
+
+class QueryTraceWriter:
+    """Buffers the queries of one worker in one stage and concurrency, use it as a context manager.
+
+    record() takes the perf_counter time the query was sent, converted to unix time on flush.
+    """
+    def __init__(self, trace: QueryTrace, stage: str, concurrency: int, worker: int):
+        self.trace = trace
+        self.stage = stage
+        self.concurrency = concurrency
+        self.worker = worker
+        self.path = trace.partition(stage, concurrency).joinpath(
+            f"part-{worker:03d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet"
+        )
+        self.rows = 0
+        self._writer = None
+        self._wall_offset = time.time() - time.perf_counter()
+        self._reset()
+
+    def _reset(self):
+        self._query_idx, self._send, self._latency, self._results = [], [], [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def record(self, query_idx: int, send: float, latency: float, result_ids: list[int]):
+        """record one query, send is its time.perf_counter() before the search"""
+        self._query_idx.append(query_idx)
+        self._send.append(send)
+        self._latency.append(latency)
+        self._results.append(result_ids)
+        if len(self._query_idx) >= self.trace.buffer_rows:
+            self.flush()
+
+    def _recalls(self, query_idx: np.ndarray) -> pa.Array:
+        gt = self.trace.ground_truth
+        if gt is None or len(query_idx) == 0 or query_idx.max() >= len(gt):
+            return pa.nulls(len(query_idx), pa.float64())
+        k = self.trace.k
+        ranks = evaluation.match_ground_truth(evaluation.to_id_matrix(self._results, k), gt[query_idx])
+        return pa.array(evaluation.calc_recalls(ranks, k), pa.float64())
+
+    def _result_ids(self) -> pa.Array:
+        lengths = np.fromiter((len(r) for r in self._results), dtype=np.int32, count=len(self._results))
+        offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int32)))
+        values = np.fromiter((i for r in self._results for i in r), dtype=np.int64, count=int(offsets[-1]))
+        return pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), pa.array(values, pa.int64()))
+
+    def flush(self):
+        num = len(self._query_idx)
+        if num == 0:
+            return
+        query_idx = np.asarray(self._query_idx, dtype=np.int64)
+        batch = pa.RecordBatch.from_arrays([
+            pa.array(np.full(num, self.worker, dtype=np.int32)),
+            pa.array(query_idx),
+            pa.array(np.asarray(self._send, dtype=np.float64) + self._wall_offset),
+            pa.array(np.asarray(self._latency, dtype=np.float64)),
+            self._result_ids(),
+            self._recalls(query_idx),
+        ], schema=TRACE_SCHEMA)
+
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path, TRACE_SCHEMA)
+        self._writer.write_batch(batch)
+        self.rows += num
+        self._reset()
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            log.debug(f"Wrote {self.rows} query traces to {self.path}")
@@ -1,21 +1,37 @@
 import logging
-import concurrent
-from typing import Iterable
+import os
+import queue
+import threading
+import concurrent.futures
+from multiprocessing import shared_memory
+from typing import Any, Callable, Iterable, Iterator
 
 from pandas import DataFrame
 import numpy as np
 
 log = logging.getLogger(__name__)
 
-def get_data(data_df: DataFrame, normalize: bool) -> tuple[list[list[float]], list[str]]:
+def get_data(data_df: DataFrame, normalize: bool, as_list: bool = False) -> tuple[np.ndarray | list[list[float]], list[int]]:
+    """embeddings in a contiguous float32 array and their ids of the batch
+
+    Args:
+        as_list(bool): materialize embeddings as python lists, for clients with need_list_embeddings()
+    """
     all_metadata = data_df['id'].tolist()
-    emb_np = np.stack(data_df['emb'])
+    all_embeddings = stack_embeddings(data_df['emb'], normalize)
+    if as_list:
+        return all_embeddings.tolist(), all_metadata
+    return all_embeddings, all_metadata
+
+
+def stack_embeddings(embeddings: Iterable, normalize: bool = False) -> np.ndarray:
+    """stack the embeddings into a contiguous float32 array, normalize to unit length if needed"""
+    emb_np = np.ascontiguousarray(np.stack(embeddings), dtype=np.float32)
     if normalize:
         log.debug("normalize the 100k train data")
-        all_embeddings = (emb_np / np.linalg.norm(emb_np, axis=1)[:, np.newaxis]).tolist()
-    else:
-        all_embeddings = emb_np.tolist()
-    return all_embeddings, all_metadata
+        emb_np /= np.linalg.norm(emb_np, axis=1)[:, np.newaxis]
+    return emb_np
+
 
 def is_futures_completed(futures: Iterable[concurrent.futures.Future], interval) -> (Exception, bool):
     try:
@@ -30,3 +46,169 @@ def get_future_exceptions(futures: Iterable[concurrent.futures.Future]) -> BaseE
         if f.exception() is not None:
             return f.exception()
     return
+
+
+class SharedNDArray:
+    """A read-only numpy array placed once in shared memory.
+
+    Pickling only ships the name, shape and dtype of the shared memory block, so
+    every spawned worker attaches to the same buffer instead of unpickling its own
+    copy. The process that created the block owns it and unlinks it in `close()`.
+
+    Examples:
+        >>> shared = SharedNDArray(np.stack(test_data["emb"]))
+        >>> executor.submit(search, shared)  # workers read shared[idx] zero-copy
+        >>> shared.close()
+    """
+
+    def __init__(self, data: np.ndarray | list[list[float]]):
+        arr = np.ascontiguousarray(data)
+        self.shape, self.dtype = arr.shape, arr.dtype
+        self._owner_pid = os.getpid()
+        self._shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        self._name = self._shm.name
+        self._array = None
+        self._released = False
+
+        np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)[:] = arr
+        log.debug(f"Put {self.shape} {self.dtype} array into shared memory {self._name}, size={arr.nbytes}")
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._released:
+            raise RuntimeError(f"Shared memory {self._name} has already been released")
+
+        if self._array is None:
+            if self._shm is None:
+                self._shm = shared_memory.SharedMemory(name=self._name)
+            self._array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+            self._array.flags.writeable = False
+        return self._array
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, idx):
+        return self.array[idx]
+
+    def __getstate__(self) -> dict:
+        return {"name": self._name, "shape": self.shape, "dtype": self.dtype}
+
+    def __setstate__(self, state: dict):
+        self._name, self.shape, self.dtype = state["name"], state["shape"], state["dtype"]
+        self._owner_pid = None
+        self._shm = None
+        self._array = None
+        self._released = False
+
+    @property
+    def is_owner(self) -> bool:
+        return self._owner_pid == os.getpid()
+
+    def close(self):
+        """Detach from the shared memory, the owner also unlinks it"""
+        if self._released or self._shm is None:
+            return
+
+        self._array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            log.debug(f"Shared memory {self._name} still has views alive, skip closing the mapping")
+
+        if self.is_owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._released = True
+            log.debug(f"Released shared memory {self._name}")
+        else:
+            self._shm = None
+
+    def __del__(self):
+        if getattr(self, "_owner_pid", None) is not None and self.is_owner:
+            self.close()
+
+
+class _PrefetchError:
+    def __init__(self, e: BaseException):
+        self.e = e
+
+
+class PrefetchIterator:
+    """Read and convert the items of source in a background thread, ahead of the consumer.
+
+    Up to `depth` converted items wait in a bounded queue, so the next batch is decoded
+    while the current one is being inserted. Exceptions of the reader thread are raised
+    in the consumer. depth=0 disables prefetching, items are converted on demand.
+
+    Examples:
+        >>> with PrefetchIterator(dataset, partial(get_data, normalize=False), depth=2) as batches:
+        >>>     for embeddings, metadata in batches:
+        >>>         db.insert_embeddings(embeddings, metadata)
+    """
+
+    _END = object()
+
+    def __init__(self, source: Iterable, transform: Callable[[Any], Any] | None = None, depth: int = 2):
+        self._source = iter(source)
+        self._transform = transform if transform is not None else (lambda x: x)
+        self.depth = depth
+
+        self._stop = threading.Event()
+        self._queue = None
+        self._thread = None
+        if depth > 0:
+            self._queue = queue.Queue(maxsize=depth)
+            self._thread = threading.Thread(target=self._produce, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for item in self._source:
+                if not self._put(self._transform(item)):
+                    return
+        except BaseException as e:
+            self._put(_PrefetchError(e))
+            return
+        self._put(self._END)
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        if self._queue is None:
+            return self._transform(next(self._source))
+
+        if self._stop.is_set():
+            raise StopIteration
+        item = self._queue.get()
+        if item is self._END:
+            self._stop.set()
+            raise StopIteration
+        if isinstance(item, _PrefetchError):
+            self._stop.set()
+            raise item.e
+        return item
+
+    def close(self):
+        """stop the reader thread and drop the prefetched items"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "PrefetchIterator":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
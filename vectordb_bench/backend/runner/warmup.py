@@ -0,0 +1,108 @@
+import time
+import logging
+
+import numpy as np
+
+from .histogram import LatencyHistogram
+
+log = logging.getLogger(__name__)
+
+# steady state: the per-second throughput of the last STEADY_STATE_WINDOW seconds
+# varies less than STEADY_STATE_CV, or gives up after STEADY_STATE_MAX_SECONDS
+STEADY_STATE_WINDOW = 5
+STEADY_STATE_CV = 0.1
+STEADY_STATE_MAX_SECONDS = 60
+
+
+class Warmup:
+    """Warm-up phase searched before each measured window, its stats are kept apart.
+
+    The phase lasts at least `duration` seconds and `queries` queries. With steady_state,
+    it further lasts until the per-second throughput stabilizes.
+
+    Args:
+        duration(float): minimum warm-up seconds
+        queries(int): minimum warm-up queries
+        steady_state(bool): wait for a steady throughput after the minimums
+    """
+
+    def __init__(self, duration: float = 0, queries: int = 0, steady_state: bool = False):
+        self.duration = duration
+        self.queries = queries
+        self.steady_state = steady_state
+        self.start()
+
+    def __repr__(self) -> str:
+        return f"Warmup(duration={self.duration}, queries={self.queries}, steady_state={self.steady_state})"
+
+    @property
+    def enabled(self) -> bool:
+        return self.duration > 0 or self.queries > 0 or self.steady_state
+
+    def start(self, now: float | None = None):
+        """reset the stats, the phase starts from now"""
+        self.start_time = time.perf_counter() if now is None else now
+        self.end_time = self.start_time
+        self.count = 0
+        self.latencies = LatencyHistogram()
+        self.per_second: dict[int, int] = {}
+
+    def record(self, latency: float, end: float):
+        self.count += 1
+        self.end_time = end
+        self.latencies.record(latency)
+        second = int(end - self.start_time)
+        self.per_second[second] = self.per_second.get(second, 0) + 1
+
+    def _is_steady(self, elapsed: float) -> bool:
+        last = int(elapsed)  # the current second is not complete
+        if last < STEADY_STATE_WINDOW:
+            return False
+        counts = np.array([self.per_second.get(s, 0) for s in range(last - STEADY_STATE_WINDOW, last)])
+        return counts.mean() > 0 and counts.std() / counts.mean() <= STEADY_STATE_CV
+
+    def done(self, now: float) -> bool:
+        elapsed = now - self.start_time
+        if elapsed < self.duration or self.count < self.queries:
+            return False
+        if not self.steady_state:
+            return True
+
+        if elapsed >= STEADY_STATE_MAX_SECONDS:
+            log.warning(f"Throughput is not steady after {STEADY_STATE_MAX_SECONDS}s warm-up, start measuring anyway")
+            return True
+        return self._is_steady(elapsed)
+
+    def progress(self) -> tuple[int, dict[int, int]]:
+        """queries and per-second throughput so far, for done_all()"""
+        return self.count, dict(self.per_second)
+
+    def done_all(self, progress: list[tuple[int, dict[int, int]]], workers: int, now: float) -> bool:
+        """done() of the merged warm-up of concurrent workers started together, from the progress() of each.
+
+        The queries minimum applies to every worker, the steady state to their total throughput.
+        """
+        if len(progress) < workers:
+            return False
+        self.count = min(count for count, _ in progress)
+        self.per_second = {}
+        for _, per_second in progress:
+            for second, count in per_second.items():
+                self.per_second[second] = self.per_second.get(second, 0) + count
+        return self.done(now)
+
+    def merge(self, other: "Warmup") -> "Warmup":
+        """merge the warm-up of a concurrent worker, returns self"""
+        self.count += other.count
+        self.latencies.merge(other.latencies)
+        self.end_time = max(self.end_time, other.end_time - other.start_time + self.start_time)
+        return self
+
+    def summary(self) -> dict:
+        duration = round(self.end_time - self.start_time, 4)
+        return {
+            "queries": self.count,
+            "duration": duration,
+            "qps": round(self.count / duration, 4) if duration > 0 else 0.0,
+            "latency": self.latencies.summary(),
+        }
@@ -5,18 +5,29 @@ import concurrent
 import numpy as np
 from enum import Enum, auto
 
+from .. import config
 from . import utils
-from .cases import Case, CaseLabel
+from .cases import Case, CaseLabel, BatchPerformanceCase
 from ..base import BaseModel
-from ..models import TaskConfig, PerformanceTimeoutError, TaskStage
+from ..models import TaskConfig, PerformanceTimeoutError, TaskStage, SearchEngine, ConcurrencySweep
 
 from .clients import (
     api,
     MetricType
 )
 from ..metric import Metric
-from .runner import MultiProcessingSearchRunner
-from .runner import SerialSearchRunner, SerialInsertRunner
+from .runner import MultiProcessingSearchRunner, AsyncSearchRunner, OpenLoopSearchRunner, BatchSearchRunner
+from .runner import SerialSearchRunner, SerialInsertRunner, CapacityInsertRunner
+from .runner.checkpoint import LoadCheckpoint
+from .runner.mixed_runner import MixedReadWriteRunner
+from .runner.churn_runner import ChurnRunner
+from .runner.trace import QueryTrace
+from .runner.distributed import DistributedSearchRunner
+from .runner.resource_monitor import ResourceMonitor
+from .runner import evaluation
+from .runner.util import stack_embeddings
+from .runner.concurrency_sweep import AdaptiveConcurrencySweep
+from .runner.warmup import Warmup
 from .data_source  import DatasetSource
 
 
@@ -48,9 +59,11 @@ class CaseRunner(BaseModel):
     dataset_source: DatasetSource
 
     db: api.VectorDB | None = None
-    test_emb: list[list[float]] | None = None
+    test_emb: np.ndarray | None = None
     serial_search_runner: SerialSearchRunner | None = None
-    search_runner: MultiProcessingSearchRunner | None = None
+    search_runner: (
+        MultiProcessingSearchRunner | AsyncSearchRunner | OpenLoopSearchRunner | BatchSearchRunner | DistributedSearchRunner | None
+    ) = None
     final_search_runner: MultiProcessingSearchRunner | None = None
 
     def __eq__(self, obj):
@@ -99,7 +112,9 @@ class CaseRunner(BaseModel):
     def run(self, drop_old: bool = True) -> Metric:
         log.info("Starting run")
 
-        self._pre_run(drop_old)
+        # a resumed load continues in the loaded collection
+        checkpoint = self._load_checkpoint()
+        self._pre_run(drop_old and not (checkpoint is not None and checkpoint.exists()))
 
         if self.ca.label == CaseLabel.Load:
             return self._run_capacity_case()
@@ -119,10 +134,15 @@ class CaseRunner(BaseModel):
         assert self.db is not None
         log.info("Start capacity case")
         try:
-            runner = SerialInsertRunner(
-                self.db, self.ca.dataset, self.normalize, self.ca.load_timeout
+            runner = CapacityInsertRunner(
+                self.db,
+                self.ca.dataset,
+                self.normalize,
+                self.ca.load_timeout,
+                load_concurrency=self.config.load_concurrency,
             )
-            count = runner.run_endlessness()
+            with ResourceMonitor() as monitor:
+                count = runner.run_endlessness()
         except Exception as e:
             log.warning(f"Failed to run capacity case, reason = {e}")
             raise e from None
@@ -130,7 +150,7 @@ class CaseRunner(BaseModel):
             log.info(
                 f"Capacity case loading dataset reaches VectorDB's limit: max capacity = {count}"
             )
-            return Metric(max_load_count=count)
+            return Metric(max_load_count=count, load_resources=monitor.summary())
 
     def _run_perf_case(self, drop_old: bool = True) -> Metric:
         """run performance cases
@@ -159,33 +179,98 @@ class CaseRunner(BaseModel):
         try:
             m = Metric()
             if drop_old:
-                if TaskStage.LOAD in self.config.stages:
+                if TaskStage.MIXED in self.config.stages:
+                    with ResourceMonitor() as monitor:
+                        m.mixed_series = self._mixed_workload()
+                    m.load_resources = monitor.summary()
+                    build_dur = self._optimize()
+                    log.info(f"Finish the mixed workload, optimize_duration={build_dur}")
+                elif TaskStage.LOAD in self.config.stages:
                     # self._load_train_data()
-                    _, load_dur = self._load_train_data()
+                    with ResourceMonitor() as monitor:
+                        (_, m.load_timeline, m.load_freshness, resumed_rows), load_dur = self._load_train_data()
+                    m.load_resources = monitor.summary()
                     build_dur = self._optimize()
-                    m.load_duration = round(load_dur + build_dur, 4)
-                    log.info(
-                        f"Finish loading the entire dataset into VectorDB,"
-                        f" insert_duration={load_dur}, optimize_duration={build_dur}"
-                        f" load_duration(insert + optimize) = {m.load_duration}"
-                    )
+                    if resumed_rows is None:
+                        m.load_duration = round(load_dur + build_dur, 4)
+                        log.info(
+                            f"Finish loading the entire dataset into VectorDB,"
+                            f" insert_duration={load_dur}, optimize_duration={build_dur}"
+                            f" load_duration(insert + optimize) = {m.load_duration}"
+                        )
+                    else:
+                        # the insert time of the interrupted load is lost, the duration isn't of the whole load
+                        m.load_resumed, m.load_resumed_rows = True, resumed_rows
+                        log.info(
+                            f"Finish the resumed load after {resumed_rows} rows inserted before,"
+                            f" insert_duration={load_dur}, optimize_duration={build_dur}, load_duration not recorded"
+                        )
                 else:
                     log.info("Data loading skipped")
+            if TaskStage.CHURN in self.config.stages:
+                with ResourceMonitor() as monitor:
+                    m.churn_series = self._churn()
+                m.churn_resources = monitor.summary()
             if (
                 TaskStage.SEARCH_SERIAL in self.config.stages
                 or TaskStage.SEARCH_CONCURRENT in self.config.stages
             ):
                 self._init_search_runner()
                 if TaskStage.SEARCH_SERIAL in self.config.stages:
-                    search_results = self._serial_search()
+                    with ResourceMonitor() as monitor:
+                        search_results = self._serial_search()
+                    m.serial_search_resources = monitor.summary()
                     '''
                     m.recall = search_results.recall
                     m.serial_latencies = search_results.serial_latencies
                     '''
-                    m.recall, m.ndcg, m.serial_latency_p99 = search_results
+                    (
+                        m.recall,
+                        m.ndcg,
+                        m.serial_latency_p99,
+                        m.serial_latency_percentiles,
+                        m.recall_distribution,
+                        m.ndcg_distribution,
+                        m.recall_curve,
+                        m.ndcg_curve,
+                        m.serial_search_breakdown,
+                    ) = search_results
                 if TaskStage.SEARCH_CONCURRENT in self.config.stages:
                     search_results = self._conc_search()
-                    m.qps, m.conc_num_list, m.conc_qps_list, m.conc_latency_p99_list = search_results
+                    if isinstance(self.search_runner, BatchSearchRunner):
+                        (
+                            m.qps,
+                            m.batch_nq_list,
+                            m.batch_vps_list,
+                            m.batch_latency_p99_list,
+                            m.batch_latency_percentiles_list,
+                        ) = search_results
+                    elif isinstance(self.search_runner, OpenLoopSearchRunner):
+                        (
+                            m.qps,
+                            m.target_qps_list,
+                            m.open_loop_qps_list,
+                            m.open_loop_latency_p99_list,
+                            m.open_loop_latency_percentiles_list,
+                            m.open_loop_error_count_list,
+                            m.open_loop_success_ratio_list,
+                        ) = search_results
+                    else:
+                        (
+                            m.qps,
+                            m.conc_num_list,
+                            m.conc_qps_list,
+                            m.conc_latency_p99_list,
+                            m.conc_latency_percentiles_list,
+                            m.conc_timeline_list,
+                            m.conc_warmup_list,
+                            m.conc_resources_list,
+                        ) = search_results
+
+            stage_resources = [m.load_resources, m.churn_resources, m.serial_search_resources, *m.conc_resources_list]
+            m.client_bound = any(r.get("client_bound", False) for r in stage_resources)
+            if m.client_bound:
+                log.warning("The client saturated its cpu in some stages, their results measure the client, not the db")
 
         except Exception as e:
             log.warning(f"Failed to run performance case, reason = {e}")
@@ -195,23 +280,91 @@ class CaseRunner(BaseModel):
             log.info(f"Performance case got result: {m}")
             return m
 
-    @utils.time_it
+    def _load_checkpoint(self) -> LoadCheckpoint | None:
+        """checkpoint of the load of this case into this db, None without resume_load"""
+        if not self.config.resume_load:
+            return None
+        return LoadCheckpoint(self.ca.dataset, f"{self.ca.case_id.name}-{self.config.db_name}")
+
     def _load_train_data(self):
         """Insert train data and get the insert_duration"""
+        checkpoint = self._load_checkpoint()
         try:
-            runner = SerialInsertRunner(self.db, self.ca.dataset, self.normalize, self.ca.load_timeout)
-            runner.run()
+            runner = SerialInsertRunner(
+                self.db,
+                self.ca.dataset,
+                self.normalize,
+                self.ca.load_timeout,
+                load_concurrency=self.config.load_concurrency,
+                freshness_samples=self.config.freshness_samples,
+                checkpoint=checkpoint,
+                resume=checkpoint is not None and checkpoint.exists(),
+            )
+            return runner.run()
         except Exception as e:
             raise e from None
         finally:
             runner = None
 
-    def _serial_search(self) -> tuple[float, float]:
+    def _mixed_workload(self) -> list[dict]:
+        """Load the train data by the writers of the mixed workload while its readers search
+
+        Returns:
+            list[dict]: per-second series of inserts, searches and recall
+        """
+        mixed_config = self.config.case_config.mixed_workload_config
+        runner = MixedReadWriteRunner(
+            db=self.db,
+            dataset=self.ca.dataset,
+            insert_rate=mixed_config.insert_rate,
+            num_writers=mixed_config.num_writers,
+            num_readers=mixed_config.num_readers,
+            normalize=self.normalize,
+            k=self.config.case_config.k,
+            filters=self.ca.filters,
+            read_dur_after_write=mixed_config.read_dur_after_write,
+        )
+        try:
+            return runner.run()
+        except Exception as e:
+            log.warning(f"mixed workload error: {e}")
+            raise e from None
+
+    def _churn(self) -> list[dict]:
+        """Replace a fraction of the loaded dataset per minute while searching
+
+        Returns:
+            list[dict]: per-second series of the phase, replaced rows, searches and recall
+        """
+        churn_config = self.config.case_config.churn_config
+        runner = ChurnRunner(
+            db=self.db,
+            dataset=self.ca.dataset,
+            churn_rate=churn_config.churn_rate,
+            churn_duration=churn_config.churn_duration,
+            mode=churn_config.mode,
+            compact=churn_config.compact,
+            num_writers=churn_config.num_writers,
+            num_readers=churn_config.num_readers,
+            normalize=self.normalize,
+            k=self.config.case_config.k,
+            filters=self.ca.filters,
+            read_dur_after_write=churn_config.read_dur_after_write,
+        )
+        try:
+            return runner.run()
+        except Exception as e:
+            log.warning(f"churn workload error: {e}")
+            raise e from None
+
+    def _serial_search(self) -> tuple[float, float, float, dict, dict, dict, dict, dict, dict]:
         """Performance serial tests, search the entire test data once,
         calculate the recall, serial_latency_p99
 
         Returns:
-            tuple[float, float]: recall, serial_latency_p99
+            tuple[float, float, float, dict, dict, dict, dict, dict, dict]: recall, ndcg, serial_latency_p99,
+                serial latency percentiles, per-query recall and ndcg distributions, recall and ndcg curves,
+                and the breakdown of the latency into search phases
         """
         try:
             return self.serial_search_runner.run()
@@ -255,13 +408,22 @@ class CaseRunner(BaseModel):
                 raise e from None
 
     def _init_search_runner(self):
-        test_emb = np.stack(self.ca.dataset.test_data["emb"])
-        if self.normalize:
-            test_emb = test_emb / np.linalg.norm(test_emb, axis=1)[:, np.newaxis]
-        self.test_emb = test_emb.tolist()
+        self.test_emb = stack_embeddings(self.ca.dataset.test_data["emb"], self.normalize)
 
         gt_df = self.ca.dataset.gt_data
 
+        trace = None
+        if self.config.trace_queries:
+            trace = QueryTrace(
+                root=config.RESULTS_LOCAL_DIR.joinpath("traces"),
+                run_id=self.run_id,
+                db=self.config.db_name,
+                case=self.ca.case_id.name,
+                ground_truth=evaluation.to_id_matrix(gt_df["neighbors_id"], self.config.case_config.k),
+                k=self.config.case_config.k,
+            )
+            log.info(f"Trace search queries to {trace.root}")
+
         if TaskStage.SEARCH_SERIAL in self.config.stages:
             self.serial_search_runner = SerialSearchRunner(
                 db=self.db,
@@ -269,16 +431,69 @@ class CaseRunner(BaseModel):
                 ground_truth=gt_df,
                 filters=self.ca.filters,
                 k=self.config.case_config.k,
+                recall_k_list=self.config.case_config.recall_k_list,
+                trace=trace,
             )
         if TaskStage.SEARCH_CONCURRENT in self.config.stages:
-            self.search_runner = MultiProcessingSearchRunner(
-                db=self.db,
-                test_data=self.test_emb,
-                filters=self.ca.filters,
-                concurrencies=self.config.case_config.concurrency_search_config.num_concurrency,
-                duration=self.config.case_config.concurrency_search_config.concurrency_duration,
-                k=self.config.case_config.k,
-            )
+            conc_config = self.config.case_config.concurrency_search_config
+            if isinstance(self.ca, BatchPerformanceCase):
+                self.search_runner = BatchSearchRunner(
+                    db=self.db,
+                    test_data=self.test_emb,
+                    nq_list=self.ca.nq_list,
+                    filters=self.ca.filters,
+                    duration=conc_config.concurrency_duration,
+                    k=self.config.case_config.k,
+                )
+            elif conc_config.search_engine == SearchEngine.OPEN_LOOP:
+                self.search_runner = OpenLoopSearchRunner(
+                    db=self.db,
+                    test_data=self.test_emb,
+                    target_qps_list=conc_config.target_qps_list,
+                    filters=self.ca.filters,
+                    duration=conc_config.concurrency_duration,
+                    poisson=conc_config.poisson_arrival,
+                    k=self.config.case_config.k,
+                )
+            else:
+                if self.config.agents > 0:
+                    # agents always search by processes, without query traces
+                    runner_cls = DistributedSearchRunner
+                    runner_kwargs = {
+                        "db": self.config.db,
+                        "db_config": self.config.db_config,
+                        "db_case_config": self.config.db_case_config,
+                        "num_agents": self.config.agents,
+                        "address": self.config.coordinator_address,
+                    }
+                elif conc_config.search_engine == SearchEngine.ASYNCIO:
+                    runner_cls, runner_kwargs = AsyncSearchRunner, {"db": self.db}
+                else:
+                    runner_cls, runner_kwargs = MultiProcessingSearchRunner, {"db": self.db, "trace": trace}
+
+                if conc_config.sweep == ConcurrencySweep.ADAPTIVE:
+                    concurrencies = AdaptiveConcurrencySweep(
+                        min_concurrency=min(conc_config.num_concurrency),
+                        max_concurrency=max(conc_config.num_concurrency),
+                        plateau_threshold=conc_config.plateau_threshold,
+                        latency_p99_slo=conc_config.latency_p99_slo,
+                    )
+                else:
+                    concurrencies = conc_config.num_concurrency
+
+                self.search_runner = runner_cls(
+                    test_data=self.test_emb,
+                    filters=self.ca.filters,
+                    concurrencies=concurrencies,
+                    duration=conc_config.concurrency_duration,
+                    k=self.config.case_config.k,
+                    warmup=Warmup(
+                        duration=conc_config.warmup_duration,
+                        queries=conc_config.warmup_queries,
+                        steady_state=conc_config.steady_state,
+                    ),
+                    **runner_kwargs,
+                )
 
     def stop(self):
         if self.search_runner:
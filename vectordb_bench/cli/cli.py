@@ -21,13 +21,20 @@ import click
 from vectordb_bench.backend.clients.api import MetricType
 from .. import config
 from ..backend.clients import DB
+from ..backend.cases import BatchPerformanceCase, type2case
+from ..backend.runner.distributed import run_agent
 from ..interface import benchMarkRunner, global_result_future
 from ..models import (
     CaseConfig,
     CaseType,
+    ChurnConfig,
+    ChurnMode,
     ConcurrencySearchConfig,
+    ConcurrencySweep,
+    SearchEngine,
     DBCaseConfig,
     DBConfig,
+    MixedWorkloadConfig,
     TaskConfig,
     TaskStage,
 )
@@ -132,16 +139,24 @@ def parse_task_stages(
     load: bool,
     search_serial: bool,
     search_concurrent: bool,
+    mixed: bool = False,
+    churn: bool = False,
 ) -> List[TaskStage]:
     stages = []
     if load and not drop_old:
         raise RuntimeError("Dropping old data cannot be skipped if loading data")
     elif drop_old and not load:
         raise RuntimeError("Load cannot be skipped if dropping old data")
+    elif mixed and not load:
+        raise RuntimeError("Load cannot be skipped in the mixed workload, its writers load the data")
     if drop_old:
         stages.append(TaskStage.DROP_OLD)
     if load:
         stages.append(TaskStage.LOAD)
+    if mixed:
+        stages.append(TaskStage.MIXED)
+    if churn:
+        stages.append(TaskStage.CHURN)
     if search_serial:
         stages.append(TaskStage.SEARCH_SERIAL)
     if search_concurrent:
@@ -177,6 +192,8 @@ def get_custom_case_config(parameters: dict) -> dict:
                 "with_gt": parameters["custom_dataset_with_gt"],
             }
         }
+    elif issubclass(type2case[CaseType[parameters["case_type"]]], BatchPerformanceCase):
+        custom_case_config = {"nq_list": parameters["batch_nq"]}
     return custom_case_config
 
 
@@ -271,6 +288,193 @@ class CommonTypedDict(TypedDict):
             help="K value for number of nearest neighbors to search",
         ),
     ]
+    recall_k: Annotated[
+        List[str],
+        click.option(
+            "--recall-k",
+            type=str,
+            help="Comma-separated list of k to report recall and ndcg at, k above --k are scored from a second serial search",
+            default="",
+            callback=lambda *args: list(map(int, click_arg_split(*args))),
+        ),
+    ]
+    load_concurrency: Annotated[
+        int,
+        click.option(
+            "--load-concurrency",
+            type=click.IntRange(min=1),
+            default=1,
+            show_default=True,
+            help="Number of insert processes of the load stage, each loads a disjoint shard of the train files, "
+            "capacity cases insert the dataset endlessly with as many processes",
+        ),
+    ]
+    freshness_samples: Annotated[
+        int,
+        click.option(
+            "--freshness-samples",
+            type=click.IntRange(min=0),
+            default=0,
+            show_default=True,
+            help="Rows of each inserted batch probed for the time until they are searchable, 0 disables the probe",
+        ),
+    ]
+    resume_load: Annotated[
+        bool,
+        click.option(
+            "--resume-load",
+            type=bool,
+            default=False,
+            is_flag=True,
+            help="Checkpoint the load after every batch, and continue an interrupted load of the same case "
+            "and --db-label from its checkpoint, after verifying the row count of the db. The checkpoint is "
+            "removed when the load finishes, a resumed load records no load_duration",
+        ),
+    ]
+    mixed_insert_rate: Annotated[
+        int,
+        click.option(
+            "--mixed-insert-rate",
+            type=click.IntRange(min=0),
+            default=0,
+            show_default=True,
+            help="Rows per second of the mixed workload writers, above 0 the load stage runs the mixed workload: "
+            "writers insert the train files while readers search and sample the recall every second, 0 loads normally",
+        ),
+    ]
+    mixed_writers: Annotated[
+        int,
+        click.option(
+            "--mixed-writers",
+            type=click.IntRange(min=1),
+            default=1,
+            show_default=True,
+            help="Writer processes of the mixed workload, each inserts a disjoint shard of the train files",
+        ),
+    ]
+    mixed_readers: Annotated[
+        int,
+        click.option(
+            "--mixed-readers",
+            type=click.IntRange(min=1),
+            default=1,
+            show_default=True,
+            help="Reader processes of the mixed workload",
+        ),
+    ]
+    mixed_read_dur_after_write: Annotated[
+        int,
+        click.option(
+            "--mixed-read-dur-after-write",
+            type=click.IntRange(min=0),
+            default=30,
+            show_default=True,
+            help="Seconds the mixed workload readers keep searching after all writes are done",
+        ),
+    ]
+    churn_rate: Annotated[
+        float,
+        click.option(
+            "--churn-rate",
+            type=click.FloatRange(min=0),
+            default=0,
+            show_default=True,
+            help="Fraction of the loaded dataset the churn writers replace per minute while readers search, "
+            "above 0 the churn stage runs after the load, 0 disables it",
+        ),
+    ]
+    churn_duration: Annotated[
+        int,
+        click.option(
+            "--churn-duration",
+            type=click.IntRange(min=1),
+            default=300,
+            show_default=True,
+            help="Seconds of churn",
+        ),
+    ]
+    churn_mode: Annotated[
+        str,
+        click.option(
+            "--churn-mode",
+            type=click.Choice([m.value for m in ChurnMode]),
+            default=ChurnMode.UPSERT.value,
+            show_default=True,
+            help="Replace the rows by upsert, or by delete then insert",
+        ),
+    ]
+    churn_compact: Annotated[
+        bool,
+        click.option(
+            "--churn-compact",
+            type=bool,
+            default=False,
+            is_flag=True,
+            help="Optimize after the churn while the readers keep searching",
+        ),
+    ]
+    churn_writers: Annotated[
+        int,
+        click.option(
+            "--churn-writers",
+            type=click.IntRange(min=1),
+            default=1,
+            show_default=True,
+            help="Writer processes of the churn, each replaces a disjoint shard of the train files",
+        ),
+    ]
+    churn_readers: Annotated[
+        int,
+        click.option(
+            "--churn-readers",
+            type=click.IntRange(min=1),
+            default=1,
+            show_default=True,
+            help="Reader processes of the churn",
+        ),
+    ]
+    churn_read_dur_after_write: Annotated[
+        int,
+        click.option(
+            "--churn-read-dur-after-write",
+            type=click.IntRange(min=0),
+            default=30,
+            show_default=True,
+            help="Seconds the churn readers keep searching after the churn and the compaction",
+        ),
+    ]
+    trace_queries: Annotated[
+        bool,
+        click.option(
+            "--trace-queries",
+            type=bool,
+            default=False,
+            is_flag=True,
+            help="Write the latency, result ids and recall of every serial and concurrent search query "
+            "to parquet under RESULTS_LOCAL_DIR/traces",
+        ),
+    ]
+    agents: Annotated[
+        int,
+        click.option(
+            "--agents",
+            type=click.IntRange(min=0),
+            default=0,
+            show_default=True,
+            help="Run the concurrent search on this many agents started by `vectordbbench agent`, "
+            "each searches at every concurrency, 0 searches locally",
+        ),
+    ]
+    coordinator_address: Annotated[
+        str,
+        click.option(
+            "--coordinator-address",
+            type=str,
+            default=config.DISTRIBUTED_ADDRESS,
+            show_default=True,
+            help="host:port the coordinator listens on for the agents, set a non-loopback host to accept remote agents",
+        ),
+    ]
     concurrency_duration: Annotated[
         int,
         click.option(
@@ -292,6 +496,108 @@ class CommonTypedDict(TypedDict):
             callback=lambda *args: list(map(int, click_arg_split(*args))),
         ),
     ]
+    concurrency_sweep: Annotated[
+        str,
+        click.option(
+            "--concurrency-sweep",
+            type=click.Choice([e.value for e in ConcurrencySweep]),
+            default=ConcurrencySweep.LIST.value,
+            show_default=True,
+            help="Search every level of --num-concurrency, or adaptively ramp up within its min and max "
+            "until qps plateaus or --latency-p99-slo is exceeded",
+        ),
+    ]
+    plateau_threshold: Annotated[
+        float,
+        click.option(
+            "--plateau-threshold",
+            type=float,
+            default=0.05,
+            show_default=True,
+            help="Adaptive sweep stops ramping up if qps improves less than this ratio",
+        ),
+    ]
+    latency_p99_slo: Annotated[
+        float | None,
+        click.option(
+            "--latency-p99-slo",
+            type=float,
+            default=None,
+            help="Adaptive sweep stops ramping up if p99 latency exceeds this, in seconds",
+        ),
+    ]
+    warmup_duration: Annotated[
+        float,
+        click.option(
+            "--warmup-duration",
+            type=float,
+            default=0,
+            show_default=True,
+            help="Seconds searched before the measured window of each concurrency, reported apart",
+        ),
+    ]
+    warmup_queries: Annotated[
+        int,
+        click.option(
+            "--warmup-queries",
+            type=int,
+            default=0,
+            show_default=True,
+            help="Queries per worker searched before the measured window of each concurrency",
+        ),
+    ]
+    steady_state: Annotated[
+        bool,
+        click.option(
+            "--steady-state/--no-steady-state",
+            type=bool,
+            default=False,
+            show_default=True,
+            help="Extend the warm-up until the per-second throughput is steady",
+        ),
+    ]
+    search_engine: Annotated[
+        str,
+        click.option(
+            "--search-engine",
+            type=click.Choice([e.value for e in SearchEngine]),
+            default=SearchEngine.MULTIPROCESSING.value,
+            show_default=True,
+            help="Load generator of the concurrent search, asyncio drives all concurrencies from one event loop, "
+            "open_loop issues queries at --target-qps rates",
+        ),
+    ]
+    target_qps: Annotated[
+        List[str],
+        click.option(
+            "--target-qps",
+            type=str,
+            help="Comma-separated list of target arrival rates to sweep with --search-engine open_loop",
+            default="",
+            callback=lambda *args: list(map(float, click_arg_split(*args))),
+        ),
+    ]
+    poisson_arrival: Annotated[
+        bool,
+        click.option(
+            "--poisson-arrival/--fixed-arrival",
+            type=bool,
+            default=False,
+            help="Poisson or fixed inter-arrival times of the open-loop search",
+            show_default=True,
+        ),
+    ]
+    batch_nq: Annotated[
+        List[str],
+        click.option(
+            "--batch-nq",
+            type=str,
+            help="Comma-separated list of query vectors per request to test in batch search cases",
+            show_default=True,
+            default=",".join(map(str, config.BATCH_NQ_LIST)),
+            callback=lambda *args: list(map(int, click_arg_split(*args))),
+        ),
+    ]
     custom_case_name: Annotated[
         str,
         click.option(
@@ -467,6 +773,10 @@ def run(
         db_case_config (DBCaseConfig)
         **parameters: expects keys from CommonTypedDict
     """
+    if SearchEngine(parameters["search_engine"]) == SearchEngine.OPEN_LOOP and len(parameters["target_qps"]) == 0:
+        raise click.BadParameter("--search-engine open_loop needs at least one --target-qps")
+    if parameters["agents"] > 0 and not config.DISTRIBUTED_AUTHKEY:
+        raise click.BadParameter("--agents needs the DISTRIBUTED_AUTHKEY secret shared with the agents in the environment")
 
     task = TaskConfig(
         db=db,
@@ -475,12 +785,43 @@ def run(
         case_config=CaseConfig(
             case_id=CaseType[parameters["case_type"]],
             k=parameters["k"],
+            recall_k_list=parameters["recall_k"],
             concurrency_search_config=ConcurrencySearchConfig(
                 concurrency_duration=parameters["concurrency_duration"],
                 num_concurrency=[int(s) for s in parameters["num_concurrency"]],
+                sweep=ConcurrencySweep(parameters["concurrency_sweep"]),
+                plateau_threshold=parameters["plateau_threshold"],
+                latency_p99_slo=parameters["latency_p99_slo"],
+                warmup_duration=parameters["warmup_duration"],
+                warmup_queries=parameters["warmup_queries"],
+                steady_state=parameters["steady_state"],
+                search_engine=SearchEngine(parameters["search_engine"]),
+                target_qps_list=parameters["target_qps"],
+                poisson_arrival=parameters["poisson_arrival"],
+            ),
+            mixed_workload_config=MixedWorkloadConfig(
+                insert_rate=parameters["mixed_insert_rate"],
+                num_writers=parameters["mixed_writers"],
+                num_readers=parameters["mixed_readers"],
+                read_dur_after_write=parameters["mixed_read_dur_after_write"],
+            ),
+            churn_config=ChurnConfig(
+                churn_rate=parameters["churn_rate"],
+                churn_duration=parameters["churn_duration"],
+                mode=ChurnMode(parameters["churn_mode"]),
+                compact=parameters["churn_compact"],
+                num_writers=parameters["churn_writers"],
+                num_readers=parameters["churn_readers"],
+                read_dur_after_write=parameters["churn_read_dur_after_write"],
             ),
             custom_case=get_custom_case_config(parameters),
         ),
+        load_concurrency=parameters["load_concurrency"],
+        freshness_samples=parameters["freshness_samples"],
+        resume_load=parameters["resume_load"],
+        trace_queries=parameters["trace_queries"],
+        agents=parameters["agents"],
+        coordinator_address=parameters["coordinator_address"],
         stages=parse_task_stages(
             (
                 False if not parameters["load"] else parameters["drop_old"]
@@ -488,6 +829,8 @@ def run(
             parameters["load"],
             parameters["search_serial"],
             parameters["search_concurrent"],
+            parameters["mixed_insert_rate"] > 0,
+            parameters["churn_rate"] > 0,
         ),
     )
 
@@ -497,3 +840,11 @@ def run(
         time.sleep(5)
         if global_result_future:
             wait([global_result_future])
+
+
+@cli.command()
+@click.option("--coordinator", type=str, required=True, help="host:port of the coordinator")
+@click.option("--once", is_flag=True, default=False, help="Exit after the first case instead of waiting for the next")
+def agent(coordinator: str, once: bool):
+    """Search agent of a distributed concurrent search, serves the coordinator started with --agents."""
+    run_agent(coordinator, once=once)
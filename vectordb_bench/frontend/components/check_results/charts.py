@@ -48,6 +48,8 @@ def drawChart(data, st, key_prefix: str):
         key = f"{key_prefix}-{metric}"
         drawMetricChart(data, metric, container, key=key)
 
+    drawRecallCurveChart(data, st.container(), key=f"{key_prefix}-recall_curve")
+
 
 def getLabelToShapeMap(data):
     labelIndexMap = {}
@@ -165,3 +167,45 @@ def drawMetricChart(data, metric, st, key: str):
     )
 
     chart.plotly_chart(fig, use_container_width=True, key=key)
+
+
+def drawRecallCurveChart(data, st, key: str):
+    curveData = [
+        {
+            "k": int(k),
+            "recall": recall,
+            "ndcg": d.get("ndcg_curve", {}).get(k, 0),
+            "db_name": d["db_name"],
+        }
+        for d in data
+        for k, recall in d.get("recall_curve", {}).items()
+    ]
+    if len(curveData) == 0:
+        return
+
+    curveData.sort(key=lambda a: a["k"])
+    fig = px.line(
+        curveData,
+        x="k",
+        y="recall",
+        color="db_name",
+        markers=True,
+        log_x=True,
+        hover_data={
+            "ndcg": True,
+        },
+        title="Recall@k (more is better)",
+    )
+    fig.update_xaxes(title_text="k")
+    fig.update_yaxes(title_text="Recall")
+    fig.update_layout(
+        title=dict(
+            font=dict(
+                size=16,
+                color="#666",
+            ),
+            pad=dict(l=16),
+        ),
+    )
+
+    st.plotly_chart(fig, use_container_width=True, key=key)
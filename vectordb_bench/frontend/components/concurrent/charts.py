@@ -24,6 +24,22 @@ def drawChartsByCase(allData, showCaseNames: list[str], st):
         ]
         drawChart(data, chartContainer, key=f"{caseName}-qps-p99")
 
+        timelineData = [
+            {
+                "second": bucket["second"],
+                "qps": bucket["count"],
+                "errors": bucket["errors"],
+                "latency_p99": bucket["latency_p99"] * 1000,
+                "conc_num": caseData["conc_num_list"][i],
+                "line": f"{caseData['db_name']}-conc{caseData['conc_num_list'][i]}",
+                "db_name": caseData["db_name"],
+            }
+            for caseData in caseDataList
+            for i, timeline in enumerate(caseData.get("conc_timeline_list", []))
+            for bucket in timeline
+        ]
+        drawTimelineChart(timelineData, chartContainer, key=f"{caseName}-timeline")
+
 
 def getRange(metric, data, padding_multipliers):
     minV = min([d.get(metric, 0) for d in data])
@@ -74,3 +90,27 @@ def drawChart(data, st, key: str):
     fig.update_traces(textposition="bottom right", texttemplate="conc-%{text:,.4~r}")
 
     st.plotly_chart(fig, use_container_width=True, key=key)
+
+
+def drawTimelineChart(data, st, key: str):
+    if len(data) == 0:
+        return
+
+    st.markdown("**Per-second timeline**")
+    for y, title in [("qps", "QPS"), ("latency_p99", "Latency P99 (ms)")]:
+        fig = px.line(
+            data,
+            x="second",
+            y=y,
+            color="db_name",
+            line_group="line",
+            hover_data={
+                "conc_num": True,
+                "errors": True,
+            },
+            height=400,
+        )
+        fig.update_xaxes(title_text="Second")
+        fig.update_yaxes(title_text=title)
+
+        st.plotly_chart(fig, use_container_width=True, key=f"{key}-{y}")
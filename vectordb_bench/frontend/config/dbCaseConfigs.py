@@ -110,6 +110,13 @@ UI_CASE_CLUSTERS: list[UICaseItemCluster] = [
             UICaseItem(case_id=CaseType.Performance1536D500K99P),
         ],
     ),
+    UICaseItemCluster(
+        label="Batch Search Performance Test",
+        uiCaseItems=[
+            UICaseItem(case_id=CaseType.Performance768D1MBatch),
+            UICaseItem(case_id=CaseType.Performance1536D500KBatch),
+        ],
+    ),
     UICaseItemCluster(
         label="Capacity Test",
         uiCaseItems=[
@@ -135,6 +142,8 @@ DISPLAY_CASE_ORDER: list[CaseType] = [
     CaseType.Performance768D1M99P,
     CaseType.Performance1536D5M99P,
     CaseType.Performance1536D500K99P,
+    CaseType.Performance768D1MBatch,
+    CaseType.Performance1536D500KBatch,
     CaseType.CapacityDim960,
     CaseType.CapacityDim128,
 ]
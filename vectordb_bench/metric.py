@@ -15,14 +15,44 @@ class Metric:
     max_load_count: int = 0
 
     # for performance cases
-    load_duration: float = 0.0  # duration to load all dataset into DB
+    load_duration: float = 0.0  # duration to load all dataset into DB, unset for a resumed load
+    load_resumed: bool = False  # the load continued an interrupted one from its checkpoint
+    load_resumed_rows: int = 0  # rows the interrupted load inserted before the checkpoint
+    load_timeline: list[dict] = field(default_factory=list)  # per-second insert buckets
+    load_freshness: dict = field(default_factory=dict)  # time-to-searchable of the probed inserted rows
+    load_resources: dict = field(default_factory=dict)  # client cpu, context switches and memory while loading
+    mixed_series: list[dict] = field(default_factory=list)  # per-second inserts, searches and recall of the mixed workload
+    churn_series: list[dict] = field(default_factory=list)  # per-second replaced rows, searches and recall of the churn workload
+    churn_resources: dict = field(default_factory=dict)
     qps: float = 0.0
     serial_latency_p99: float = 0.0
+    serial_latency_percentiles: dict[str, float] = field(default_factory=dict)
     recall: float = 0.0
     ndcg: float = 0.0
+    recall_distribution: dict[str, float] = field(default_factory=dict)  # of per-query recalls
+    ndcg_distribution: dict[str, float] = field(default_factory=dict)
+    recall_curve: dict[int, float] = field(default_factory=dict)  # recall at each k of the same serial search
+    ndcg_curve: dict[int, float] = field(default_factory=dict)
+    serial_search_resources: dict = field(default_factory=dict)
+    serial_search_breakdown: dict = field(default_factory=dict)  # latency of each search phase, client overhead against the db
     conc_num_list: list[int] = field(default_factory=list)
     conc_qps_list: list[float] = field(default_factory=list)
     conc_latency_p99_list: list[float] = field(default_factory=list)
+    conc_latency_percentiles_list: list[dict[str, float]] = field(default_factory=list)
+    conc_timeline_list: list[list[dict]] = field(default_factory=list)  # per-second buckets of each concurrency
+    conc_warmup_list: list[dict] = field(default_factory=list)  # warm-up queries, duration, qps and latency of each concurrency
+    conc_resources_list: list[dict] = field(default_factory=list)  # client resources of each concurrency
+    client_bound: bool = False  # the client saturated its cpu in a stage, the results of it measure the client
+    target_qps_list: list[float] = field(default_factory=list)
+    open_loop_qps_list: list[float] = field(default_factory=list)
+    open_loop_latency_p99_list: list[float] = field(default_factory=list)
+    open_loop_latency_percentiles_list: list[dict[str, float]] = field(default_factory=list)  # of all the queries, failed and timed out ones too
+    open_loop_error_count_list: list[int] = field(default_factory=list)  # failed and timed-out queries of each rate
+    open_loop_success_ratio_list: list[float] = field(default_factory=list)
+    batch_nq_list: list[int] = field(default_factory=list)
+    batch_vps_list: list[float] = field(default_factory=list)  # query vectors searched per second
+    batch_latency_p99_list: list[float] = field(default_factory=list)
+    batch_latency_percentiles_list: list[dict[str, float]] = field(default_factory=list)
 
 
 QURIES_PER_DOLLAR_METRIC = "QP$ (Quries per Dollar)"
@@ -27,6 +27,10 @@ class PerformanceTimeoutError(TimeoutError):
     pass
 
 
+class LoadResumeError(Exception):
+    pass
+
+
 class CaseConfigParamType(Enum):
     """
     Value will be the key of CaseConfig.params and displayed in UI
@@ -82,9 +86,66 @@ class CustomizedCase(BaseModel):
     pass
 
 
+class SearchEngine(StrEnum):
+    """Load generators of the concurrent search stage"""
+
+    MULTIPROCESSING = auto()  # one process per concurrency
+    ASYNCIO = auto()  # concurrency in-flight requests from one event loop
+    OPEN_LOOP = auto()  # queries at target arrival rates, regardless of responses
+
+    def __repr__(self) -> str:
+        return str.__repr__(self.value)
+
+
+class ConcurrencySweep(StrEnum):
+    """How the concurrent search stage picks concurrency levels"""
+
+    LIST = auto()  # every level of num_concurrency
+    ADAPTIVE = auto()  # exponential ramp and refinement within [min, max] of num_concurrency
+
+    def __repr__(self) -> str:
+        return str.__repr__(self.value)
+
+
 class ConcurrencySearchConfig(BaseModel):
     num_concurrency: List[int] = config.NUM_CONCURRENCY
+    sweep: ConcurrencySweep = ConcurrencySweep.LIST
+    plateau_threshold: float = 0.05  # adaptive only, stop ramping up if qps improves less than this ratio
+    latency_p99_slo: float | None = None  # adaptive only, stop ramping up above this p99 latency, in seconds
+    warmup_duration: float = 0  # seconds searched before each measured window, closed-loop engines only
+    warmup_queries: int = 0  # queries per worker searched before each measured window
+    steady_state: bool = False  # extend the warm-up until the throughput is steady
     concurrency_duration: int = config.CONCURRENCY_DURATION
+    search_engine: SearchEngine = SearchEngine.MULTIPROCESSING
+    target_qps_list: List[float] = []  # open-loop only, arrival rates to sweep
+    poisson_arrival: bool = False  # open-loop only, poisson or fixed inter-arrival times
+
+
+class ChurnMode(StrEnum):
+    """How the churn workload replaces the loaded rows"""
+
+    UPSERT = auto()  # upsert_embeddings
+    DELETE_INSERT = auto()  # delete_embeddings, then insert_embeddings
+
+    def __repr__(self) -> str:
+        return str.__repr__(self.value)
+
+
+class ChurnConfig(BaseModel):
+    churn_rate: float = 0.1  # fraction of the dataset replaced per minute by all writers
+    churn_duration: int = 300  # seconds of churn
+    mode: ChurnMode = ChurnMode.UPSERT
+    compact: bool = False  # optimize after the churn while the readers keep searching
+    num_writers: int = 1
+    num_readers: int = 1
+    read_dur_after_write: int = 30  # seconds readers keep searching after the churn and the compaction
+
+
+class MixedWorkloadConfig(BaseModel):
+    insert_rate: int = 1000  # rows per second of all writers
+    num_writers: int = 1
+    num_readers: int = 1
+    read_dur_after_write: int = 30  # seconds readers keep searching after all writes are done
 
 
 class CaseConfig(BaseModel):
@@ -93,7 +154,10 @@ class CaseConfig(BaseModel):
     case_id: CaseType
     custom_case: dict | None = None
     k: int | None = config.K_DEFAULT
+    recall_k_list: list[int] = []  # extra k of the recall curve, searched again with the largest k if it's above k
     concurrency_search_config: ConcurrencySearchConfig = ConcurrencySearchConfig()
+    mixed_workload_config: MixedWorkloadConfig = MixedWorkloadConfig()
+    churn_config: ChurnConfig = ChurnConfig()
 
     '''
     @property
@@ -116,6 +180,8 @@ class TaskStage(StrEnum):
 
     DROP_OLD = auto()
     LOAD = auto()
+    MIXED = auto()  # the load stage runs the mixed read/write workload, writers insert the dataset while readers search
+    CHURN = auto()  # replace a fraction of the loaded dataset per minute while searching, before the search stages
     SEARCH_SERIAL = auto()
     SEARCH_CONCURRENT = auto()
 
@@ -138,6 +204,12 @@ class TaskConfig(BaseModel):
     db_case_config: DBCaseConfig
     case_config: CaseConfig
     stages: List[TaskStage] = ALL_TASK_STAGES
+    load_concurrency: int = 1  # insert processes of the performance case load, each loads a disjoint shard, and of the capacity case
+    freshness_samples: int = 0  # rows of each inserted batch probed for the time to be searchable, 0 disables
+    resume_load: bool = False  # checkpoint the load, and continue from the checkpoint of the same case and db_name after verifying the db row count
+    trace_queries: bool = False  # write every serial and concurrent search query to parquet under RESULTS_LOCAL_DIR/traces
+    agents: int = 0  # run the concurrent search on this many agents connected to coordinator_address, 0 searches locally
+    coordinator_address: str = config.DISTRIBUTED_ADDRESS
 
     @property
     def db_name(self):